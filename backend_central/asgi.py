@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+En docker-compose lo sirve el contenedor "eventos" (gunicorn + UvicornWorker) para
+las conexiones largas de /api/eventos/; el resto de la API sigue por WSGI.
 """
 
 import os
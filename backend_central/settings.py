@@ -34,6 +34,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ordenes.idempotencia.IdempotenciaMiddleware', # Reintentos de la App con Idempotency-Key
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -106,7 +107,8 @@ JAZZMIN_SETTINGS = {
     "site_brand": "Gestión Operativa",
     "welcome_sign": "Bienvenido al Panel de Control",
     "copyright": "Ingenio Monte Rosa S.A.",
-    "search_model": ["ordenes.OrdenTrabajo", "auth.User"],
+    # OrdenTrabajo no tiene admin propio: se busca en Pendientes, Historial y Archivo (ver ordenes/busqueda.py)
+    "search_model": ["ordenes.OrdenPendiente", "ordenes.OrdenHistorial", "ordenes.OrdenArchivada", "auth.User"],
 
     "hide_models": ["auth.Group"],
 
@@ -122,6 +124,8 @@ JAZZMIN_SETTINGS = {
         "ordenes.OrdenTrabajo": "fas fa-clipboard-list",
         "ordenes.OrdenPendiente": "fas fa-clock",
         "ordenes.OrdenHistorial": "fas fa-check-circle",
+        "ordenes.OrdenArchivada": "fas fa-archive",
+        "ordenes.TareaFondo": "fas fa-tasks",
     },
 }
 
@@ -146,11 +150,28 @@ CORS_ALLOW_ALL_ORIGINS = True # Permite que el celular/emulador se conecte
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny', # Temporalmente abierto para probar
-    ]
+    ],
+    # Token con caché (ordenes/autenticacion.py) además de la sesión del admin
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'ordenes.autenticacion.TokenCacheado',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # Paginación por cursor solo cuando la App la pide (?paginar=1); ver ordenes/paginacion.py
+    'DEFAULT_PAGINATION_CLASS': 'ordenes.paginacion.PaginacionCursorOpcional',
 }
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# En Docker nginx envía los archivos de /media/ (X-Accel-Redirect) tras el permiso de Django; ver ordenes/medios.py
+MEDIA_X_ACCEL = '/protegido/' if os.environ.get('USA_DOCKER') == 'True' else None
+# Exigir sesión, token o URL firmada en /media/. Apagado hasta que todas las App instaladas
+# manden el token en la API (las versiones viejas reciben URLs sin firma); ver ordenes/medios.py
+MEDIA_PROTEGIDO = os.environ.get('MEDIA_PROTEGIDO') == 'True'
+
+# Órdenes FINALIZADAS hace más de estos días pasan al "Historial Archivado" (ver ordenes/archivo.py); 0 = no se archiva
+ARCHIVO_DIAS = int(os.environ.get('ARCHIVO_DIAS', 365))
@@ -1,12 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include  
 from django.conf import settings
-from django.conf.urls.static import static  
+from ordenes.views import servir_medio
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('ordenes.urls')), 
+    # También en producción: Django revisa el permiso y nginx envía el archivo (X-Accel-Redirect)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:ruta>', servir_medio, name='medio'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -2,19 +2,27 @@ from django.contrib import admin
 from import_export import resources, fields
 from import_export.admin import ImportMixin
 from import_export.widgets import ForeignKeyWidget
-from datetime import datetime, date
-from django.utils.html import format_html
+from import_export.results import RowResult
+from django.utils.html import format_html, format_html_join
 from django.contrib import messages
 from django.urls import path, reverse
 from django.shortcuts import redirect
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from django.http import HttpResponse
-from .models import OrdenTrabajo, Actividad, OrdenBorrador, OrdenPendiente, OrdenHistorial, BitacoraActividad, Evidencia
+from django.http import FileResponse, QueryDict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import OrdenTrabajo, Actividad, OrdenBorrador, OrdenPendiente, OrdenHistorial, BitacoraActividad, Evidencia, TareaFondo
+from .models import OrdenArchivada, ActividadArchivada, EvidenciaArchivada
 from django.contrib.auth.models import User, Group 
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.contrib.admin import helpers
+from .exportacion import generar_reporte_cierre
+from .tareas import encolar
+from .importacion import renombrar_encabezados_sap, datos_orden_sap, numeros_archivados
+from .tiempos import a_segundos, a_hhmmss
+from .asignacion import asignar_ordenes, AsignacionInvalida
+from .paginacion import PaginadorEstimado
+from .busqueda import buscar_ordenes
 
 # ==========================================
 # CEREBRO DE PERMISOS (LOS 3 ROLES)
@@ -28,6 +36,13 @@ class PlanificadorPermisosMixin:
     def has_add_permission(self, request): return request.user.is_staff
     def has_delete_permission(self, request, obj=None): return request.user.is_staff
 
+class BusquedaOrdenesMixin:
+    # El buscador del changelist usa ordenes/busqueda.py (full-text + trigram en Postgres)
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return buscar_ordenes(search_term, queryset), False
+
 class PlanificadorInlinePermisosMixin:
     def has_view_permission(self, request, obj=None): return request.user.is_staff
     def has_change_permission(self, request, obj=None): return request.user.is_staff
@@ -57,52 +72,21 @@ class ActividadResource(resources.ModelResource):
         fields = ('orden', 'codigo_operacion', 'descripcion', 'puesto_trabajo')
 
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        new_headers = []
-        desc_count = 0
-        for header in dataset.headers:
-            if header == 'Descripción':
-                desc_count += 1
-                if desc_count == 1: new_headers.append('desc_equipo_sap')
-                elif desc_count == 2: new_headers.append('desc_ubicacion_sap')
-                else: new_headers.append(header)
-            else:
-                new_headers.append(header)
-        dataset.headers = new_headers
+        dataset.headers = renombrar_encabezados_sap(dataset.headers)
+        self.archivadas = numeros_archivados(dataset['Orden']) if 'Orden' in dataset.headers else set()
+
+    def import_row(self, row, instance_loader, **kwargs):
+        # Una orden archivada no se vuelve a crear como borrador: la fila se omite
+        if str(row.get('Orden')) in getattr(self, 'archivadas', ()):
+            resultado = self.get_row_result_class()()
+            resultado.import_type = RowResult.IMPORT_TYPE_SKIP
+            return resultado
+        return super().import_row(row, instance_loader, **kwargs)
 
     def before_import_row(self, row, **kwargs):
-        numero_orden_excel = row.get('Orden')
-        
-        def parse_fecha_inteligente(valor):
-            if not valor: return None
-            if isinstance(valor, (datetime, date)): return valor
-            try: return datetime.strptime(str(valor).strip(), '%d/%m/%Y').date()
-            except: 
-                try: return datetime.strptime(str(valor).strip().split(' ')[0], '%Y-%m-%d').date()
-                except: return None
-
-        fecha_inicio = parse_fecha_inteligente(row.get('Fe.inic.extrema'))
-        fecha_fin = parse_fecha_inteligente(row.get('Fe.fin extrema'))
-
-        prioridad_excel = str(row.get('Prioridad', '')).strip()
-        prioridad_db = '4' 
-        
-        if prioridad_excel and prioridad_excel[0] in ['1', '2', '3', '4']:
-            prioridad_db = prioridad_excel[0]
-        
         OrdenTrabajo.objects.update_or_create(
-            numero_orden=numero_orden_excel,
-            defaults={
-                'descripcion': row.get('Texto breve'),
-                'equipo': row.get('Equipo'),
-                'descripcion_equipo': row.get('desc_equipo_sap'),
-                'ubicacion': row.get('Ubic.técn.'),
-                'ubicacion_tecnica': row.get('desc_ubicacion_sap'),
-                'inicio_programado': fecha_inicio,
-                'fin_programado': fecha_fin,
-                'estado': 'BORRADOR',
-                'prioridad': prioridad_db,
-                'supervisor': self.user
-            }
+            numero_orden=row.get('Orden'),
+            defaults=datos_orden_sap(row, self.user)
         )
 
 # -----------------------
@@ -132,18 +116,20 @@ class EvidenciaInline(PlanificadorInlinePermisosMixin, admin.StackedInline):
     def ver_foto(self, obj):
         if obj.foto and hasattr(obj.foto, 'url'):
             from django.utils.html import format_html
+            # La miniatura pesa unos KB; la foto completa se abre solo al hacer clic
+            vista = obj.miniatura.url if obj.miniatura else obj.foto.url
             return format_html(
                 '<a href="{0}" target="_blank">'
-                '<img src="{0}" style="height: 250px; border-radius: 8px; border: 2px solid #ddd; box-shadow: 2px 2px 5px rgba(0,0,0,0.1);"/>'
+                '<img src="{1}" loading="lazy" style="height: 160px; border-radius: 8px; border: 2px solid #ddd; box-shadow: 2px 2px 5px rgba(0,0,0,0.1);"/>'
                 '</a>', 
-                obj.foto.url
+                obj.foto.url, vista
             )
         return "Sin imagen"
 
     ver_foto.short_description = "Vista Previa de la Imagen"
 
 @admin.register(OrdenBorrador)
-class OrdenBorradorAdmin(ImportMixin, PlanificadorPermisosMixin, admin.ModelAdmin):
+class OrdenBorradorAdmin(ImportMixin, BusquedaOrdenesMixin, PlanificadorPermisosMixin, admin.ModelAdmin):
     resource_class = ActividadResource
     
     list_display = (
@@ -159,6 +145,9 @@ class OrdenBorradorAdmin(ImportMixin, PlanificadorPermisosMixin, admin.ModelAdmi
     search_fields = ('numero_orden', 'descripcion', 'codigo_trabajador')
     ordering = ('-id',)
     inlines = [ActividadInline, EvidenciaInline]
+    # Campo de id en vez de un <select> con todos los usuarios. No autocomplete_fields:
+    # su búsqueda pasa por el admin de User, que es solo para superusuarios (403 al planificador)
+    raw_id_fields = ('supervisor',)
 
     class Media:
         css = { 'all': ('css/flotante.css',) }
@@ -170,18 +159,24 @@ class OrdenBorradorAdmin(ImportMixin, PlanificadorPermisosMixin, admin.ModelAdmi
     
     @admin.action(description="✅ Aprobar masivamente")
     def aprobar_masivamente(self, request, queryset):
-        seleccionados = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+        seleccionados = set(request.POST.getlist(helpers.ACTION_CHECKBOX_NAME))
         total_forms = int(request.POST.get('form-TOTAL_FORMS', 0))
-        
+
+        # Los códigos editados en la lista: solo se leen del POST, se aplican todos juntos
+        codigos = {}
         for i in range(total_forms):
             orden_id = request.POST.get(f'form-{i}-id')
             codigo = request.POST.get(f'form-{i}-codigo_trabajador')
-            
             if orden_id in seleccionados and codigo is not None:
-                queryset.model.objects.filter(id=orden_id).update(codigo_trabajador=codigo.strip())
+                codigos[orden_id] = codigo
 
-        queryset.update(estado='PENDIENTE')
-        self.message_user(request, f"¡Éxito! Se aprobaron y enviaron {queryset.count()} órdenes.", messages.SUCCESS)
+        # El queryset filtra BORRADOR y la selección; ver ordenes/asignacion.py
+        try:
+            resumen = asignar_ordenes(queryset.values_list('pk', flat=True), codigos, aprobar=True)
+        except AsignacionInvalida as e:
+            self.message_user(request, f"No se aprobó ninguna orden. {e}", messages.ERROR)
+            return
+        self.message_user(request, f"¡Éxito! Se aprobaron y enviaron {resumen['aprobadas']} órdenes.", messages.SUCCESS)
 
     actions = ['aprobar_masivamente']
 
@@ -250,10 +245,11 @@ class OrdenBorradorAdmin(ImportMixin, PlanificadorPermisosMixin, admin.ModelAdmi
 # PANTALLA 2: PENDIENTES
 # -----------------------
 @admin.register(OrdenPendiente)
-class OrdenPendienteAdmin(PlanificadorPermisosMixin, admin.ModelAdmin):
+class OrdenPendienteAdmin(BusquedaOrdenesMixin, PlanificadorPermisosMixin, admin.ModelAdmin):
     list_display = ('numero_orden', 'descripcion', 'codigo_trabajador', 'prioridad', 'ver_equipo_simple')
     search_fields = ('numero_orden', 'codigo_trabajador')
     inlines = [ActividadInline, EvidenciaInline]
+    raw_id_fields = ('supervisor',)
     
     def get_queryset(self, request):
         return super().get_queryset(request).filter(estado='PENDIENTE')
@@ -271,7 +267,33 @@ class OrdenPendienteAdmin(PlanificadorPermisosMixin, admin.ModelAdmin):
 # PANTALLA 3: HISTORIAL
 # ----------------------
 
-class ActividadHistorialInline(PlanificadorInlinePermisosMixin, admin.StackedInline):
+# Una orden vieja puede tener cientos de operaciones y fotos: el detalle se muestra
+# por páginas (?pagina=N) en vez de armar todos los formularios juntos
+POR_PAGINA_DETALLE = 20
+
+
+def pagina_detalle(request):
+    try:
+        return max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        return 1
+
+
+class InlinePaginadoMixin:
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        inicio = (pagina_detalle(request) - 1) * POR_PAGINA_DETALLE
+
+        class FormsetPagina(formset):
+            def get_queryset(self):
+                if not hasattr(self, '_pagina'):
+                    self._pagina = super().get_queryset().order_by('id')[inicio:inicio + POR_PAGINA_DETALLE]
+                return self._pagina
+
+        return FormsetPagina
+
+
+class ActividadHistorialInline(InlinePaginadoMixin, PlanificadorInlinePermisosMixin, admin.StackedInline):
     model = Actividad
     fk_name = 'orden'
     extra = 0
@@ -284,40 +306,83 @@ class ActividadHistorialInline(PlanificadorInlinePermisosMixin, admin.StackedInl
     fields = ('codigo_operacion', 'descripcion', 'nombre_ejecutor', 'fecha_inicio_real', 'fecha_fin_real', 'tiempo_legible', 'tiempo_pausas_legible')
     
     def tiempo_legible(self, obj):
-        if not obj.tiempo_real_acumulado: return "00:00:00"
-        try:
-            if hasattr(obj.tiempo_real_acumulado, 'total_seconds'):
-                ts = int(obj.tiempo_real_acumulado.total_seconds())
-            else:
-                ts = int(obj.tiempo_real_acumulado) // 1000000
-            horas, rem = divmod(ts, 3600)
-            minutos, segundos = divmod(rem, 60)
-            return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
-        except Exception: return str(obj.tiempo_real_acumulado)
+        return a_hhmmss(a_segundos(obj.tiempo_real_acumulado))
     tiempo_legible.short_description = "Tiempo Activo Real"
 
     def tiempo_pausas_legible(self, obj):
-        if not obj.tiempo_pausas: return "00:00:00"
-        try:
-            if hasattr(obj.tiempo_pausas, 'total_seconds'):
-                ts = int(obj.tiempo_pausas.total_seconds())
-            else:
-                ts = int(obj.tiempo_pausas) // 1000000
-            horas, rem = divmod(ts, 3600)
-            minutos, segundos = divmod(rem, 60)
-            return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
-        except Exception: return str(obj.tiempo_pausas)
+        return a_hhmmss(a_segundos(obj.tiempo_pausas))
     tiempo_pausas_legible.short_description = "Tiempo Total en Pausa"
 
     def has_add_permission(self, request, obj): return False
 
+class EvidenciaHistorialInline(InlinePaginadoMixin, EvidenciaInline):
+    pass
+
+class DetallePaginadoMixin:
+    # Enlaces a las páginas de operaciones y fotos (ver InlinePaginadoMixin)
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            obj._pagina_detalle = pagina_detalle(request)
+            # Los enlaces conservan el resto de la consulta (ej: _changelist_filters para volver al listado filtrado)
+            obj._consulta_detalle = request.GET.copy()
+        return obj
+
+    def paginas_detalle(self, obj):
+        pagina = getattr(obj, '_pagina_detalle', 1)
+        actividades = obj.actividades.count()
+        fotos = obj.evidencias.count()
+        paginas = max((max(actividades, fotos) - 1) // POR_PAGINA_DETALLE + 1, 1)
+
+        def enlace(n):
+            consulta = getattr(obj, '_consulta_detalle', QueryDict(mutable=True)).copy()
+            consulta['pagina'] = n
+            return '?' + consulta.urlencode()
+
+        enlaces = format_html_join(' ', '<a href="{0}" style="{2}">{1}</a>', (
+            (enlace(n), n, 'font-weight: bold; text-decoration: underline;' if n == pagina else '')
+            for n in range(1, paginas + 1)
+        ))
+        return format_html(
+            "{} operaciones y {} fotos, de a {} por página. Página: {}",
+            actividades, fotos, POR_PAGINA_DETALLE, enlaces,
+        )
+    paginas_detalle.short_description = "Detalle"
+
+class ExportarCierreMixin:
+    # Mismo reporte de cierre para el Historial y el Historial Archivado
+    exportar_archivadas = False
+
+    @admin.action(description="📥 Exportar datos (Excel .xlsx)")
+    def exportar_sap(self, request, queryset):
+        # El libro se arma en un archivo temporal (write_only) y se envía por partes
+        archivo = generar_reporte_cierre(queryset)
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename='Reporte_Cierre.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    @admin.action(description="⏳ Exportar en segundo plano (muchas órdenes)")
+    def exportar_sap_segundo_plano(self, request, queryset):
+        ids = list(queryset.values_list('id', flat=True))
+        parametros = {'ordenes': ids, 'archivadas': True} if self.exportar_archivadas else {'ordenes': ids}
+        tarea = encolar('EXPORTAR_CIERRE', usuario=request.user, parametros=parametros)
+        url = reverse('admin:ordenes_tareafondo_change', args=[tarea.pk])
+        self.message_user(request, format_html('Exportación de {} órdenes en cola. <a href="{}">Ver progreso y descargar</a>', len(ids), url), messages.INFO)
+
 @admin.register(OrdenHistorial)
-class OrdenHistorialAdmin(PlanificadorPermisosMixin, admin.ModelAdmin):
+class OrdenHistorialAdmin(ExportarCierreMixin, DetallePaginadoMixin, BusquedaOrdenesMixin, PlanificadorPermisosMixin, admin.ModelAdmin):
     list_display = ('numero_orden', 'descripcion', 'codigo_trabajador', 'equipo', 'estado')
     search_fields = ('numero_orden', 'codigo_trabajador', 'equipo')
     list_filter = ('fin_programado',) 
     
-    inlines = [ActividadHistorialInline, EvidenciaInline]
+    inlines = [ActividadHistorialInline, EvidenciaHistorialInline]
+
+    # Tabla grande: total estimado (ver ordenes/paginacion.py) y sin el segundo COUNT(*) del total sin filtrar
+    paginator = PaginadorEstimado
+    show_full_result_count = False
 
     @admin.action(description="🗑️ Eliminar órdenes seleccionadas")
     def eliminar_ordenes_seleccionadas(self, request, queryset): 
@@ -325,111 +390,146 @@ class OrdenHistorialAdmin(PlanificadorPermisosMixin, admin.ModelAdmin):
         queryset.delete()
         self.message_user(request, f"Se eliminaron {cantidad} órdenes correctamente.") 
 
-    @admin.action(description="📥 Exportar datos (Excel .xlsx)")
-    def exportar_sap(self, request, queryset):
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="Reporte_Cierre.xlsx"'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Cierre de Órdenes"
-        ws.sheet_view.showGridLines = False
-
-        header_fill = PatternFill(start_color="4F4F4F", end_color="4F4F4F", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        center_alignment = Alignment(horizontal="center", vertical="center")
-        borde_delgado = Border(left=Side(style='thin', color='000000'), right=Side(style='thin', color='000000'), top=Side(style='thin', color='000000'), bottom=Side(style='thin', color='000000'))
-
-        headers = [
-            'Orden', 'Operación', 'Txt.brv.oper.', 'Equipo', 
-            'Ubicación Téc.', 'Inicio Prog.', 'Fin Prog.',
-            'Ejecutor Real', 'Inicio Real', 'Fin Real', 
-            'Tiempo Activo (HH:MM:SS)', 'Total Horas (Decimal)',
-            'Tiempo en Pausa (HH:MM:SS)', 'Pausas Horas (Decimal)'
-        ]
-        ws.append(headers)
-
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_alignment
-            cell.border = borde_delgado
-
-        def formatear_tiempo(valor):
-            if not valor: return "00:00:00"
-            try:
-                if hasattr(valor, 'total_seconds'):
-                    ts = int(valor.total_seconds())
-                elif str(valor).isdigit():
-                    ts = int(valor) // 1000000
-                else: return str(valor)
-                horas, rem = divmod(ts, 3600)
-                minutos, segundos = divmod(rem, 60)
-                return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
-            except Exception: return str(valor)
-
-        def calcular_decimal(valor_texto):
-            if not valor_texto or valor_texto == "00:00:00" or valor_texto == "-": return 0.0
-            try:
-                partes = str(valor_texto).split(':')
-                if len(partes) == 3:
-                    h, m, s = map(float, partes)
-                    return round(h + (m / 60.0) + (s / 3600.0), 2)
-                return 0.0
-            except: return 0.0
-
-        for orden in queryset:
-            actividades = Actividad.objects.filter(orden=orden)
-            for act in actividades:
-                t_activo_txt = formatear_tiempo(act.tiempo_real_acumulado)
-                t_pausa_txt = formatear_tiempo(act.tiempo_pausas)
-                
-                t_activo_dec = calcular_decimal(t_activo_txt)
-                t_pausa_dec = calcular_decimal(t_pausa_txt)
-
-                inicio_real = act.fecha_inicio_real.strftime('%d/%m/%Y %H:%M') if act.fecha_inicio_real else '-'
-                fin_real = act.fecha_fin_real.strftime('%d/%m/%Y %H:%M') if act.fecha_fin_real else '-'
-                inicio_prog = orden.inicio_programado.strftime('%d/%m/%Y') if orden.inicio_programado else '-'
-                fin_prog = orden.fin_programado.strftime('%d/%m/%Y') if orden.fin_programado else '-'
-
-                fila = [
-                    orden.numero_orden, act.codigo_operacion, act.descripcion,
-                    orden.equipo, orden.ubicacion, inicio_prog, fin_prog,
-                    act.nombre_ejecutor or '-', inicio_real, fin_real,
-                    t_activo_txt, t_activo_dec,
-                    t_pausa_txt, t_pausa_dec
-                ]
-                ws.append(fila)
-
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                cell.border = borde_delgado
-                if cell.column >= 6: cell.alignment = center_alignment
-                try:
-                    if len(str(cell.value)) > max_length: max_length = len(str(cell.value))
-                except: pass
-            ws.column_dimensions[column].width = (max_length + 2)
-
-        wb.save(response)
-        return response
-
-    actions = ['exportar_sap', 'eliminar_ordenes_seleccionadas']
-
-    def get_readonly_fields(self, request, obj=None): return [f.name for f in self.model._meta.fields]
+    actions = ['exportar_sap', 'exportar_sap_segundo_plano', 'eliminar_ordenes_seleccionadas']
+
+    def get_readonly_fields(self, request, obj=None): return [f.name for f in self.model._meta.fields] + ['paginas_detalle']
     def has_add_permission(self, request): return False 
     def has_delete_permission(self, request, obj=None): return False 
 
     def get_queryset(self, request):
         return super().get_queryset(request).filter(estado='FINALIZADA')
 
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Enlaces guardados a una orden que ya pasó al archivo (ver ordenes/archivo.py)
+        if object_id.isdigit() and not self.get_queryset(request).filter(pk=object_id).exists():
+            if OrdenArchivada.objects.filter(pk=object_id).exists():
+                return redirect('admin:ordenes_ordenarchivada_change', object_id)
+        return super().change_view(request, object_id, form_url, extra_context)
+
     fields = (
         'numero_orden', 'descripcion', 'equipo', 'descripcion_equipo', 
         'ubicacion', 'ubicacion_tecnica', 'inicio_programado', 'fin_programado', 
-        'prioridad', 'codigo_trabajador', 'supervisor', 'estado'
+        'prioridad', 'codigo_trabajador', 'supervisor', 'estado', 'paginas_detalle'
+    )
+
+# ---------------------------------
+# PANTALLA 3.1: HISTORIAL ARCHIVADO
+# ---------------------------------
+# Órdenes finalizadas viejas, fuera de las tablas del trabajo diario (ver ordenes/archivo.py).
+# Solo lectura: sin permiso de cambio el admin muestra todo como texto.
+class ActividadArchivadaInline(ActividadHistorialInline):
+    model = ActividadArchivada
+    readonly_fields = ActividadHistorialInline.readonly_fields + ('ver_bitacora',)
+    fields = ActividadHistorialInline.fields + ('ver_bitacora',)
+
+    def ver_bitacora(self, obj):
+        if not obj.bitacora:
+            return "-"
+        return format_html_join(' → ', '{} <small>({})</small>', (
+            (evento['evento'], timezone.localtime(parse_datetime(evento['fecha_hora'])).strftime('%d/%m/%Y %H:%M'))
+            for evento in obj.bitacora
+        ))
+    ver_bitacora.short_description = "Bitácora"
+
+    def has_change_permission(self, request, obj=None): return False
+
+class EvidenciaArchivadaInline(EvidenciaHistorialInline):
+    model = EvidenciaArchivada
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None): return False
+    def has_change_permission(self, request, obj=None): return False
+
+@admin.register(OrdenArchivada)
+class OrdenArchivadaAdmin(ExportarCierreMixin, DetallePaginadoMixin, PlanificadorPermisosMixin, admin.ModelAdmin):
+    list_display = ('numero_orden', 'descripcion', 'codigo_trabajador', 'equipo', 'mes')
+    # icontains sobre índices trigram en Postgres (migración 0031_indices_archivo)
+    search_fields = ('numero_orden', 'codigo_trabajador', 'equipo')
+    date_hierarchy = 'mes'
+    ordering = ('-id',)
+    inlines = [ActividadArchivadaInline, EvidenciaArchivadaInline]
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    exportar_archivadas = True
+    actions = ['exportar_sap', 'exportar_sap_segundo_plano']
+
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+    def has_delete_permission(self, request, obj=None): return False
+
+    fields = (
+        'numero_orden', 'descripcion', 'equipo', 'descripcion_equipo',
+        'ubicacion', 'ubicacion_tecnica', 'inicio_programado', 'fin_programado',
+        'prioridad', 'codigo_trabajador', 'supervisor', 'fecha_fin_real', 'mes', 'fecha_archivo', 'paginas_detalle'
     )
 
+# ---------------------------------
+# PANTALLA 4: TAREAS EN SEGUNDO PLANO
+# ---------------------------------
+@admin.register(TareaFondo)
+class TareaFondoAdmin(PlanificadorPermisosMixin, admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'estado', 'ver_progreso', 'usuario', 'fecha_creacion', 'boton_descarga')
+    list_filter = ('tipo', 'estado')
+    ordering = ('-id',)
+    list_select_related = ('usuario',)
+
+    def get_fields(self, request, obj=None):
+        # Al crear solo se sube el Excel de SAP; las exportaciones se piden desde el Historial
+        if obj is None: return ('archivo_entrada',)
+        return ('tipo', 'estado', 'ver_progreso', 'mensaje', 'archivo_entrada', 'boton_descarga', 'usuario', 'fecha_creacion', 'fecha_inicio', 'fecha_fin')
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None: return ()
+        return self.get_fields(request, obj)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj is None:
+            form.base_fields['archivo_entrada'].required = True
+            form.base_fields['archivo_entrada'].help_text = "Excel exportado de SAP (.xlsx). Se importa en segundo plano como en 'Borradores'."
+        return form
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.tipo = 'IMPORTAR_SAP'
+            obj.usuario = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_urls(self):
+        custom_urls = [
+            path('<int:tarea_id>/descargar/', self.admin_site.admin_view(self.descargar_resultado), name='ordenes_tareafondo_descargar'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def descargar_resultado(self, request, tarea_id):
+        tarea = self.get_object(request, str(tarea_id))
+        if not tarea or not tarea.archivo_resultado:
+            self.message_user(request, "Esta tarea no tiene archivo para descargar.", messages.WARNING)
+            return redirect('admin:ordenes_tareafondo_changelist')
+        return FileResponse(tarea.archivo_resultado.open('rb'), as_attachment=True, filename=tarea.archivo_resultado.name.split('/')[-1])
+
+    def ver_progreso(self, obj):
+        color = {'FALLIDA': '#dc3545', 'COMPLETADA': '#28a745'}.get(obj.estado, '#EF7D00')
+        return format_html(
+            '<div style="width: 120px; background: #ddd; border-radius: 4px;">'
+            '<div style="width: {}%; background: {}; color: white; text-align: center; border-radius: 4px; font-size: 11px;">{}%</div>'
+            '</div>',
+            obj.progreso, color, obj.progreso
+        )
+    ver_progreso.short_description = "Progreso"
+
+    def boton_descarga(self, obj):
+        if obj.archivo_resultado:
+            return format_html(
+                '<a style="background-color: #28a745; color: white; padding: 4px 10px; border-radius: 4px; text-decoration: none;" href="{}">📥 Descargar</a>',
+                reverse('admin:ordenes_tareafondo_descargar', args=[obj.pk])
+            )
+        return "-"
+    boton_descarga.short_description = "Resultado"
+
 # -------------------------
 # LIMPIEZA TOTAL DE UI FEA
 # -------------------------
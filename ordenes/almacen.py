@@ -0,0 +1,122 @@
+import hashlib
+import os
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ArchivoFoto, Evidencia, EvidenciaArchivada
+
+# ==========================================
+# ALMACÉN DE FOTOS POR CONTENIDO (SIN DUPLICADOS)
+# Cada foto se identifica por el sha256 de lo que se subió. Si llega otra vez
+# (reintento offline, el operario que la manda dos veces) la nueva Evidencia
+# apunta al mismo ArchivoFoto y no se escribe nada nuevo en disco.
+# - guardar_foto() suma una referencia; liberar_archivo() (al borrar la Evidencia,
+#   también en cascada desde la orden) la resta y borra los archivos al llegar a 0.
+# - Los archivos se borran recién después del COMMIT; y como el nombre lleva el id
+#   del ArchivoFoto, una subida nueva del mismo contenido nunca reutiliza la ruta.
+# ==========================================
+BLOQUE = 1024 * 1024
+
+
+def sha256_archivo(archivo):
+    resumen = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in archivo.chunks(BLOQUE) if hasattr(archivo, 'chunks') else iter(lambda: archivo.read(BLOQUE), b''):
+        resumen.update(bloque)
+    archivo.seek(0)
+    return resumen.hexdigest()
+
+
+def nombre_por_contenido(sha256, pk, extension, sufijo=''):
+    # evidencias/archivos/ab/abcdef..._42.jpg: carpetas de a 256 para no tener miles de archivos juntos
+    return f"{sha256[:2]}/{sha256}_{pk}{sufijo}{extension.lower() or '.jpg'}"
+
+
+def _obtener_o_crear(sha256, archivo, nombre_original):
+    for _ in range(2):
+        existente = ArchivoFoto.objects.select_for_update().filter(sha256=sha256).first()
+        if existente is not None:
+            return existente
+        try:
+            with transaction.atomic():
+                nuevo = ArchivoFoto.objects.create(sha256=sha256, tamano=archivo.size or 0)
+                extension = os.path.splitext(nombre_original)[1]
+                nuevo.archivo.save(nombre_por_contenido(sha256, nuevo.pk, extension), archivo, save=True)
+                return nuevo
+        except IntegrityError:
+            # Otra petición guardó el mismo contenido al mismo tiempo: se usa el suyo
+            continue
+    return ArchivoFoto.objects.select_for_update().get(sha256=sha256)
+
+
+def guardar_foto(evidencia, archivo, nombre_original=None):
+    # Llamar dentro de transaction.atomic() junto con evidencia.save()
+    sha256 = sha256_archivo(archivo)
+    blob = _obtener_o_crear(sha256, archivo, nombre_original or getattr(archivo, 'name', '') or '')
+    ArchivoFoto.objects.filter(pk=blob.pk).update(referencias=F('referencias') + 1)
+    evidencia.archivo = blob
+    evidencia.foto.name = blob.archivo.name
+    evidencia.miniatura.name = blob.miniatura.name or None
+    evidencia.procesada = blob.procesado
+    return blob
+
+
+def _borrar_archivos(storage, nombres):
+    for nombre in nombres:
+        if nombre:
+            storage.delete(nombre)
+
+
+def contar_referencias(archivo_id):
+    return (
+        Evidencia.objects.filter(archivo_id=archivo_id).count()
+        + EvidenciaArchivada.objects.filter(archivo_id=archivo_id).count()
+    )
+
+
+def liberar_archivo(archivo_id):
+    if archivo_id is None:
+        return
+    with transaction.atomic():
+        blob = ArchivoFoto.objects.select_for_update().filter(pk=archivo_id).first()
+        if blob is None:
+            return
+        # Se recuenta en vez de restar: así un contador desfasado se corrige solo.
+        # Las evidencias de órdenes archivadas (ver ordenes/archivo.py) también lo usan.
+        referencias = contar_referencias(archivo_id)
+        if referencias:
+            ArchivoFoto.objects.filter(pk=archivo_id).update(referencias=referencias)
+            return
+        nombres = [blob.archivo.name, blob.miniatura.name]
+        storage = blob.archivo.storage
+        blob.delete()
+        transaction.on_commit(lambda: _borrar_archivos(storage, nombres))
+
+
+def adoptar_archivo(evidencia):
+    # Evidencias subidas antes del almacén por contenido: su archivo pasa a ser un ArchivoFoto
+    # (o, si ese contenido ya existe, se apunta al existente y los archivos propios sobran)
+    campo = evidencia.foto
+    with campo.open('rb') as archivo:
+        sha256 = sha256_archivo(archivo)
+    with transaction.atomic():
+        blob = ArchivoFoto.objects.select_for_update().filter(sha256=sha256).first()
+        sobrantes = []
+        if blob is None:
+            blob = ArchivoFoto.objects.create(
+                sha256=sha256, archivo=campo.name, tamano=campo.size, referencias=0,
+                miniatura=evidencia.miniatura.name or '', procesado=evidencia.procesada and bool(evidencia.miniatura),
+            )
+        else:
+            sobrantes = [n for n in (campo.name, evidencia.miniatura.name) if n and n not in (blob.archivo.name, blob.miniatura.name)]
+        ArchivoFoto.objects.filter(pk=blob.pk).update(referencias=F('referencias') + 1)
+        Evidencia.objects.filter(pk=evidencia.pk).update(
+            archivo=blob, foto=blob.archivo.name, miniatura=blob.miniatura.name, procesada=blob.procesado, fecha_modificacion=timezone.now()
+        )
+        evidencia.archivo, evidencia.foto.name, evidencia.miniatura.name = blob, blob.archivo.name, blob.miniatura.name
+        evidencia.procesada = blob.procesado
+        sobrantes = [n for n in sobrantes if not Evidencia.objects.filter(Q(foto=n) | Q(miniatura=n)).exists()]
+        if sobrantes:
+            storage = campo.storage
+            transaction.on_commit(lambda: _borrar_archivos(storage, sobrantes))
+    return blob
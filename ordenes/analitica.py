@@ -0,0 +1,202 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, DurationField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from .filtros import filtrar_rangos_fecha
+from .models import Actividad, BitacoraActividad, Eliminacion, OrdenTrabajo
+from .tiempos import a_segundos
+
+# ==========================================
+# ANALÍTICA DE MANTENIMIENTO (GET /api/analitica/)
+# Todo sale de GROUP BY sobre las actividades finalizadas:
+# - tiempo activo / en pausa (totales y promedios), cantidad de actividades y órdenes
+# - MTTR: promedio de (fin real - inicio real) de cada operación
+# - wrench time: tiempo activo / tiempo transcurrido entre inicio y fin
+# - percentiles del tiempo activo (percentile_cont en Postgres)
+# - cantidad de pausas, contando eventos PAUSA de la bitácora
+# Las respuestas se cachean por combinación de parámetros; la clave incluye la
+# última modificación de los datos, así que un cambio invalida solo.
+# ==========================================
+VIGENCIA_CACHE = getattr(settings, 'ANALITICA_CACHE_SEGUNDOS', 300)
+
+# ?agrupar=equipo,trabajador -> campo de Actividad
+DIMENSIONES = {
+    'equipo': 'orden__equipo',
+    'ubicacion': 'orden__ubicacion',
+    'puesto_trabajo': 'puesto_trabajo',
+    'trabajador': 'orden__codigo_trabajador',
+}
+# ?tramo=mes -> truncado de fecha_fin_real
+TRAMOS = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+PERCENTILES = (0.5, 0.9)
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+class Percentil(Aggregate):
+    # percentile_cont(0.9) WITHIN GROUP (ORDER BY ...): solo existe en Postgres
+    function = 'percentile_cont'
+    template = '%(function)s(%(fraccion)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expresion, fraccion, **extra):
+        super().__init__(expresion, fraccion=float(fraccion), output_field=DurationField(), **extra)
+
+
+def _leer_lista(valor, permitidos, nombre):
+    elegidos = [v.strip() for v in (valor or '').split(',') if v.strip()]
+    desconocidos = [v for v in elegidos if v not in permitidos]
+    if desconocidos:
+        raise ParametroInvalido(f"{nombre} no soportado: {', '.join(desconocidos)} (use {', '.join(permitidos)})")
+    return elegidos
+
+
+def _agrupacion(params, prefijo=''):
+    # Expresiones del GROUP BY; con prefijo='actividad__' sirven para la bitácora.
+    # Van con alias "grupo_" porque algunos nombres chocan con campos (puesto_trabajo).
+    columnas = {
+        f'grupo_{nombre}': F(prefijo + DIMENSIONES[nombre])
+        for nombre in _leer_lista(params.get('agrupar'), DIMENSIONES, 'agrupar')
+    }
+    tramo = _leer_lista(params.get('tramo'), TRAMOS, 'tramo')
+    if len(tramo) > 1:
+        raise ParametroInvalido("tramo acepta un solo valor")
+    if tramo:
+        columnas['grupo_tramo'] = TRAMOS[tramo[0]](prefijo + 'fecha_fin_real')
+    return columnas
+
+
+def actividades_filtradas(params):
+    actividades = Actividad.objects.filter(finished=True)
+    for nombre, campo in DIMENSIONES.items():
+        valor = (params.get(nombre) or '').strip()
+        if valor:
+            actividades = actividades.filter(**{campo: valor})
+    # ?cierre_desde=2026-01-01&cierre_hasta=2026-03-31 (igual que en /api/ordenes/)
+    actividades = filtrar_rangos_fecha(actividades, params, {'cierre': 'fecha_fin_real'})
+    if params.get('tramo'):
+        actividades = actividades.exclude(fecha_fin_real__isnull=True)
+    return actividades
+
+
+def _metricas_sql():
+    transcurrido = ExpressionWrapper(F('fecha_fin_real') - F('fecha_inicio_real'), output_field=DurationField())
+    metricas = {
+        'actividades': Count('id'),
+        'ordenes': Count('orden', distinct=True),
+        'activo_total': Sum('tiempo_real_acumulado'),
+        'activo_promedio': Avg('tiempo_real_acumulado'),
+        'pausa_total': Sum('tiempo_pausas'),
+        'pausa_promedio': Avg('tiempo_pausas'),
+        'transcurrido_total': Sum(transcurrido),
+        'mttr': Avg(transcurrido),
+    }
+    if connection.vendor == 'postgresql':
+        for fraccion in PERCENTILES:
+            metricas[f'p{int(fraccion * 100)}'] = Percentil('tiempo_real_acumulado', fraccion)
+    return metricas
+
+
+def _percentiles_en_python(actividades, columnas):
+    # Respaldo para SQLite (desarrollo): un solo recorrido ordenado por grupo y tiempo
+    por_grupo = {}
+    filas = actividades.values_list(*columnas, 'tiempo_real_acumulado') if columnas else actividades.values_list('tiempo_real_acumulado')
+    for fila in filas.order_by(*columnas, 'tiempo_real_acumulado').iterator():
+        por_grupo.setdefault(tuple(fila[:-1]), []).append(fila[-1])
+    resultado = {}
+    for clave, tiempos in por_grupo.items():
+        resultado[clave] = {}
+        for fraccion in PERCENTILES:
+            # Interpolación lineal, igual que percentile_cont
+            posicion = (len(tiempos) - 1) * fraccion
+            abajo = int(posicion)
+            arriba = min(abajo + 1, len(tiempos) - 1)
+            valor = tiempos[abajo] + (tiempos[arriba] - tiempos[abajo]) * (posicion - abajo)
+            resultado[clave][f'p{int(fraccion * 100)}'] = valor
+    return resultado
+
+
+def _serializar(valor):
+    if isinstance(valor, timedelta):
+        return a_segundos(valor)
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def _porcentaje(parte, total):
+    parte, total = a_segundos(parte), a_segundos(total)
+    return round(100 * parte / total, 1) if total else None
+
+
+def calcular_indicadores(params):
+    columnas = _agrupacion(params)
+    nombres = list(columnas)
+    prefijo = len('grupo_')
+    actividades = actividades_filtradas(params)
+
+    if nombres:
+        filas = list(actividades.values(**columnas).annotate(**_metricas_sql()).order_by(*nombres))
+        pausas = dict(
+            (tuple(fila[n] for n in nombres), fila['pausas'])
+            for fila in BitacoraActividad.objects.filter(evento='PAUSA', actividad__in=actividades.values('pk'))
+            .values(**_agrupacion(params, prefijo='actividad__')).annotate(pausas=Count('id')).order_by()
+        )
+    else:
+        filas = [actividades.aggregate(**_metricas_sql())]
+        pausas = {(): BitacoraActividad.objects.filter(evento='PAUSA', actividad__in=actividades.values('pk')).count()}
+
+    percentiles = {}
+    if connection.vendor != 'postgresql':
+        percentiles = _percentiles_en_python(actividades.annotate(**columnas), nombres)
+
+    grupos = []
+    for fila in filas:
+        clave = tuple(fila[n] for n in nombres)
+        fila.update(percentiles.get(clave, {}))
+        grupos.append({
+            **{n[prefijo:]: _serializar(fila[n]) for n in nombres},
+            'actividades': fila['actividades'],
+            'ordenes': fila['ordenes'],
+            'pausas': pausas.get(clave, 0),
+            'activo_total_seg': _serializar(fila['activo_total']) or 0,
+            'activo_promedio_seg': _serializar(fila['activo_promedio']) or 0,
+            'pausa_total_seg': _serializar(fila['pausa_total']) or 0,
+            'pausa_promedio_seg': _serializar(fila['pausa_promedio']) or 0,
+            'mttr_seg': _serializar(fila['mttr']),
+            **{f'activo_p{int(f * 100)}_seg': _serializar(fila.get(f'p{int(f * 100)}')) for f in PERCENTILES},
+            'ratio_pausa_pct': _porcentaje(fila['pausa_total'], (fila['activo_total'] or timedelta(0)) + (fila['pausa_total'] or timedelta(0))),
+            'wrench_time_pct': _porcentaje(fila['activo_total'], fila['transcurrido_total']),
+        })
+    return {'agrupar': [n[prefijo:] for n in nombres], 'grupos': grupos}
+
+
+def _version_datos():
+    # Cuatro MAX() sobre columnas indexadas: baratos comparados con el GROUP BY
+    marcas = [
+        Actividad.objects.aggregate(m=Max('fecha_modificacion'))['m'],
+        OrdenTrabajo.objects.aggregate(m=Max('fecha_modificacion'))['m'],
+        BitacoraActividad.objects.aggregate(m=Max('fecha_modificacion'))['m'],
+        Eliminacion.objects.aggregate(m=Max('fecha'))['m'],
+    ]
+    return '|'.join(m.isoformat() if m else '-' for m in marcas)
+
+
+def indicadores_cacheados(params):
+    parametros = sorted((clave, params.get(clave)) for clave in params)
+    firma = json.dumps([parametros, _version_datos()])
+    clave = 'analitica:' + hashlib.sha256(firma.encode()).hexdigest()
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular_indicadores(params)
+        cache.set(clave, resultado, VIGENCIA_CACHE)
+    return resultado
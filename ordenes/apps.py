@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OrdenesConfig(AppConfig):
     name = 'ordenes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
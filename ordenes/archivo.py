@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    OrdenTrabajo, Actividad, BitacoraActividad, Evidencia, SubidaEvidencia, Eliminacion,
+    OrdenArchivada, ActividadArchivada, EvidenciaArchivada,
+)
+
+# ==========================================
+# ARCHIVO DE ÓRDENES FINALIZADAS
+# Una orden FINALIZADA hace más de ARCHIVO_DIAS pasa, con sus actividades, bitácora
+# y evidencias, a OrdenArchivada / ActividadArchivada / EvidenciaArchivada y se borra
+# de las tablas que consultan la App, la sincronización y los changelists.
+# - Se sigue viendo en el admin ("3.1 Historial Archivado"; los enlaces del Historial
+#   a una orden archivada redirigen ahí) y sale en el mismo reporte de cierre.
+# - Por lotes; cada lote es una transacción: se copia y se borra junto. Los ids se conservan.
+# - Las fotos no se mueven: la EvidenciaArchivada apunta al mismo ArchivoFoto y cuenta
+#   como referencia (ver liberar_archivo). Se espera a que el worker las procese,
+#   porque al procesarlas cambia el nombre del archivo, y a que no haya subidas abiertas.
+# - La App recibe la lápida de la orden (como en una reasignación) y la saca de su caché.
+# - ResumenTrabajadorDia no cambia (reconstruir_kpis suma también lo archivado);
+#   /api/analitica/ calcula sobre las tablas vivas, o sea sobre los últimos ARCHIVO_DIAS.
+# ==========================================
+ANTIGUEDAD_DIAS = getattr(settings, 'ARCHIVO_DIAS', 365)  # 0 = no se archiva
+TAMANO_LOTE = 200
+
+CAMPOS_ORDEN = (
+    'id', 'numero_orden', 'descripcion', 'equipo', 'descripcion_equipo', 'ubicacion', 'ubicacion_tecnica',
+    'fecha_creacion', 'inicio_programado', 'fin_programado', 'prioridad', 'codigo_trabajador', 'supervisor_id',
+    'tiempo_total', 'fecha_fin_real', 'tiempo_pausas_total', 'actividades_finalizadas', 'fecha_modificacion',
+)
+CAMPOS_ACTIVIDAD = (
+    'id', 'orden_id', 'codigo_operacion', 'descripcion', 'puesto_trabajo', 'finished', 'notas_operario',
+    'fecha_inicio_real', 'fecha_fin_real', 'tiempo_real_acumulado', 'tiempo_pausas', 'nombre_ejecutor',
+)
+CAMPOS_EVIDENCIA = (
+    'id', 'orden_id', 'actividad_id', 'foto', 'miniatura', 'tipo', 'descripcion', 'fecha_subida', 'archivo_id',
+)
+
+
+def fecha_corte(dias=None):
+    return timezone.now() - timedelta(days=ANTIGUEDAD_DIAS if dias is None else dias)
+
+
+def archivables(dias=None):
+    corte = fecha_corte(dias)
+    # Las que el worker no pudo procesar no van a cambiar de nombre: no frenan el archivo
+    fotos_sin_procesar = Evidencia.objects.filter(procesada=False, error_procesamiento='').values('orden_id')
+    subidas_abiertas = SubidaEvidencia.objects.filter(estado='ABIERTA').values('orden_id')
+    return (
+        OrdenTrabajo.objects.filter(estado='FINALIZADA')
+        .filter(Q(fecha_fin_real__lt=corte) | Q(fecha_fin_real__isnull=True, fin_programado__lt=corte))
+        .exclude(pk__in=fotos_sin_procesar)
+        .exclude(pk__in=subidas_abiertas)
+    )
+
+
+def mes_de_cierre(orden):
+    fecha = orden['fecha_fin_real'] or orden['fin_programado']
+    return timezone.localdate(fecha).replace(day=1)
+
+
+def archivar_lote(ids):
+    with transaction.atomic():
+        ordenes = list(
+            OrdenTrabajo.objects.select_for_update()
+            .filter(pk__in=ids, estado='FINALIZADA').values(*CAMPOS_ORDEN)
+        )
+        ids = [orden['id'] for orden in ordenes]
+        if not ids:
+            return 0
+
+        bitacoras = {}
+        eventos = (
+            BitacoraActividad.objects.filter(actividad__orden_id__in=ids)
+            .order_by('actividad_id', 'fecha_hora', 'id').values_list('actividad_id', 'evento', 'fecha_hora')
+        )
+        for actividad_id, evento, fecha_hora in eventos.iterator():
+            bitacoras.setdefault(actividad_id, []).append({'evento': evento, 'fecha_hora': fecha_hora})
+
+        OrdenArchivada.objects.bulk_create([OrdenArchivada(mes=mes_de_cierre(orden), **orden) for orden in ordenes])
+        ActividadArchivada.objects.bulk_create([
+            ActividadArchivada(bitacora=bitacoras.get(actividad['id'], []), **actividad)
+            for actividad in Actividad.objects.filter(orden_id__in=ids).values(*CAMPOS_ACTIVIDAD).iterator()
+        ], batch_size=1000)
+        EvidenciaArchivada.objects.bulk_create([
+            EvidenciaArchivada(**evidencia)
+            for evidencia in Evidencia.objects.filter(orden_id__in=ids).values(*CAMPOS_EVIDENCIA).iterator()
+        ], batch_size=1000)
+
+        # Borrado directo, sin cargar las filas ni disparar las señales de signals.py: no hay
+        # que liberar fotos (ahora las referencia el archivo) ni dejar una lápida por cada
+        # actividad, bitácora y foto; alcanza con la de la orden (ver asignacion.py).
+        for queryset in (
+            SubidaEvidencia.objects.filter(orden_id__in=ids),
+            BitacoraActividad.objects.filter(actividad__orden_id__in=ids),
+            Evidencia.objects.filter(orden_id__in=ids),
+            Actividad.objects.filter(orden_id__in=ids),
+            OrdenTrabajo.objects.filter(pk__in=ids),
+        ):
+            queryset._raw_delete(queryset.db)
+        Eliminacion.objects.bulk_create([
+            Eliminacion(modelo='ORDEN', objeto_id=orden['id'], codigo_trabajador=orden['codigo_trabajador']) for orden in ordenes
+        ])
+    return len(ids)
+
+
+def archivar_ordenes(dias=None, lote=TAMANO_LOTE, maximo=None):
+    # Devuelve cuántas órdenes se archivaron; maximo=None sigue hasta que no quede ninguna
+    dias = ANTIGUEDAD_DIAS if dias is None else dias
+    if not dias or dias < 0:
+        return 0
+    total = 0
+    while maximo is None or total < maximo:
+        tope = lote if maximo is None else min(lote, maximo - total)
+        ids = list(archivables(dias).order_by('id').values_list('id', flat=True)[:tope])
+        archivadas = archivar_lote(ids) if ids else 0
+        if not archivadas:
+            break
+        total += archivadas
+    return total
@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+from django.utils import timezone
+from .models import OrdenTrabajo, Eliminacion, AvisoOrden
+from .avisos import avisos_por_cambio
+
+# ==========================================
+# ASIGNACIÓN Y APROBACIÓN MASIVA
+# Lo usan la acción "Aprobar masivamente" del admin y POST /api/asignaciones/.
+# La cantidad de sentencias no depende de cuántas órdenes son (500 de un lote de SAP
+# cuestan lo mismo que 5): un SELECT ... FOR UPDATE de las órdenes, una consulta
+# que valida todos los códigos, un solo UPDATE con CASE por código, y un INSERT
+# de lápidas y otro de avisos (lo que hacen las señales cuando se usa save()).
+# Todo o nada: si un código u orden no es válido no se cambia ninguna.
+# ==========================================
+ESTADOS_ASIGNABLES = ('BORRADOR', 'PENDIENTE')
+MAX_ORDENES_ASIGNACION = 5000
+
+
+class AsignacionInvalida(ValueError):
+    def __init__(self, errores):
+        super().__init__("; ".join(errores))
+        self.errores = errores
+
+
+def codigos_validos(codigos):
+    # Un código vale si es un usuario registrado o si ya viene de SAP en alguna orden
+    # (el operario todavía no se registró; login-operario lo deja hacerlo). Una sola consulta.
+    if not codigos:
+        return set()
+    usuarios = User.objects.filter(username__in=codigos).values_list('username')
+    de_sap = OrdenTrabajo.objects.filter(codigo_trabajador__in=codigos).values_list('codigo_trabajador')
+    return {codigo for (codigo,) in usuarios.union(de_sap)}
+
+
+def ids_por_numero(numeros):
+    return dict(OrdenTrabajo.objects.filter(numero_orden__in=numeros).values_list('numero_orden', 'id'))
+
+
+def asignar_ordenes(ordenes_ids, codigos=None, aprobar=False):
+    # ordenes_ids: órdenes afectadas. codigos: {orden_id: codigo} solo para las que cambian
+    # de operario ('' o None = sin asignar). aprobar: BORRADOR -> PENDIENTE (las demás quedan igual).
+    # Un código puede llegar como número desde un script (1001): se compara como texto
+    codigos = {int(pk): str('' if codigo is None else codigo).strip() or None for pk, codigo in (codigos or {}).items()}
+    ordenes_ids = set(map(int, ordenes_ids)) | set(codigos)
+    if not ordenes_ids:
+        return {'ordenes': 0, 'reasignadas': 0, 'aprobadas': 0}
+
+    with transaction.atomic():
+        actuales = {
+            pk: (codigo, estado)
+            for pk, codigo, estado in OrdenTrabajo.objects.select_for_update()
+            .filter(pk__in=ordenes_ids).values_list('pk', 'codigo_trabajador', 'estado')
+        }
+        errores = []
+        faltan = sorted(ordenes_ids - set(actuales))
+        if faltan:
+            errores.append(f"Órdenes inexistentes: {', '.join(map(str, faltan))}")
+        cerradas = sorted(pk for pk, (_, estado) in actuales.items() if estado not in ESTADOS_ASIGNABLES)
+        if cerradas:
+            errores.append(f"Órdenes finalizadas (no se reasignan): {', '.join(map(str, cerradas))}")
+        pedidos = {codigo for codigo in codigos.values() if codigo}
+        desconocidos = sorted(pedidos - codigos_validos(pedidos))
+        if desconocidos:
+            errores.append(f"Códigos de operario desconocidos: {', '.join(desconocidos)}")
+        if errores:
+            raise AsignacionInvalida(errores)
+
+        despues = {}
+        for pk, (codigo, estado) in actuales.items():
+            nuevo_estado = 'PENDIENTE' if aprobar and estado == 'BORRADOR' else estado
+            despues[pk] = (codigos.get(pk, codigo), nuevo_estado)
+        cambiadas = [pk for pk in actuales if despues[pk] != actuales[pk]]
+        reasignadas = [pk for pk in cambiadas if despues[pk][0] != actuales[pk][0]]
+        aprobadas = [pk for pk in cambiadas if despues[pk][1] != actuales[pk][1]]
+        if not cambiadas:
+            return {'ordenes': len(actuales), 'reasignadas': 0, 'aprobadas': 0}
+
+        campos = {'fecha_modificacion': timezone.now()}
+        if reasignadas:
+            por_codigo = {}
+            for pk in reasignadas:
+                por_codigo.setdefault(despues[pk][0], []).append(pk)
+            # Un WHEN por código distinto, no por orden
+            campos['codigo_trabajador'] = Case(
+                *[When(pk__in=pks, then=Value(codigo)) for codigo, pks in por_codigo.items()],
+                default=F('codigo_trabajador'), output_field=CharField(),
+            )
+        if aprobadas:
+            campos['estado'] = Case(When(pk__in=aprobadas, then=Value('PENDIENTE')), default=F('estado'), output_field=CharField())
+        OrdenTrabajo.objects.filter(pk__in=cambiadas).update(**campos)
+
+        # Lo mismo que registrar_reasignacion / avisar_cambio en signals.py, en bloque
+        Eliminacion.objects.bulk_create([
+            Eliminacion(modelo='ORDEN', objeto_id=pk, codigo_trabajador=actuales[pk][0]) for pk in reasignadas if actuales[pk][0]
+        ])
+        AvisoOrden.objects.bulk_create([
+            aviso for pk in cambiadas for aviso in avisos_por_cambio(pk, actuales[pk], despues[pk])
+        ])
+    return {'ordenes': len(actuales), 'reasignadas': len(reasignadas), 'aprobadas': len(aprobadas)}
@@ -0,0 +1,64 @@
+import hashlib
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+# ==========================================
+# TOKENS CON CACHÉ (CAMBIO DE TURNO)
+# Al empezar el turno decenas de operarios entran en pocos minutos. Con un token
+# válido la App no necesita repetir el login con contraseña (PBKDF2 cuesta cientos
+# de ms de CPU): login-operario / login-app lo aceptan y responden sin tocar la base.
+# token -> usuario se guarda en la caché de Django por VIGENCIA_CACHE segundos.
+# Borrar el token o guardar el usuario (cambio de contraseña, desactivarlo) invalida
+# la entrada. Con la caché por defecto (LocMem, una por proceso) la invalidación llega
+# solo al proceso donde ocurrió: los demás la ven al vencer la entrada, por eso la
+# vigencia es corta (alcanza para el pico del cambio de turno). Con una caché
+# compartida en CACHES (Redis/Memcached) es inmediata en todos y se puede alargar.
+# Un token desconocido o revocado no da 401: la petición sigue como anónima, igual
+# que antes de autenticar con token (las vistas AllowAny responden como siempre).
+# ==========================================
+VIGENCIA_CACHE = getattr(settings, 'TOKEN_CACHE_SEGUNDOS', 30)
+
+
+def clave_cache(key):
+    # La clave del token no se guarda tal cual en la caché
+    return 'token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidar_token(key):
+    cache.delete(clave_cache(key))
+
+
+class TokenCacheado(TokenAuthentication):
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except AuthenticationFailed:
+            return None
+
+    def authenticate_credentials(self, key):
+        clave = clave_cache(key)
+        usuario = cache.get(clave)
+        if usuario is None:
+            token = Token.objects.select_related('user').filter(key=key).first()
+            if token is None:
+                raise AuthenticationFailed('Token inválido.')
+            usuario = token.user
+            cache.set(clave, usuario, VIGENCIA_CACHE)
+        if not usuario.is_active:
+            raise AuthenticationFailed('Usuario inactivo o eliminado.')
+        return usuario, Token(key=key, user=usuario)
+
+
+def sesion_por_token(request):
+    # Para vistas que aceptan el token pero no lo exigen (logins, /media/):
+    # un token vencido o borrado no identifica a nadie. Devuelve (usuario, token) o (None, None).
+    return TokenCacheado().authenticate(request) or (None, None)
+
+
+def buscar_usuario(codigo):
+    # La igualdad exacta usa el índice único de username; iexact recorre la tabla
+    return User.objects.filter(username=codigo).first() or User.objects.filter(username__iexact=codigo).first()
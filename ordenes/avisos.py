@@ -0,0 +1,203 @@
+import asyncio
+import json
+import weakref
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from .models import AvisoOrden
+from .sincronizacion import ESTADOS_VISIBLES_APP
+
+# ==========================================
+# AVISOS EN TIEMPO REAL (SERVER-SENT EVENTS)
+# Cuando una orden se aprueba, se reasigna o cambia, se guarda un AvisoOrden por
+# operario afectado. GET /api/eventos/?trabajador=<codigo> (servido por ASGI) los
+# empuja como eventos SSE; la App solo tiene que llamar a /api/sync/ al recibirlos.
+#
+# No hay broker: cada proceso ASGI tiene UN sondeo a la tabla de avisos cada
+# INTERVALO_SONDEO segundos y reparte en memoria a las conexiones abiertas, así
+# que el costo en la base de datos no crece con la cantidad de operarios conectados.
+# El sondeo avanza por id (CursorAvisos), no por ventana de tiempo: una aprobación
+# masiva de miles de órdenes llega completa aunque sean miles de avisos juntos.
+# ==========================================
+INTERVALO_SONDEO = 2
+LATIDO = 15                           # comentario SSE para que nginx/la red no corten
+DURACION_MAXIMA = 30 * 60             # la App reconecta con Last-Event-ID
+MARGEN_SONDEO = timedelta(seconds=10)  # igual que MARGEN_CURSOR: transacciones que confirman tarde
+VIGENCIA_AVISOS = timedelta(days=2)
+LOTE_SONDEO = 1000
+MAX_HUECO = 1000                      # un salto mayor en los ids no se sigue como hueco
+
+
+# ------------------------------
+# REGISTRO DE AVISOS
+# ------------------------------
+def es_visible(codigo, estado):
+    return bool(codigo) and estado in ESTADOS_VISIBLES_APP
+
+
+def avisos_por_cambio(orden_id, antes, despues):
+    # antes/despues = (codigo_trabajador, estado); antes es None si la orden es nueva
+    avisos = []
+    codigo_antes, estado_antes = antes or (None, None)
+    codigo_despues, estado_despues = despues
+    if codigo_antes != codigo_despues and es_visible(codigo_antes, estado_antes):
+        avisos.append(AvisoOrden(codigo_trabajador=codigo_antes, orden_id=orden_id, motivo='REASIGNADA'))
+    if es_visible(codigo_despues, estado_despues):
+        ya_la_tenia = codigo_antes == codigo_despues and es_visible(codigo_antes, estado_antes)
+        avisos.append(AvisoOrden(codigo_trabajador=codigo_despues, orden_id=orden_id, motivo='MODIFICADA' if ya_la_tenia else 'ASIGNADA'))
+    return avisos
+
+
+def avisar_ordenes(ordenes, motivo):
+    # Para cambios hechos con queryset.update(), que no disparan señales
+    AvisoOrden.objects.bulk_create([
+        AvisoOrden(codigo_trabajador=codigo, orden_id=orden_id, motivo=motivo)
+        for orden_id, codigo, estado in ordenes.values_list('id', 'codigo_trabajador', 'estado')
+        if es_visible(codigo, estado)
+    ])
+
+
+def purgar_avisos():
+    return AvisoOrden.objects.filter(fecha__lt=timezone.now() - VIGENCIA_AVISOS).delete()[0]
+
+
+# ------------------------------
+# LECTURA (SÍNCRONA, SE LLAMA CON sync_to_async)
+# ------------------------------
+def _como_dict(filas):
+    return [
+        {'id': pk, 'trabajador': codigo, 'orden': orden_id, 'motivo': motivo, 'fecha': fecha.isoformat()}
+        for pk, codigo, orden_id, motivo, fecha in filas
+    ]
+
+
+def _filas(**filtro):
+    return AvisoOrden.objects.filter(**filtro).order_by('id').values_list(
+        'id', 'codigo_trabajador', 'orden_id', 'motivo', 'fecha'
+    )
+
+
+class CursorAvisos:
+    # Lee "id > último id visto" de a LOTE_SONDEO hasta que un lote venga corto.
+    # Un id que se salteó (su transacción todavía no confirmó, o se revirtió) queda como
+    # hueco y se vuelve a buscar durante MARGEN_SONDEO, como el margen del cursor de /api/sync/.
+    def __init__(self, ultimo_id):
+        self.ultimo_id = ultimo_id
+        self.huecos = {}  # id -> cuándo se detectó
+
+    def nuevos(self):
+        ahora = timezone.now()
+        avisos = []
+        if self.huecos:
+            avisos = _como_dict(_filas(id__in=list(self.huecos)))
+            for aviso in avisos:
+                del self.huecos[aviso['id']]
+        while True:
+            lote = _como_dict(_filas(id__gt=self.ultimo_id)[:LOTE_SONDEO])
+            for aviso in lote:
+                if aviso['id'] - self.ultimo_id <= MAX_HUECO:
+                    self.huecos.update(dict.fromkeys(range(self.ultimo_id + 1, aviso['id']), ahora))
+                self.ultimo_id = aviso['id']
+            avisos += lote
+            if len(lote) < LOTE_SONDEO:
+                break
+        limite = ahora - MARGEN_SONDEO
+        self.huecos = {pk: visto for pk, visto in self.huecos.items() if visto >= limite}
+        return avisos
+
+
+def avisos_pendientes(codigo, ultimo_id):
+    # Reconexión: lo que el operario no alcanzó a recibir
+    return _como_dict(_filas(codigo_trabajador=codigo, id__gt=ultimo_id)[:500])
+
+
+def ultimo_aviso_id():
+    return AvisoOrden.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+# ------------------------------
+# DIFUSIÓN EN EL PROCESO ASGI
+# ------------------------------
+class Difusor:
+    def __init__(self):
+        self.suscriptores = {}  # codigo -> set(asyncio.Queue)
+        self.tarea = None
+
+    def suscribir(self, codigo):
+        cola = asyncio.Queue()
+        self.suscriptores.setdefault(codigo, set()).add(cola)
+        if self.tarea is None or self.tarea.done():
+            self.tarea = asyncio.get_running_loop().create_task(self._sondear())
+        return cola
+
+    def desuscribir(self, codigo, cola):
+        colas = self.suscriptores.get(codigo, set())
+        colas.discard(cola)
+        if not colas:
+            self.suscriptores.pop(codigo, None)
+
+    async def _sondear(self):
+        # Las conexiones nuevas ya hicieron /api/sync/: se empieza desde el último aviso
+        cursor = CursorAvisos(await sync_to_async(ultimo_aviso_id)())
+        ultima_purga = timezone.now()
+        while self.suscriptores:
+            ahora = timezone.now()
+            for aviso in await sync_to_async(cursor.nuevos)():
+                for cola in self.suscriptores.get(aviso['trabajador'], ()):
+                    cola.put_nowait(aviso)
+
+            if ahora - ultima_purga > timedelta(hours=1):
+                await sync_to_async(purgar_avisos)()
+                ultima_purga = ahora
+            await asyncio.sleep(INTERVALO_SONDEO)
+
+
+# Un difusor por event loop (uvicorn usa uno por proceso)
+_difusores = weakref.WeakKeyDictionary()
+
+
+def difusor_actual():
+    loop = asyncio.get_running_loop()
+    if loop not in _difusores:
+        _difusores[loop] = Difusor()
+    return _difusores[loop]
+
+
+def formato_sse(evento, datos, id_evento=None):
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {evento}")
+    lineas.append(f"data: {json.dumps(datos)}")
+    return "\n".join(lineas) + "\n\n"
+
+
+async def flujo_eventos(codigo, ultimo_id=None):
+    difusor = difusor_actual()
+    # Primero suscribirse y después ponerse al día: así no se pierde nada entre medio
+    cola = difusor.suscribir(codigo)
+    enviados = set()
+    try:
+        yield f"retry: {int(INTERVALO_SONDEO * 2000)}\n\n"
+        if ultimo_id is None:
+            # Conexión nueva: la App ya hizo /api/sync/; el id sirve para reconectar después
+            yield formato_sse('conectado', {'trabajador': codigo}, await sync_to_async(ultimo_aviso_id)())
+        else:
+            for aviso in await sync_to_async(avisos_pendientes)(codigo, ultimo_id):
+                enviados.add(aviso['id'])
+                yield formato_sse('orden', aviso, aviso['id'])
+
+        loop = asyncio.get_running_loop()
+        fin = loop.time() + DURACION_MAXIMA
+        while loop.time() < fin:
+            try:
+                aviso = await asyncio.wait_for(cola.get(), LATIDO)
+            except asyncio.TimeoutError:
+                yield ": latido\n\n"
+                continue
+            if aviso['id'] in enviados:
+                continue
+            enviados.add(aviso['id'])
+            yield formato_sse('orden', aviso, aviso['id'])
+    finally:
+        difusor.desuscribir(codigo, cola)
@@ -0,0 +1,84 @@
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from .models import Actividad, OrdenTrabajo
+
+# ==========================================
+# BÚSQUEDA DE ÓRDENES (ADMIN Y GET /api/buscar/)
+# Postgres (índices en la migración 0029_indices_busqueda):
+# - texto (descripción de la orden, del equipo, de la ubicación y de las operaciones):
+#   full-text en español, websearch_to_tsquery ("bomba -vapor", "cambio de sello")
+# - códigos (número de orden, operario, equipo, ubicación técnica): ILIKE '%...%'
+#   sobre índices trigram GIN de UPPER(campo), que sí se pueden usar con comodín inicial
+#   (la descripción de la orden va por full-text, no por trigram)
+# - relevancia: ts_rank + similitud trigram de los códigos + número de orden exacto
+# SQLite (desarrollo): cada palabra tiene que aparecer (icontains) en algún campo;
+# la relevancia cuenta en cuántos campos aparece.
+# ==========================================
+CONFIGURACION = 'spanish'
+CAMPOS_TEXTO_ORDEN = ('descripcion', 'descripcion_equipo', 'ubicacion_tecnica')
+CAMPOS_CODIGO = ('numero_orden', 'codigo_trabajador', 'equipo', 'ubicacion')
+
+
+def documento(tabla, campos):
+    # La misma expresión que los índices GIN: si cambia aquí, hay que cambiar la migración
+    texto = " || ' ' || ".join(f"coalesce({tabla}.{campo}, '')" for campo in campos)
+    return f"to_tsvector('{CONFIGURACION}', {texto})"
+
+
+DOCUMENTO_ORDEN = documento('ordenes_ordentrabajo', CAMPOS_TEXTO_ORDEN)
+DOCUMENTO_ACTIVIDAD = documento('ordenes_actividad', ('descripcion',))
+CONSULTA = f"websearch_to_tsquery('{CONFIGURACION}', %s)"
+
+
+def _postgres(queryset, termino):
+    # Subconsulta (no una lista en Python): se limita a las órdenes del queryset
+    # (pendientes, historial, filtros) y el planificador la junta con el índice GIN
+    por_actividad = (
+        Actividad.objects.filter(orden__in=queryset.values('pk'))
+        .filter(RawSQL(f"{DOCUMENTO_ACTIVIDAD} @@ {CONSULTA}", [termino], output_field=BooleanField()))
+        .values('orden_id')
+    )
+    coincide = Q(RawSQL(f"{DOCUMENTO_ORDEN} @@ {CONSULTA}", [termino], output_field=BooleanField())) | Q(pk__in=por_actividad)
+    for campo in CAMPOS_CODIGO:
+        coincide |= Q(**{f'{campo}__icontains': termino})
+
+    similitud = Greatest(*[
+        RawSQL(f"coalesce(similarity(upper(ordenes_ordentrabajo.{campo}), upper(%s)), 0)", [termino], output_field=FloatField())
+        for campo in CAMPOS_CODIGO
+    ])
+    relevancia = (
+        RawSQL(f"ts_rank({DOCUMENTO_ORDEN}, {CONSULTA})", [termino], output_field=FloatField())
+        + similitud
+        + Case(When(pk__in=por_actividad, then=Value(0.3)), default=Value(0.0), output_field=FloatField())
+        + Case(When(numero_orden__iexact=termino, then=Value(2.0)), default=Value(0.0), output_field=FloatField())
+    )
+    return queryset.filter(coincide).annotate(relevancia=relevancia)
+
+
+def _portable(queryset, termino):
+    relevancia = Case(When(numero_orden__iexact=termino, then=Value(2.0)), default=Value(0.0), output_field=FloatField())
+    # Igual que en Postgres: las actividades se buscan solo dentro de las órdenes del queryset
+    ordenes = queryset.values('pk')
+    for palabra in termino.split():
+        por_actividad = Actividad.objects.filter(orden__in=ordenes, descripcion__icontains=palabra).values('orden_id')
+        coincide = Q(pk__in=por_actividad)
+        for campo in CAMPOS_CODIGO + CAMPOS_TEXTO_ORDEN:
+            coincide |= Q(**{f'{campo}__icontains': palabra})
+            relevancia += Case(When(**{f'{campo}__icontains': palabra}, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        queryset = queryset.filter(coincide)
+    return queryset.annotate(relevancia=relevancia)
+
+
+def buscar_ordenes(termino, queryset=None):
+    # Devuelve el queryset filtrado, con "relevancia" y ordenado de más a menos relevante
+    queryset = OrdenTrabajo.objects.all() if queryset is None else queryset
+    termino = (termino or '').strip()
+    if not termino:
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField())).order_by('-id')
+    if connection.vendor == 'postgresql':
+        queryset = _postgres(queryset, termino)
+    else:
+        queryset = _portable(queryset, termino)
+    return queryset.order_by('-relevancia', '-id')
@@ -0,0 +1,62 @@
+import hashlib
+import time
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from .medios import DIA
+
+# ==========================================
+# GET CONDICIONAL (ETag / If-None-Match)
+# La versión se calcula con agregados sobre fecha_modificacion (columnas indexadas),
+# así que si nada cambió se contesta 304 sin serializar el árbol anidado.
+# El conteo de filas entra en la firma para detectar borrados.
+# Solo ETag, sin Last-Modified: borrar un hijo no mueve ninguna fecha_modificacion y
+# con If-Modified-Since el cliente recibiría un 304 con datos viejos.
+# ==========================================
+
+class RespuestaCondicionalMixin:
+    # (modelo hijo, lookup desde el hijo hasta el padre); ej: (Actividad, 'orden')
+    hijos_version = ()
+    # Columnas del padre que se actualizan sin tocar fecha_modificacion (ej: reconstruir_kpis)
+    campos_version = ()
+
+    def version_queryset(self, queryset):
+        padres = queryset.order_by()
+        extras = {campo: Sum(campo) for campo in self.campos_version}
+        resumen = [padres.aggregate(total=Count('pk'), ultima=Max('fecha_modificacion'), **extras)]
+        ids = padres.values('pk')
+        for modelo, lookup in self.hijos_version:
+            resumen.append(
+                modelo.objects.filter(**{f'{lookup}__in': ids})
+                .aggregate(total=Count('pk'), ultima=Max('fecha_modificacion'))
+            )
+
+        # Las URLs de las fotos dependen del usuario (firmadas o no) y la firma cambia de día
+        # (ver ordenes/medios.py): un 304 no puede devolverle a nadie una URL ajena o vencida
+        firma = [self.get_serializer_class().__name__, sorted(self.request.query_params.lists())]
+        firma += [self.request.user.pk, int(time.time()) // DIA]
+        firma += [sorted((k, str(v)) for k, v in r.items()) for r in resumen]
+        return '"%s"' % hashlib.md5(repr(firma).encode('utf-8')).hexdigest()
+
+    def respuesta_condicional(self, request, queryset, generar):
+        etag = self.version_queryset(queryset)
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is not None:
+            return no_modificado
+
+        response = generar()
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.respuesta_condicional(request, queryset, lambda: super(RespuestaCondicionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError):
+            # Id mal formado: que get_object() conteste el 404 de siempre
+            return super().retrieve(request, *args, **kwargs)
+        return self.respuesta_condicional(request, queryset, lambda: super(RespuestaCondicionalMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,153 @@
+import tempfile
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+from django.db.models import Max
+from django.db.models.functions import Length
+from .models import Actividad, ActividadArchivada, OrdenArchivada
+from .tiempos import a_segundos, a_hhmmss
+
+# ==========================================
+# REPORTE DE CIERRE (EXCEL) EN STREAMING
+# - Libro write_only: openpyxl va escribiendo las filas a disco, no las guarda en memoria
+# - Una sola consulta con JOIN a la orden, recorrida con iterator()
+# - Los anchos de columna salen de un MAX(LENGTH(...)) en la base de datos,
+#   porque en write_only hay que fijarlos antes de escribir la primera fila
+# ==========================================
+ENCABEZADOS = [
+    'Orden', 'Operación', 'Txt.brv.oper.', 'Equipo',
+    'Ubicación Téc.', 'Inicio Prog.', 'Fin Prog.',
+    'Ejecutor Real', 'Inicio Real', 'Fin Real',
+    'Tiempo Activo (HH:MM:SS)', 'Total Horas (Decimal)',
+    'Tiempo en Pausa (HH:MM:SS)', 'Pausas Horas (Decimal)'
+]
+
+# Columna (índice 0) -> campo de texto libre cuyo largo se mide en la base de datos
+COLUMNAS_TEXTO = {
+    0: 'orden__numero_orden',
+    1: 'codigo_operacion',
+    2: 'descripcion',
+    3: 'orden__equipo',
+    4: 'orden__ubicacion',
+    7: 'nombre_ejecutor',
+}
+# Columnas de formato fijo: fechas, "HH:MM:SS" y decimales
+ANCHO_FIJO = {5: 10, 6: 10, 8: 16, 9: 16, 10: 9, 11: 7, 12: 9, 13: 7}
+
+TAMANO_LOTE = 2000
+
+RELLENO_ENCABEZADO = PatternFill(start_color="4F4F4F", end_color="4F4F4F", fill_type="solid")
+FUENTE_ENCABEZADO = Font(bold=True, color="FFFFFF")
+CENTRADO = Alignment(horizontal="center", vertical="center")
+BORDE_DELGADO = Border(left=Side(style='thin', color='000000'), right=Side(style='thin', color='000000'), top=Side(style='thin', color='000000'), bottom=Side(style='thin', color='000000'))
+
+# Estilos con nombre: asignarlos por celda es mucho más barato que asignar
+# borde/alineación sueltos (openpyxl re-hashea cada objeto de estilo)
+ESTILO_ENCABEZADO = 'cierre_encabezado'
+ESTILO_TEXTO = 'cierre_texto'
+ESTILO_CENTRADO = 'cierre_centrado'
+
+
+def formatear_tiempo(valor):
+    return a_hhmmss(a_segundos(valor))
+
+
+def calcular_decimal(valor_texto):
+    if not valor_texto or valor_texto == "00:00:00" or valor_texto == "-": return 0.0
+    try:
+        partes = str(valor_texto).split(':')
+        if len(partes) == 3:
+            h, m, s = map(float, partes)
+            return round(h + (m / 60.0) + (s / 3600.0), 2)
+        return 0.0
+    except: return 0.0
+
+
+def _fecha(valor, formato):
+    return valor.strftime(formato) if valor else '-'
+
+
+def actividades_reporte(ordenes):
+    # Sirve igual para órdenes archivadas: ActividadArchivada tiene los mismos campos
+    modelo = ActividadArchivada if ordenes.model is OrdenArchivada else Actividad
+    return (
+        modelo.objects.filter(orden__in=ordenes.values('pk'))
+        .select_related('orden')
+        .only(
+            'codigo_operacion', 'descripcion', 'nombre_ejecutor', 'fecha_inicio_real', 'fecha_fin_real',
+            'tiempo_real_acumulado', 'tiempo_pausas',
+            'orden__numero_orden', 'orden__equipo', 'orden__ubicacion', 'orden__inicio_programado', 'orden__fin_programado',
+        )
+        .order_by('-orden_id', 'id')
+    )
+
+
+def filas_reporte(actividades):
+    for act in actividades.iterator(chunk_size=TAMANO_LOTE):
+        orden = act.orden
+        t_activo_txt = formatear_tiempo(act.tiempo_real_acumulado)
+        t_pausa_txt = formatear_tiempo(act.tiempo_pausas)
+        yield [
+            orden.numero_orden, act.codigo_operacion, act.descripcion,
+            orden.equipo, orden.ubicacion,
+            _fecha(orden.inicio_programado, '%d/%m/%Y'), _fecha(orden.fin_programado, '%d/%m/%Y'),
+            act.nombre_ejecutor or '-',
+            _fecha(act.fecha_inicio_real, '%d/%m/%Y %H:%M'), _fecha(act.fecha_fin_real, '%d/%m/%Y %H:%M'),
+            t_activo_txt, calcular_decimal(t_activo_txt),
+            t_pausa_txt, calcular_decimal(t_pausa_txt),
+        ]
+
+
+def anchos_columnas(actividades):
+    largos = actividades.order_by().aggregate(**{
+        f'col_{indice}': Max(Length(campo)) for indice, campo in COLUMNAS_TEXTO.items()
+    })
+    anchos = []
+    for indice, encabezado in enumerate(ENCABEZADOS):
+        dato = largos.get(f'col_{indice}') or ANCHO_FIJO.get(indice, 0)
+        anchos.append(max(len(encabezado), dato) + 2)
+    return anchos
+
+
+def escribir_reporte(filas, destino, anchos):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Cierre de Órdenes")
+    ws.sheet_view.showGridLines = False
+    for indice, ancho in enumerate(anchos, start=1):
+        ws.column_dimensions[get_column_letter(indice)].width = ancho
+
+    wb.add_named_style(NamedStyle(name=ESTILO_ENCABEZADO, font=FUENTE_ENCABEZADO, fill=RELLENO_ENCABEZADO, alignment=CENTRADO, border=BORDE_DELGADO))
+    wb.add_named_style(NamedStyle(name=ESTILO_TEXTO, border=BORDE_DELGADO))
+    wb.add_named_style(NamedStyle(name=ESTILO_CENTRADO, alignment=CENTRADO, border=BORDE_DELGADO))
+    # Las columnas desde la 6 (fechas, tiempos) van centradas
+    estilos = [ESTILO_TEXTO if columna < 6 else ESTILO_CENTRADO for columna in range(1, len(ENCABEZADOS) + 1)]
+
+    encabezado = []
+    for titulo in ENCABEZADOS:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.style = ESTILO_ENCABEZADO
+        encabezado.append(celda)
+    ws.append(encabezado)
+
+    total = 0
+    for fila in filas:
+        celdas = []
+        for valor, estilo in zip(fila, estilos):
+            celda = WriteOnlyCell(ws, value=valor)
+            celda.style = estilo
+            celdas.append(celda)
+        ws.append(celdas)
+        total += 1
+
+    wb.save(destino)
+    return total
+
+
+def generar_reporte_cierre(ordenes, destino=None):
+    # Devuelve un archivo temporal (posicionado al inicio) listo para enviarse con FileResponse
+    destino = destino or tempfile.TemporaryFile(suffix='.xlsx')
+    actividades = actividades_reporte(ordenes)
+    escribir_reporte(filas_reporte(actividades), destino, anchos_columnas(actividades))
+    destino.seek(0)
+    return destino
@@ -0,0 +1,71 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# ==========================================
+# FILTROS DE LA API (?trabajador=, ?estado=, rangos de fechas)
+# Se resuelven en la base de datos para que la App no descargue la tabla entera
+# ==========================================
+
+# prefijo del parámetro -> campo del modelo (ej: ?inicio_desde=2026-01-01&inicio_hasta=2026-01-31)
+RANGOS_FECHA_ORDEN = {
+    'inicio': 'inicio_programado',
+    'fin': 'fin_programado',
+    'cierre': 'fecha_fin_real',
+}
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def _a_datetime(params, nombre):
+    # Acepta "YYYY-MM-DD" o un datetime ISO completo.
+    # Devuelve (datetime, es_fecha_sola), o (None, False) si el parámetro no vino.
+    # Una fecha que no se entiende es un error: ignorarla devolvería la tabla sin filtrar.
+    valor = (params.get(nombre) or '').strip()
+    if not valor:
+        return None, False
+    try:
+        # parse_datetime también acepta "YYYY-MM-DD", así que la fecha sola va primero
+        fecha = parse_date(valor)
+        dt = parse_datetime(valor) if fecha is None else datetime.combine(fecha, time.min)
+    except ValueError:
+        dt = None
+    if dt is None:
+        raise FiltroInvalido(f"{nombre}: fecha inválida '{valor}' (use YYYY-MM-DD o ISO 8601)")
+    es_fecha_sola = fecha is not None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt, es_fecha_sola
+
+
+def filtrar_rangos_fecha(queryset, params, rangos):
+    # Se compara contra el campo crudo (sin __date) para que Postgres use el índice
+    for prefijo, campo in rangos.items():
+        desde, _ = _a_datetime(params, f'{prefijo}_desde')
+        if desde is not None:
+            queryset = queryset.filter(**{f'{campo}__gte': desde})
+
+        hasta, es_fecha_sola = _a_datetime(params, f'{prefijo}_hasta')
+        if hasta is not None:
+            if es_fecha_sola:
+                # "hasta 2026-01-31" incluye todo ese día
+                queryset = queryset.filter(**{f'{campo}__lt': hasta + timedelta(days=1)})
+            else:
+                queryset = queryset.filter(**{f'{campo}__lte': hasta})
+    return queryset
+
+
+def filtrar_ordenes(queryset, params):
+    trabajador = (params.get('trabajador') or '').strip()
+    if trabajador:
+        queryset = queryset.filter(codigo_trabajador=trabajador)
+
+    # ?estado=PENDIENTE o ?estado=PENDIENTE,FINALIZADA
+    estado = (params.get('estado') or '').strip()
+    if estado:
+        estados = [e.strip().upper() for e in estado.split(',') if e.strip()]
+        queryset = queryset.filter(estado__in=estados)
+
+    return filtrar_rangos_fecha(queryset, params, RANGOS_FECHA_ORDEN)
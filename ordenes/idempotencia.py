@@ -0,0 +1,127 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from .models import ClaveIdempotencia
+from .autenticacion import sesion_por_token
+
+# ==========================================
+# IDEMPOTENCIA PARA ESCRITURAS REINTENTADAS
+# Si la App manda "Idempotency-Key: <uuid>" y la misma clave ya se procesó,
+# se devuelve la respuesta guardada en vez de ejecutar la escritura de nuevo
+# (evita bitácoras y fotos duplicadas cuando un reintento llega tras un timeout).
+# La clave queda atada al usuario y a una huella del cuerpo: la misma clave con otro
+# usuario, otra ruta u otro contenido es un error del cliente (422), no un reintento.
+# ==========================================
+METODOS_ESCRITURA = ('POST', 'PUT', 'PATCH', 'DELETE')
+VIGENCIA_CLAVE = getattr(settings, 'IDEMPOTENCIA_VIGENCIA', timedelta(hours=48))
+# Si una petición murió a medias, su clave "en proceso" se libera pasado este tiempo.
+# Tiene que ser bastante más que lo que puede durar una petición viva (timeout de
+# gunicorn/nginx, subida lenta desde el celular); si no, el reintento la ejecuta dos veces.
+VIGENCIA_EN_PROCESO = getattr(settings, 'IDEMPOTENCIA_EN_PROCESO', timedelta(minutes=15))
+FORMULARIOS = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+
+def hash_clave(valor):
+    return hashlib.sha256(valor.encode('utf-8')).hexdigest()
+
+
+def usuario_de(request):
+    # La API autentica con token en la vista (DRF); acá todavía no está en request.user
+    if request.user.is_authenticated:
+        return request.user
+    usuario, _ = sesion_por_token(request)
+    return usuario
+
+
+def huella_cuerpo(request):
+    # En un formulario el separador multipart cambia en cada reintento: se firman los campos
+    # y el contenido de los archivos, no los bytes. '' si el cuerpo es demasiado grande para
+    # leerlo en memoria (ej: una parte de subidas.py); entonces no se compara.
+    huella = hashlib.sha256()
+    if request.content_type in FORMULARIOS:
+        if request.method != 'POST':
+            return ''  # Django solo interpreta formularios en POST; el cuerpo lo lee DRF
+        huella.update(repr(sorted(request.POST.lists())).encode('utf-8'))
+        for nombre, archivos in sorted(request.FILES.lists()):
+            for archivo in archivos:
+                huella.update(nombre.encode('utf-8'))
+                for bloque in archivo.chunks():
+                    huella.update(bloque)
+                archivo.seek(0)
+        return huella.hexdigest()
+    try:
+        huella.update(request.body)
+    except RequestDataTooBig:
+        return ''
+    return huella.hexdigest()
+
+
+def purgar_vencidas(ahora=None):
+    ahora = ahora or timezone.now()
+    borradas, _ = ClaveIdempotencia.objects.filter(fecha__lt=ahora - VIGENCIA_CLAVE).delete()
+    return borradas
+
+
+class IdempotenciaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        valor = request.headers.get('Idempotency-Key', '').strip()
+        if not valor or request.method not in METODOS_ESCRITURA or not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        clave = hash_clave(valor)
+        registro, respuesta = self._reservar(clave, request, usuario_de(request), huella_cuerpo(request))
+        if respuesta is not None:
+            return respuesta
+
+        response = self.get_response(request)
+
+        if response.status_code >= 500 or getattr(response, 'streaming', False):
+            # Error del servidor: se deja reintentar de verdad
+            registro.delete()
+            return response
+
+        # update(): si la reserva venció y otro reintento la reemplazó, no hay fila que guardar
+        ClaveIdempotencia.objects.filter(pk=registro.pk, estado_http__isnull=True).update(
+            estado_http=response.status_code, tipo_contenido=response.get('Content-Type', ''), respuesta=response.content,
+        )
+        return response
+
+    def _reservar(self, clave, request, usuario, huella):
+        # Devuelve (registro_nuevo, None) si hay que ejecutar, o (None, respuesta) si no
+        ahora = timezone.now()
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    return ClaveIdempotencia.objects.create(
+                        clave=clave, metodo=request.method, ruta=request.path[:255], usuario=usuario, huella=huella,
+                    ), None
+            except IntegrityError:
+                existente = ClaveIdempotencia.objects.filter(clave=clave).first()
+                if existente is None:
+                    continue
+
+            vencida = existente.fecha < ahora - VIGENCIA_CLAVE
+            abandonada = existente.estado_http is None and existente.fecha < ahora - VIGENCIA_EN_PROCESO
+            if vencida or abandonada:
+                existente.delete()
+                continue
+
+            otra_huella = existente.huella and huella and existente.huella != huella
+            otro_usuario = existente.usuario_id != (usuario.pk if usuario else None)
+            if existente.metodo != request.method or existente.ruta != request.path[:255] or otro_usuario or otra_huella:
+                return None, JsonResponse({"error": "Esta Idempotency-Key ya se usó en otra petición"}, status=422)
+            if existente.estado_http is None:
+                return None, JsonResponse({"error": "Esta petición todavía se está procesando, reintenta luego"}, status=409)
+
+            response = HttpResponse(bytes(existente.respuesta), status=existente.estado_http, content_type=existente.tipo_contenido or None)
+            response['Idempotent-Replayed'] = 'true'
+            return None, response
+
+        return None, JsonResponse({"error": "No se pudo reservar la Idempotency-Key"}, status=409)
@@ -0,0 +1,119 @@
+import logging
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import ArchivoFoto, Evidencia
+from .almacen import adoptar_archivo, nombre_por_contenido
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# PROCESAMIENTO DE EVIDENCIAS FOTOGRÁFICAS
+# - Al subir: solo se valida (que sea una imagen real, tamaño y dimensiones razonables)
+# - En el worker (procesar_tareas): se aplica la rotación del EXIF, se re-codifica como
+#   JPEG sin metadatos (GPS, modelo de teléfono...) a un lado máximo acotado y se genera
+#   la miniatura que usan el admin y la API. La foto re-codificada queda como "original".
+#   Se procesa el ArchivoFoto (ver ordenes/almacen.py): una vez por contenido, no por Evidencia.
+# ==========================================
+LADO_MAXIMO = 2048
+CALIDAD = 82
+LADO_MINIATURA = 320
+CALIDAD_MINIATURA = 70
+
+TAMANO_MAXIMO_SUBIDA = 25 * 1024 * 1024
+PIXELES_MAXIMOS = 50_000_000  # ~8000x6000; más que eso es sospechoso (bomba de descompresión)
+FORMATOS_ACEPTADOS = {'JPEG', 'MPO', 'PNG', 'WEBP'}  # MPO: JPEG de cámaras dobles
+TAMANO_LOTE = 20
+
+
+class ImagenInvalida(ValueError):
+    pass
+
+
+def validar_imagen(archivo):
+    if archivo.size and archivo.size > TAMANO_MAXIMO_SUBIDA:
+        raise ImagenInvalida(f"La foto pesa más de {TAMANO_MAXIMO_SUBIDA // (1024 * 1024)} MB.")
+    posicion = archivo.tell()
+    try:
+        with Image.open(archivo) as imagen:
+            formato = imagen.format
+            ancho, alto = imagen.size
+            imagen.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise ImagenInvalida("El archivo no es una imagen válida.")
+    finally:
+        archivo.seek(posicion)
+    if formato not in FORMATOS_ACEPTADOS:
+        raise ImagenInvalida(f"Formato no soportado: {formato} (use JPEG, PNG o WEBP).")
+    if ancho * alto > PIXELES_MAXIMOS:
+        raise ImagenInvalida("La foto tiene demasiados píxeles.")
+
+
+def _a_rgb(imagen):
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB') if imagen.mode != 'RGB' else imagen
+
+
+def _jpeg(imagen, lado, calidad):
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)
+    salida = BytesIO()
+    # Sin exif=...: Pillow no copia metadatos al guardar
+    copia.save(salida, 'JPEG', quality=calidad, optimize=True, progressive=True)
+    return ContentFile(salida.getvalue())
+
+
+def procesar_archivo(blob):
+    # Se re-codifica una sola vez por contenido; las Evidencias que lo comparten se actualizan juntas
+    with transaction.atomic():
+        blob = ArchivoFoto.objects.select_for_update().get(pk=blob.pk)
+        if not blob.procesado:
+            nombre_anterior = blob.archivo.name
+            with blob.archivo.open('rb') as archivo, Image.open(archivo) as imagen:
+                # draft() deja que el decodificador JPEG reduzca al leer: mucha menos memoria y CPU
+                imagen.draft('RGB', (LADO_MAXIMO, LADO_MAXIMO))
+                imagen = _a_rgb(ImageOps.exif_transpose(imagen))
+                foto = _jpeg(imagen, LADO_MAXIMO, CALIDAD)
+                miniatura = _jpeg(imagen, LADO_MINIATURA, CALIDAD_MINIATURA)
+
+            blob.archivo.save(nombre_por_contenido(blob.sha256, blob.pk, '.jpg', '_p'), foto, save=False)
+            blob.miniatura.save(nombre_por_contenido(blob.sha256, blob.pk, '.jpg', '_min'), miniatura, save=False)
+            blob.tamano = foto.size
+            blob.procesado = True
+            blob.save(update_fields=['archivo', 'miniatura', 'tamano', 'procesado'])
+            storage = blob.archivo.storage
+            if nombre_anterior != blob.archivo.name and not Evidencia.objects.filter(foto=nombre_anterior).exclude(archivo=blob).exists():
+                transaction.on_commit(lambda: storage.delete(nombre_anterior))
+
+        Evidencia.objects.filter(archivo=blob).update(
+            foto=blob.archivo.name, miniatura=blob.miniatura.name, procesada=True, fecha_modificacion=timezone.now()
+        )
+
+
+def procesar_evidencia(evidencia):
+    blob = evidencia.archivo if evidencia.archivo_id else adoptar_archivo(evidencia)
+    procesar_archivo(blob)
+
+
+def procesar_pendientes(limite=TAMANO_LOTE):
+    procesadas = 0
+    pendientes = Evidencia.objects.filter(procesada=False, error_procesamiento='')
+    for evidencia in pendientes.select_related('archivo').order_by('id')[:limite]:
+        try:
+            procesar_evidencia(evidencia)
+        except Exception as error:
+            # Archivo perdido o ilegible: se anota el motivo (sigue sin procesar) para no
+            # reintentarlo en cada vuelta; las que comparten el mismo archivo fallarían igual
+            logger.exception("No se pudo procesar la evidencia #%s", evidencia.pk)
+            fallidas = Evidencia.objects.filter(pk=evidencia.pk)
+            if evidencia.archivo_id:
+                fallidas = Evidencia.objects.filter(archivo_id=evidencia.archivo_id, procesada=False)
+            fallidas.update(error_procesamiento=(f"{type(error).__name__}: {error}")[:255])
+        procesadas += 1
+    return procesadas
@@ -0,0 +1,205 @@
+import os
+from datetime import datetime, date
+from django.db import transaction
+from django.utils import timezone
+from import_export.formats import base_formats
+from .models import OrdenTrabajo, Actividad, OrdenArchivada
+
+# ==========================================
+# IMPORTACIÓN SAP
+# Las reglas (encabezados, fechas, prioridad) las comparten el ActividadResource
+# del admin (fila por fila, con vista previa) y el modo rápido de abajo.
+# ==========================================
+FORMATOS_IMPORTACION = {
+    '.xlsx': base_formats.XLSX,
+    '.xls': base_formats.XLS,
+    '.csv': base_formats.CSV,
+}
+
+# Tamaño de los "IN (...)": SQLite no acepta más de ~1000 parámetros en versiones viejas
+TAMANO_LOTE = 900
+
+CAMPOS_ORDEN_SAP = [
+    'descripcion', 'equipo', 'descripcion_equipo', 'ubicacion', 'ubicacion_tecnica',
+    'inicio_programado', 'fin_programado', 'estado', 'prioridad', 'supervisor',
+]
+
+
+class FormatoNoSoportado(ValueError):
+    pass
+
+
+def leer_dataset(archivo, nombre):
+    extension = os.path.splitext(nombre)[1].lower()
+    formato_clase = FORMATOS_IMPORTACION.get(extension)
+    if formato_clase is None:
+        raise FormatoNoSoportado(f"Formato no soportado: {extension} (use .xlsx, .xls o .csv)")
+    formato = formato_clase()
+    contenido = archivo.read()
+    if not formato.is_binary():
+        contenido = contenido.decode('utf-8-sig')
+    return formato.create_dataset(contenido)
+
+
+def renombrar_encabezados_sap(headers):
+    # SAP trae dos columnas "Descripción": la 1ra es del equipo y la 2da de la ubicación
+    new_headers = []
+    desc_count = 0
+    for header in headers:
+        if header == 'Descripción':
+            desc_count += 1
+            if desc_count == 1: new_headers.append('desc_equipo_sap')
+            elif desc_count == 2: new_headers.append('desc_ubicacion_sap')
+            else: new_headers.append(header)
+        else:
+            new_headers.append(header)
+    return new_headers
+
+
+def parse_fecha_inteligente(valor):
+    if not valor: return None
+    if isinstance(valor, (datetime, date)): return valor
+    try: return datetime.strptime(str(valor).strip(), '%d/%m/%Y').date()
+    except:
+        try: return datetime.strptime(str(valor).strip().split(' ')[0], '%Y-%m-%d').date()
+        except: return None
+
+
+def datos_orden_sap(row, user=None):
+    prioridad_excel = str(row.get('Prioridad', '')).strip()
+    prioridad_db = '4'
+    if prioridad_excel and prioridad_excel[0] in ['1', '2', '3', '4']:
+        prioridad_db = prioridad_excel[0]
+
+    return {
+        'descripcion': row.get('Texto breve'),
+        'equipo': row.get('Equipo'),
+        'descripcion_equipo': row.get('desc_equipo_sap'),
+        'ubicacion': row.get('Ubic.técn.'),
+        'ubicacion_tecnica': row.get('desc_ubicacion_sap'),
+        'inicio_programado': parse_fecha_inteligente(row.get('Fe.inic.extrema')),
+        'fin_programado': parse_fecha_inteligente(row.get('Fe.fin extrema')),
+        'estado': 'BORRADOR',
+        'prioridad': prioridad_db,
+        'supervisor': user,
+    }
+
+
+def _texto(valor):
+    # Igual que CharField.to_python: los números del Excel se guardan como str(valor)
+    return valor if valor is None or isinstance(valor, str) else str(valor)
+
+
+def _en_lotes(valores):
+    valores = list(valores)
+    for i in range(0, len(valores), TAMANO_LOTE):
+        yield valores[i:i + TAMANO_LOTE]
+
+
+def numeros_archivados(numeros):
+    # Órdenes que ya cerraron y pasaron al archivo (ver ordenes/archivo.py): si SAP las vuelve
+    # a mandar se omiten, para no crear un borrador duplicado de una orden terminada
+    numeros = {_texto(numero) for numero in numeros if numero}
+    archivados = set()
+    for lote in _en_lotes(numeros):
+        archivados.update(OrdenArchivada.objects.filter(numero_orden__in=lote).values_list('numero_orden', flat=True))
+    return archivados
+
+
+def texto_archivadas(resumen):
+    archivadas = resumen.get('ordenes_archivadas')
+    if not archivadas:
+        return ''
+    return f" | Omitidas por estar archivadas: {', '.join(archivadas[:20])}" + (' ...' if len(archivadas) > 20 else '')
+
+
+# ==========================================
+# MODO RÁPIDO: UNA PASADA + UPSERTS POR CONJUNTOS
+# Mismo resultado que importar fila por fila con ActividadResource
+# (la última fila de cada orden/operación gana), pero con un número de
+# consultas que depende de los lotes, no de las filas.
+# ==========================================
+def importar_sap_rapido(dataset, user=None):
+    dataset.headers = renombrar_encabezados_sap(dataset.headers)
+    headers = dataset.headers
+
+    ordenes = {}      # numero_orden -> datos de la orden
+    actividades = {}  # (numero_orden, codigo_operacion) -> datos de la operación
+    errores = []
+    for numero_fila, valores in enumerate(dataset, start=1):
+        row = dict(zip(headers, valores))
+        numero_orden = _texto(row.get('Orden'))
+        if not numero_orden:
+            errores.append(f"Fila {numero_fila}: sin número de orden")
+            continue
+        descripcion = row.get('Txt.brv.oper.')
+        if descripcion is None:
+            errores.append(f"Fila {numero_fila}: la operación no tiene texto breve")
+            continue
+        ordenes[numero_orden] = datos_orden_sap(row, user)
+        actividades[(numero_orden, _texto(row.get('Operación')))] = {
+            'descripcion': _texto(descripcion),
+            'puesto_trabajo': _texto(row.get('Pto.tbjo.op.')),
+        }
+
+    archivadas = numeros_archivados(ordenes)
+    for numero in archivadas:
+        del ordenes[numero]
+    actividades = {clave: datos for clave, datos in actividades.items() if clave[0] not in archivadas}
+
+    resumen = {
+        'ordenes_nuevas': 0, 'ordenes_actualizadas': 0, 'actividades_nuevas': 0, 'actividades_actualizadas': 0,
+        'errores': errores, 'ordenes_archivadas': sorted(archivadas),
+    }
+    # Igual que el import del admin: si alguna fila falla no se guarda nada
+    if errores or not ordenes:
+        return resumen
+
+    with transaction.atomic():
+        ids_ordenes = _upsert_ordenes(ordenes, resumen)
+        _upsert_actividades(actividades, ids_ordenes, resumen)
+    return resumen
+
+
+def _upsert_ordenes(ordenes, resumen):
+    existentes = {}
+    for lote in _en_lotes(ordenes):
+        existentes.update(OrdenTrabajo.objects.filter(numero_orden__in=lote).values_list('numero_orden', 'id'))
+    resumen['ordenes_actualizadas'] = len(existentes)
+    resumen['ordenes_nuevas'] = len(ordenes) - len(existentes)
+
+    # INSERT ... ON CONFLICT (numero_orden) DO UPDATE (Postgres y SQLite)
+    ahora = timezone.now()
+    objetos = [OrdenTrabajo(numero_orden=numero, fecha_modificacion=ahora, **datos) for numero, datos in ordenes.items()]
+    OrdenTrabajo.objects.bulk_create(
+        objetos,
+        update_conflicts=True,
+        unique_fields=['numero_orden'],
+        update_fields=CAMPOS_ORDEN_SAP + ['fecha_modificacion'],
+    )
+
+    ids = {}
+    for lote in _en_lotes(ordenes):
+        ids.update(OrdenTrabajo.objects.filter(numero_orden__in=lote).values_list('numero_orden', 'id'))
+    return ids
+
+
+def _upsert_actividades(actividades, ids_ordenes, resumen):
+    existentes = {}  # (orden_id, codigo_operacion) -> [ids]
+    for lote in _en_lotes(ids_ordenes.values()):
+        for act_id, orden_id, codigo in Actividad.objects.filter(orden_id__in=lote).values_list('id', 'orden_id', 'codigo_operacion'):
+            existentes.setdefault((orden_id, codigo), []).append(act_id)
+
+    ahora = timezone.now()
+    nuevas, actualizadas = [], []
+    for (numero_orden, codigo), datos in actividades.items():
+        orden_id = ids_ordenes[numero_orden]
+        for act_id in existentes.get((orden_id, codigo), []):
+            actualizadas.append(Actividad(id=act_id, orden_id=orden_id, codigo_operacion=codigo, fecha_modificacion=ahora, **datos))
+        if (orden_id, codigo) not in existentes:
+            nuevas.append(Actividad(orden_id=orden_id, codigo_operacion=codigo, **datos))
+
+    Actividad.objects.bulk_create(nuevas)
+    Actividad.objects.bulk_update(actualizadas, ['descripcion', 'puesto_trabajo', 'fecha_modificacion'], batch_size=500)
+    resumen['actividades_nuevas'] = len(nuevas)
+    resumen['actividades_actualizadas'] = len(actualizadas)
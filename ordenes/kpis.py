@@ -0,0 +1,139 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Value, Sum, Avg, Count, Max, OuterRef, Subquery, DurationField, IntegerField, DateTimeField
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import OrdenTrabajo, Actividad, ActividadArchivada, ResumenTrabajadorDia
+from .tiempos import a_segundos
+
+# ==========================================
+# KPIs PRECALCULADOS
+# - Por orden: tiempo_total (activo), tiempo_pausas_total, actividades_finalizadas, fecha_fin_real
+# - Por operario y día: ResumenTrabajadorDia
+# Se actualizan al finalizar una actividad (ActividadViewSet.finalizar y /api/lote/);
+# "python manage.py reconstruir_kpis" los recalcula desde cero.
+# ==========================================
+
+def _fecha_hora(valor):
+    # finalizar asigna lo que manda la App (texto ISO) antes de guardar
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if valor is not None and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def contribucion_diaria(actividad, codigo_trabajador):
+    # Lo que aporta una actividad al resumen diario: (clave, activos, pausa) o None
+    # Sin fecha de fin no hay día al que cargarla (igual que en reconstruir_kpis)
+    fin = _fecha_hora(actividad.fecha_fin_real)
+    if not actividad.finished or not codigo_trabajador or fin is None:
+        return None
+    dia = timezone.localdate(fin)
+    return (codigo_trabajador, dia), a_segundos(actividad.tiempo_real_acumulado), a_segundos(actividad.tiempo_pausas)
+
+
+def _sumar_al_dia(contribucion, signo):
+    (codigo, dia), activos, pausa = contribucion
+    ResumenTrabajadorDia.objects.get_or_create(codigo_trabajador=codigo, fecha=dia)
+    ResumenTrabajadorDia.objects.filter(codigo_trabajador=codigo, fecha=dia).update(
+        segundos_activos=F('segundos_activos') + signo * activos,
+        segundos_pausa=F('segundos_pausa') + signo * pausa,
+        actividades_finalizadas=F('actividades_finalizadas') + signo,
+    )
+
+
+def totales_tiempo(actividades, *agrupar_por):
+    # SUM/AVG de los tiempos en la base de datos (interval en Postgres), agrupando por
+    # los campos que se pidan, ej: totales_tiempo(qs, 'orden__codigo_trabajador')
+    totales = dict(
+        activo_total=Sum('tiempo_real_acumulado'),
+        pausa_total=Sum('tiempo_pausas'),
+        activo_promedio=Avg('tiempo_real_acumulado'),
+        pausa_promedio=Avg('tiempo_pausas'),
+        actividades=Count('id'),
+    )
+    actividades = actividades.filter(finished=True)
+    if not agrupar_por:
+        return actividades.aggregate(**totales)
+    return actividades.values(*agrupar_por).annotate(**totales).order_by(*agrupar_por)
+
+
+def recalcular_orden(orden_id):
+    totales = Actividad.objects.filter(orden_id=orden_id, finished=True).aggregate(
+        activo=Sum('tiempo_real_acumulado'), pausa=Sum('tiempo_pausas'),
+        finalizadas=Count('id'), ultimo_fin=Max('fecha_fin_real'),
+    )
+    kpis = {
+        'tiempo_total': totales['activo'] or timedelta(0),
+        'tiempo_pausas_total': totales['pausa'] or timedelta(0),
+        'actividades_finalizadas': totales['finalizadas'],
+    }
+    # Si ninguna actividad trae fecha de fin se conserva la que ya tenía la orden
+    if totales['ultimo_fin'] is not None:
+        kpis['fecha_fin_real'] = totales['ultimo_fin']
+    # Sin tocar fecha_modificacion: la App ya recibe la actividad finalizada y, si la orden
+    # figurara como modificada, /api/sync/ le reenviaría el árbol entero. El ETag de
+    # /api/ordenes/ cubre estas columnas por campos_version (ver ordenes/condicional.py).
+    OrdenTrabajo.objects.filter(pk=orden_id).update(**kpis)
+    kpis.setdefault('fecha_fin_real', OrdenTrabajo.objects.filter(pk=orden_id).values_list('fecha_fin_real', flat=True).first())
+    return kpis
+
+
+def actualizar_por_finalizacion(actividad, antes):
+    # antes = contribucion_diaria() de la actividad tal como estaba antes de finalizarla
+    codigo = OrdenTrabajo.objects.filter(pk=actividad.orden_id).values_list('codigo_trabajador', flat=True).first()
+    despues = contribucion_diaria(actividad, codigo)
+    with transaction.atomic():
+        if antes is not None:
+            _sumar_al_dia(antes, -1)
+        if despues is not None:
+            _sumar_al_dia(despues, +1)
+        recalcular_orden(actividad.orden_id)
+
+
+def _resumen_por_dia(actividades):
+    return (
+        actividades.filter(finished=True, fecha_fin_real__isnull=False)
+        .exclude(orden__codigo_trabajador__isnull=True).exclude(orden__codigo_trabajador='')
+        .annotate(dia=TruncDate('fecha_fin_real'))
+        .values('orden__codigo_trabajador', 'dia')
+        .annotate(activo=Sum('tiempo_real_acumulado'), pausa=Sum('tiempo_pausas'), cantidad=Count('id'))
+        .order_by()
+    )
+
+
+def reconstruir_kpis():
+    # Todo por conjuntos: un UPDATE con subconsultas para las órdenes y un GROUP BY para
+    # el resumen diario. No toca fecha_modificacion para no reenviar todo a la App.
+    finalizadas = Actividad.objects.filter(orden=OuterRef('pk'), finished=True).order_by().values('orden')
+
+    def por_orden(agregado, campo):
+        return Subquery(finalizadas.annotate(valor=agregado).values('valor'), output_field=campo)
+
+    cero = Value(timedelta(0), output_field=DurationField())
+    with transaction.atomic():
+        ordenes = OrdenTrabajo.objects.update(
+            tiempo_total=Coalesce(por_orden(Sum('tiempo_real_acumulado'), DurationField()), cero),
+            tiempo_pausas_total=Coalesce(por_orden(Sum('tiempo_pausas'), DurationField()), cero),
+            actividades_finalizadas=Coalesce(por_orden(Count('id'), IntegerField()), 0),
+            fecha_fin_real=Coalesce(por_orden(Max('fecha_fin_real'), DateTimeField()), F('fecha_fin_real')),
+        )
+
+        # Las órdenes archivadas (ver ordenes/archivo.py) también suman a su día
+        dias = {}
+        for modelo in (Actividad, ActividadArchivada):
+            for fila in _resumen_por_dia(modelo.objects.all()):
+                clave = (fila['orden__codigo_trabajador'], fila['dia'])
+                activos, pausa, cantidad = dias.get(clave, (0, 0, 0))
+                dias[clave] = (activos + a_segundos(fila['activo']), pausa + a_segundos(fila['pausa']), cantidad + fila['cantidad'])
+        ResumenTrabajadorDia.objects.all().delete()
+        resumenes = ResumenTrabajadorDia.objects.bulk_create([
+            ResumenTrabajadorDia(
+                codigo_trabajador=codigo, fecha=dia,
+                segundos_activos=activos, segundos_pausa=pausa, actividades_finalizadas=cantidad,
+            )
+            for (codigo, dia), (activos, pausa, cantidad) in dias.items()
+        ], batch_size=1000)
+    return ordenes, len(resumenes)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+from django.db import transaction
+from django.utils import timezone
+from .models import Actividad, BitacoraActividad
+
+# ==========================================
+# LÍNEA DE TIEMPO DESDE LA BITÁCORA
+# Reconstruye los tramos ACTIVO / PAUSA de cada actividad a partir de sus eventos
+# (INICIO, PAUSA, REANUDAR, FINAL). Para muchas actividades se hace una sola
+# consulta ordenada por (actividad, fecha) y un solo recorrido agrupando en memoria.
+#
+# Ojo: fecha_hora es la hora en que el servidor recibió el evento (auto_now_add), no la
+# del teléfono. Lo que la App manda desde la bóveda offline llega todo junto al sincronizar,
+# así que esos tramos duran ~0 s aunque la bitácora se vea completa. Por eso solo se
+# reemplazan los tiempos de actividades con bitácora completa, coherente y sin ráfagas.
+# ==========================================
+ACTIVO = 'ACTIVO'
+PAUSA = 'PAUSA'
+# Dos eventos que llegaron con menos que esto de diferencia se tomaron como reenvío offline
+RAFAGA_OFFLINE = timedelta(seconds=5)
+
+# evento -> estado en el que queda la actividad (None = terminada)
+TRANSICIONES = {
+    'INICIO': ACTIVO,
+    'REANUDAR': ACTIVO,
+    'PAUSA': PAUSA,
+    'FINAL': None,
+}
+
+
+def reconstruir_tramos(eventos, corte=None):
+    # eventos: [(evento, fecha_hora), ...] ya ordenados por fecha.
+    # corte: hasta cuándo se cuenta un tramo que quedó abierto (por defecto, ahora).
+    tramos = []
+    estado, desde = None, None
+    iniciada = finalizada = False
+    anomalias = []
+    for evento, fecha in eventos:
+        nuevo = TRANSICIONES.get(evento)
+        if finalizada:
+            anomalias.append(f"{evento} después de FINAL {fecha.isoformat()}")
+            continue
+        if evento == 'INICIO':
+            if iniciada:
+                anomalias.append(f"INICIO repetido {fecha.isoformat()}")
+                continue
+            iniciada = True
+        elif not iniciada:
+            anomalias.append(f"{evento} antes de INICIO {fecha.isoformat()}")
+            continue
+        elif nuevo == estado:
+            # PAUSA sobre PAUSA o REANUDAR sin pausa (doble toque, reintento offline)
+            anomalias.append(f"{evento} repetido {fecha.isoformat()}")
+            continue
+
+        if estado is not None:
+            tramos.append({'tipo': estado, 'inicio': desde, 'fin': fecha})
+        estado, desde = nuevo, fecha
+        if evento == 'FINAL':
+            finalizada = True
+
+    if estado is not None:
+        tramos.append({'tipo': estado, 'inicio': desde, 'fin': None})
+
+    corte = corte or timezone.now()
+    activo = pausa = timedelta(0)
+    for tramo in tramos:
+        duracion = max((tramo['fin'] or corte) - tramo['inicio'], timedelta(0))
+        if tramo['tipo'] == ACTIVO:
+            activo += duracion
+        else:
+            pausa += duracion
+
+    return {
+        'tramos': tramos,
+        'tiempo_activo': activo,
+        'tiempo_pausas': pausa,
+        'completa': iniciada and finalizada and not anomalias,
+        'anomalias': anomalias,
+    }
+
+
+def llego_en_rafaga(linea):
+    # Algún tramo cerrado más corto que RAFAGA_OFFLINE: sus eventos llegaron juntos
+    # (ej: INICIO en línea y PAUSA/REANUDAR/FINAL desde la bóveda) y la duración no es real
+    return any(t['fin'] is not None and t['fin'] - t['inicio'] < RAFAGA_OFFLINE for t in linea['tramos'])
+
+
+def lineas_de_tiempo(actividades, corte=None, tamano_lote=5000):
+    # Genera (actividad_id, línea de tiempo) en una sola pasada ordenada por la bitácora
+    eventos = (
+        BitacoraActividad.objects.filter(actividad__in=actividades.values('pk'))
+        .order_by('actividad_id', 'fecha_hora', 'id')
+        .values_list('actividad_id', 'evento', 'fecha_hora')
+    )
+    for actividad_id, grupo in groupby(eventos.iterator(chunk_size=tamano_lote), key=itemgetter(0)):
+        yield actividad_id, reconstruir_tramos([(evento, fecha) for _, evento, fecha in grupo], corte)
+
+
+def recalcular_tiempos(actividades, aplicar=False, tamano_lote=1000):
+    # Compara los tiempos que mandó la App con los de la bitácora; con aplicar=True
+    # reemplaza los de las actividades finalizadas cuya bitácora está completa y no
+    # llegó en ráfaga (en ese caso los tiempos de la App son los únicos reales).
+    registrados = dict(
+        (pk, (activo, pausa))
+        for pk, activo, pausa in actividades.filter(finished=True).values_list('pk', 'tiempo_real_acumulado', 'tiempo_pausas').iterator()
+    )
+    resumen = {'revisadas': 0, 'incompletas': 0, 'en_rafaga': 0, 'distintas': 0, 'actualizadas': 0}
+    pendientes = []
+    ahora = timezone.now()
+
+    def guardar():
+        with transaction.atomic():
+            Actividad.objects.bulk_update(pendientes, ['tiempo_real_acumulado', 'tiempo_pausas', 'fecha_modificacion'])
+        resumen['actualizadas'] += len(pendientes)
+        pendientes.clear()
+
+    for actividad_id, linea in lineas_de_tiempo(actividades.filter(finished=True)):
+        resumen['revisadas'] += 1
+        if not linea['completa']:
+            resumen['incompletas'] += 1
+            continue
+        if llego_en_rafaga(linea):
+            resumen['en_rafaga'] += 1
+            continue
+        # Se compara al segundo: la App manda "HH:MM:SS"
+        calculado = (timedelta(seconds=int(linea['tiempo_activo'].total_seconds())),
+                     timedelta(seconds=int(linea['tiempo_pausas'].total_seconds())))
+        if registrados.get(actividad_id) == calculado:
+            continue
+        resumen['distintas'] += 1
+        if aplicar:
+            pendientes.append(Actividad(pk=actividad_id, tiempo_real_acumulado=calculado[0], tiempo_pausas=calculado[1], fecha_modificacion=ahora))
+            if len(pendientes) >= tamano_lote:
+                guardar()
+    if pendientes:
+        guardar()
+    return resumen
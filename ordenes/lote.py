@@ -0,0 +1,134 @@
+import re
+from urllib.parse import urlsplit
+from django.db import transaction
+from django.db.models.signals import post_save
+from .models import OrdenTrabajo, Actividad, BitacoraActividad
+from .serializers import ActividadSerializer, BitacoraSerializer
+from .operaciones import finalizar_orden, finalizar_actividad
+
+# ==========================================
+# LOTES: REPRODUCIR LA BÓVEDA OFFLINE EN UNA SOLA PETICIÓN
+# Cada operación tiene la misma forma que una entrada de Hive en la App:
+#   {"url": ".../api/bitacora/", "metodo": "POST", "body": {...}}
+# Todo corre en una transacción; cada operación en su propio savepoint para que
+# una fallida no tumbe a las demás. Los POST de bitácora seguidos se insertan
+# con un solo bulk_create, que no dispara post_save: se emite a mano por cada fila
+# para que un receptor de signals.py no distinga el lote de un POST suelto.
+# Las demás operaciones usan save() y disparan sus señales (lápidas, avisos) solas.
+# ==========================================
+MAX_OPERACIONES_LOTE = 500
+
+RUTA_BITACORA = re.compile(r'/api/bitacora/$')
+RUTA_ACTIVIDAD = re.compile(r'/api/actividades/(?P<pk>\d+)/$')
+RUTA_FINALIZAR_ACTIVIDAD = re.compile(r'/api/actividades/(?P<pk>\d+)/finalizar/$')
+RUTA_FINALIZAR_ORDEN = re.compile(r'/api/ordenes/(?P<pk>\d+)/finalizar/$')
+
+
+class OperacionInvalida(Exception):
+    def __init__(self, error, status=400):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def _ruta(url):
+    ruta = urlsplit(str(url or '')).path
+    return ruta if ruta.endswith('/') else ruta + '/'
+
+
+def _actividad(pk):
+    try:
+        return Actividad.objects.get(pk=pk)
+    except Actividad.DoesNotExist:
+        raise OperacionInvalida("Actividad no encontrada", status=404)
+
+
+def _orden(pk):
+    try:
+        return OrdenTrabajo.objects.get(pk=pk)
+    except OrdenTrabajo.DoesNotExist:
+        raise OperacionInvalida("Orden no encontrada", status=404)
+
+
+def _ejecutar_simple(ruta, metodo, body, contexto):
+    match = RUTA_FINALIZAR_ACTIVIDAD.search(ruta)
+    if match and metodo in ('POST', 'PATCH'):
+        return 200, finalizar_actividad(_actividad(match['pk']), body)
+
+    match = RUTA_FINALIZAR_ORDEN.search(ruta)
+    if match and metodo == 'POST':
+        return 200, finalizar_orden(_orden(match['pk']))
+
+    match = RUTA_ACTIVIDAD.search(ruta)
+    if match and metodo == 'PATCH':
+        serializer = ActividadSerializer(_actividad(match['pk']), data=body, partial=True, context=contexto)
+        if not serializer.is_valid():
+            raise OperacionInvalida(serializer.errors)
+        serializer.save()
+        return 200, serializer.data
+
+    raise OperacionInvalida(f"Operación no soportada en lote: {metodo} {ruta}")
+
+
+class _BufferBitacora:
+    # Acumula POSTs de bitácora ya validados y los inserta de una sola vez
+    def __init__(self):
+        self.pendientes = []
+
+    def agregar(self, indice, serializer):
+        self.pendientes.append((indice, BitacoraActividad(**serializer.validated_data)))
+
+    def vaciar(self, resultados, contexto):
+        if not self.pendientes:
+            return
+        indices = [indice for indice, _ in self.pendientes]
+        try:
+            with transaction.atomic():
+                creados = BitacoraActividad.objects.bulk_create([obj for _, obj in self.pendientes])
+                for obj in creados:
+                    post_save.send(sender=BitacoraActividad, instance=obj, created=True, update_fields=None, raw=False, using=obj._state.db)
+        except Exception as e:
+            for indice in indices:
+                resultados[indice] = {'indice': indice, 'status': 400, 'error': str(e)}
+        else:
+            for indice, obj in zip(indices, creados):
+                resultados[indice] = {'indice': indice, 'status': 201, 'data': BitacoraSerializer(obj, context=contexto).data}
+        self.pendientes = []
+
+
+def ejecutar_lote(operaciones, contexto=None):
+    resultados = [None] * len(operaciones)
+    buffer_bitacora = _BufferBitacora()
+
+    with transaction.atomic():
+        for indice, operacion in enumerate(operaciones):
+            if not isinstance(operacion, dict):
+                resultados[indice] = {'indice': indice, 'status': 400, 'error': "Cada operación debe ser un objeto"}
+                continue
+
+            ruta = _ruta(operacion.get('url'))
+            metodo = str(operacion.get('metodo') or 'POST').upper()
+            body = operacion.get('body') or {}
+
+            if RUTA_BITACORA.search(ruta) and metodo == 'POST':
+                serializer = BitacoraSerializer(data=body, context=contexto)
+                if serializer.is_valid():
+                    buffer_bitacora.agregar(indice, serializer)
+                else:
+                    resultados[indice] = {'indice': indice, 'status': 400, 'error': serializer.errors}
+                continue
+
+            # Lo que va después en la cola puede depender de la bitácora anterior
+            buffer_bitacora.vaciar(resultados, contexto)
+            try:
+                with transaction.atomic():
+                    status, data = _ejecutar_simple(ruta, metodo, body, contexto)
+                resultados[indice] = {'indice': indice, 'status': status, 'data': data}
+            except OperacionInvalida as e:
+                resultados[indice] = {'indice': indice, 'status': e.status, 'error': e.error}
+            except Exception as e:
+                resultados[indice] = {'indice': indice, 'status': 400, 'error': str(e)}
+
+        buffer_bitacora.vaciar(resultados, contexto)
+
+    return resultados
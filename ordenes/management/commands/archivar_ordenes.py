@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from ordenes.archivo import ANTIGUEDAD_DIAS, TAMANO_LOTE, archivables, archivar_ordenes
+
+
+class Command(BaseCommand):
+    help = "Pasa las órdenes FINALIZADAS viejas (con actividades, bitácora y fotos) al Historial Archivado"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=ANTIGUEDAD_DIAS, help="Antigüedad mínima desde el cierre (por defecto ARCHIVO_DIAS)")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Órdenes por transacción")
+        parser.add_argument('--maximo', type=int, default=None, help="Tope de órdenes en esta corrida")
+        parser.add_argument('--aplicar', action='store_true', help="Archiva (sin esto solo informa cuántas hay)")
+
+    def handle(self, *args, **options):
+        dias = options['dias']
+        if dias <= 0:
+            self.stdout.write(self.style.WARNING("Archivo desactivado (--dias / ARCHIVO_DIAS en 0)."))
+            return
+        if not options['aplicar']:
+            self.stdout.write(f"Órdenes finalizadas hace más de {dias} días que se pueden archivar: {archivables(dias).count()}")
+            self.stdout.write(self.style.WARNING("Nada modificado: use --aplicar."))
+            return
+
+        inicio = time.perf_counter()
+        total = archivar_ordenes(dias, lote=options['lote'], maximo=options['maximo'])
+        self.stdout.write(self.style.SUCCESS(f"Órdenes archivadas: {total} ({time.perf_counter() - inicio:.1f}s)"))
@@ -0,0 +1,39 @@
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from ordenes.exportacion import ENCABEZADOS, escribir_reporte, formatear_tiempo, calcular_decimal
+
+
+def filas_sinteticas(cantidad):
+    inicio = datetime(2026, 1, 1, 7, 0)
+    for i in range(cantidad):
+        t_activo = formatear_tiempo(f"{(i % 36000) * 1000000}")
+        yield [
+            f"4000{i // 20:06d}", f"{(i % 20) * 10:04d}", f"Revisión de rodamientos y lubricación #{i}",
+            f"EQ-{i % 500:05d}", f"MR-ING-PLT-{i % 80:03d}",
+            inicio.strftime('%d/%m/%Y'), inicio.strftime('%d/%m/%Y'),
+            f"Operario {i % 60}", inicio.strftime('%d/%m/%Y %H:%M'), inicio.strftime('%d/%m/%Y %H:%M'),
+            t_activo, calcular_decimal(t_activo), "00:05:00", 0.08,
+        ]
+
+
+class Command(BaseCommand):
+    help = "Mide memoria pico y tiempo del reporte de cierre (Excel) con filas sintéticas, sin tocar la base de datos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', nargs='+', type=int, default=[1000, 10000, 100000])
+
+    def handle(self, *args, **options):
+        anchos = [len(e) + 2 for e in ENCABEZADOS]
+        self.stdout.write(f"{'Filas':>10} {'Segundos':>10} {'Memoria pico (MB)':>18}")
+        for cantidad in options['filas']:
+            with tempfile.TemporaryFile(suffix='.xlsx') as destino:
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                escribir_reporte(filas_sinteticas(cantidad), destino, anchos)
+                segundos = time.perf_counter() - inicio
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self.stdout.write(f"{cantidad:>10} {segundos:>10.2f} {pico / (1024 * 1024):>18.2f}")
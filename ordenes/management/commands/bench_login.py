@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+PREFIJO = 'bench-login-'
+PASSWORD = 'turno-bench-123'
+
+
+def host_permitido():
+    # django.test.Client manda 'testserver', que con DEBUG=False no está en ALLOWED_HOSTS (400)
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def _entrar(trabajo):
+    # Corre en un proceso aparte que hace de worker de gunicorn (cada uno con su propia caché
+    # LocMem). No es gunicorn: django.test.Client llama al handler en el mismo proceso, sin
+    # HTTP ni nginx, así que mide el costo de Django (PBKDF2, consultas) y no el de la red.
+    modo, sesiones = trabajo
+    client = Client(HTTP_HOST=host_permitido())
+    errores = 0
+    for codigo, key in sesiones:
+        extra = {'HTTP_AUTHORIZATION': f'Token {key}'} if modo == 'token' else {}
+        respuesta = client.post(
+            '/api/login-operario/', json.dumps({'codigo': codigo, 'password': PASSWORD}),
+            content_type='application/json', **extra,
+        )
+        errores += respuesta.status_code != 200
+    connections.close_all()
+    return errores
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide logins por segundo de login-operario con contraseña y con token (reanudación), con N procesos "
+        "en paralelo, en una base de test aparte. Cada proceso usa django.test.Client en lugar de un worker "
+        "de gunicorn real: no incluye HTTP ni nginx"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=3, help="Procesos en paralelo (workers de gunicorn)")
+        parser.add_argument('--operarios', type=int, default=60)
+        parser.add_argument('--rondas', type=int, default=1, help="Veces que entra cada operario por modo")
+
+    def handle(self, *args, **options):
+        # Los operarios de prueba van a una base de test aparte (como manage.py test), nunca a la real.
+        # En SQLite, en disco: la base en memoria no se comparte con los procesos hijos.
+        nombre_original = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_login.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.medir(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def medir(self, options):
+        procesos = options['procesos']
+        # Un solo hash para todos: crear los usuarios no debe costar N veces PBKDF2
+        hash_password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'{PREFIJO}{i}', first_name='Bench', password=hash_password)
+            for i in range(options['operarios'])
+        ])
+        Token.objects.bulk_create([
+            Token(user=u, key=Token.generate_key()) for u in User.objects.filter(username__startswith=PREFIJO)
+        ])
+        sesiones = list(Token.objects.filter(user__username__startswith=PREFIJO).values_list('user__username', 'key'))
+        sesiones *= options['rondas']
+
+        self.stdout.write(f"{'Modo':>12} {'Logins':>8} {'Segundos':>10} {'Logins/s':>10} {'Errores':>8}")
+        contexto = multiprocessing.get_context('fork')
+        for modo in ('contraseña', 'token'):
+            partes = [(modo, sesiones[i::procesos]) for i in range(procesos)]
+            # Los hijos no deben heredar la conexión abierta del padre
+            connections.close_all()
+            inicio = time.perf_counter()
+            with contexto.Pool(procesos) as pool:
+                errores = sum(pool.map(_entrar, partes))
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(f"{modo:>12} {len(sesiones):>8} {segundos:>10.2f} {len(sesiones) / segundos:>10.1f} {errores:>8}")
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from ordenes.models import OrdenTrabajo, Actividad
+from ordenes.exportacion import actividades_reporte
+from ordenes.filtros import filtrar_ordenes
+
+
+def consultas_clave(codigo):
+    # Las mismas consultas que hacen las pantallas del admin, la App y el login
+    finalizadas = OrdenTrabajo.objects.filter(estado='FINALIZADA')
+    return [
+        ("Admin Borradores (estado + ORDER BY -id)", OrdenTrabajo.objects.filter(estado='BORRADOR').order_by('-id')[:100]),
+        ("Admin En Curso (estado + ORDER BY -id)", OrdenTrabajo.objects.filter(estado='PENDIENTE').order_by('-id')[:100]),
+        ("Admin Historial (estado + fin_programado)", finalizadas.filter(fin_programado__year=2026).order_by('-id')[:100]),
+        ("App: órdenes del operario", filtrar_ordenes(OrdenTrabajo.objects.order_by('-id'), {'trabajador': codigo, 'estado': 'PENDIENTE'})),
+        ("login_operario: User username__iexact", User.objects.filter(username__iexact=codigo)),
+        ("login_operario: órdenes codigo_trabajador__iexact", OrdenTrabajo.objects.filter(codigo_trabajador__iexact=codigo)[:1]),
+        ("Actividades de una orden", Actividad.objects.filter(orden_id=1)),
+        ("Exportación de cierre (JOIN)", actividades_reporte(finalizadas.order_by('-id')[:500])),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Muestra el plan (EXPLAIN) de las consultas más usadas para confirmar que usan índices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codigo', default='1001', help="Código de operario para las consultas de ejemplo")
+        parser.add_argument('--analyze', action='store_true', help="EXPLAIN ANALYZE (solo Postgres; ejecuta la consulta)")
+
+    def handle(self, *args, **options):
+        es_postgres = connection.vendor == 'postgresql'
+        opciones = {'analyze': True, 'buffers': True} if (options['analyze'] and es_postgres) else {}
+        recorrido_completo = 'Seq Scan' if es_postgres else 'SCAN '
+
+        consultas = consultas_clave(options['codigo'])
+        sospechosas = 0
+        for titulo, queryset in consultas:
+            plan = queryset.explain(**opciones)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {titulo}"))
+            self.stdout.write(plan)
+            if recorrido_completo in plan:
+                sospechosas += 1
+                self.stdout.write(self.style.WARNING("   ⚠ Recorre la tabla completa (normal con tablas chicas; en SQLite iexact usa LIKE y no aprovecha índices)"))
+
+        resumen = f"\n{sospechosas} de {len(consultas)} consultas usan recorrido completo."
+        self.stdout.write(self.style.WARNING(resumen) if sospechosas else self.style.SUCCESS(resumen))
@@ -0,0 +1,39 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ordenes.importacion import leer_dataset, importar_sap_rapido, texto_archivadas, FormatoNoSoportado
+
+
+class Command(BaseCommand):
+    help = "Importa un Excel de SAP con el modo rápido (upserts por conjuntos) y muestra el tiempo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--usuario', help="Username del planificador que queda como 'Asignado por'")
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                dataset = leer_dataset(archivo, options['archivo'])
+        except FormatoNoSoportado as e:
+            raise CommandError(str(e))
+        lectura = time.perf_counter() - inicio
+
+        resumen = importar_sap_rapido(dataset, usuario)
+        total = time.perf_counter() - inicio
+        if resumen['errores']:
+            raise CommandError("No se importó nada:\n" + "\n".join(resumen['errores'][:50]))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(dataset)} filas en {total:.1f}s (lectura {lectura:.1f}s) | "
+            f"Órdenes nuevas: {resumen['ordenes_nuevas']}, actualizadas: {resumen['ordenes_actualizadas']} | "
+            f"Operaciones nuevas: {resumen['actividades_nuevas']}, actualizadas: {resumen['actividades_actualizadas']}"
+            + texto_archivadas(resumen)
+        ))
@@ -0,0 +1,79 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+from ordenes.models import ArchivoFoto, Evidencia, EvidenciaArchivada
+from ordenes.almacen import adoptar_archivo, liberar_archivo
+
+# Archivos más nuevos que esto pueden ser de una subida que todavía no hizo COMMIT
+ANTIGUEDAD_MINIMA = 60 * 60
+CARPETAS_EXCLUIDAS = {'subidas_tmp'}
+
+
+class Command(BaseCommand):
+    help = "Deduplica las fotos de evidencias, corrige contadores y busca archivos huérfanos en media/evidencias"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--aplicar', action='store_true', help="Hace los cambios y borra archivos (sin esto solo informa)")
+
+    def handle(self, *args, **options):
+        aplicar = options['aplicar']
+        inicio = time.perf_counter()
+
+        # 1. Evidencias anteriores al almacén por contenido
+        sin_archivo = Evidencia.objects.filter(archivo__isnull=True).exclude(foto='')
+        if aplicar:
+            adoptadas = 0
+            for evidencia in sin_archivo.iterator():
+                try:
+                    adoptar_archivo(evidencia)
+                    adoptadas += 1
+                except OSError as e:
+                    self.stderr.write(f"Evidencia #{evidencia.pk}: {e}")
+            self.stdout.write(f"Evidencias pasadas al almacén por contenido: {adoptadas}")
+        else:
+            self.stdout.write(f"Evidencias sin ArchivoFoto: {sin_archivo.count()}")
+
+        # 2. Contadores de referencias desfasados y archivos sin uso
+        desfasados = list(
+            # Cuentan también las evidencias de órdenes archivadas (ver ordenes/archivo.py)
+            ArchivoFoto.objects.annotate(reales=Count('evidencias', distinct=True) + Count('evidencias_archivadas', distinct=True))
+            .exclude(referencias=F('reales')).values_list('pk', 'referencias', 'reales')
+        )
+        if aplicar:
+            for pk, _, _ in desfasados:
+                liberar_archivo(pk)
+        sin_uso = sum(1 for _, _, reales in desfasados if reales == 0)
+        self.stdout.write(f"Contadores corregidos: {len(desfasados)} (sin uso: {sin_uso})")
+
+        # 3. Archivos en disco que ninguna fila referencia
+        en_uso = set()
+        for archivo, miniatura in ArchivoFoto.objects.values_list('archivo', 'miniatura').iterator():
+            en_uso.update((archivo, miniatura))
+        for modelo in (Evidencia, EvidenciaArchivada):
+            for foto, miniatura in modelo.objects.values_list('foto', 'miniatura').iterator():
+                en_uso.update((foto, miniatura))
+
+        raiz = os.path.join(settings.MEDIA_ROOT, 'evidencias')
+        limite = time.time() - ANTIGUEDAD_MINIMA
+        huerfanos, liberados = 0, 0
+        for carpeta, subcarpetas, archivos in os.walk(raiz):
+            subcarpetas[:] = [s for s in subcarpetas if s not in CARPETAS_EXCLUIDAS]
+            for nombre in archivos:
+                ruta = os.path.join(carpeta, nombre)
+                relativo = os.path.relpath(ruta, settings.MEDIA_ROOT).replace(os.sep, '/')
+                if relativo in en_uso or os.path.getmtime(ruta) > limite:
+                    continue
+                huerfanos += 1
+                liberados += os.path.getsize(ruta)
+                if aplicar:
+                    os.remove(ruta)
+
+        accion = "Borrados" if aplicar else "Se pueden borrar"
+        self.stdout.write(self.style.SUCCESS(
+            f"{accion}: {huerfanos} archivos huérfanos, {liberados / (1024 * 1024):.1f} MB "
+            f"({time.perf_counter() - inicio:.1f}s)"
+        ))
+        if not aplicar:
+            self.stdout.write(self.style.WARNING("Nada modificado: use --aplicar."))
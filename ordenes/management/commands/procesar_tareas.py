@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ordenes.tareas import tomar_siguiente, ejecutar, liberar_abandonadas
+from ordenes.imagenes import procesar_pendientes
+from ordenes.subidas import purgar_subidas_vencidas
+from ordenes.archivo import TAMANO_LOTE, archivar_ordenes
+from ordenes.sincronizacion import purgar_lapidas
+
+# Cada cuánto se buscan órdenes para el Historial Archivado (ver ordenes/archivo.py)
+INTERVALO_ARCHIVO = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Worker de tareas en segundo plano (importaciones SAP, exportaciones de cierre, fotos de evidencias y archivo de órdenes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help="Procesa lo que haya en cola y termina")
+        parser.add_argument('--espera', type=float, default=3.0, help="Segundos entre consultas a la cola vacía")
+
+    def handle(self, *args, **options):
+        self.stdout.write("👷 Worker de tareas iniciado.")
+        ultimo_archivo = None
+        while True:
+            close_old_connections()
+            liberadas = liberar_abandonadas()
+            if liberadas:
+                self.stdout.write(self.style.WARNING(f"{liberadas} tareas abandonadas volvieron a la cola."))
+            purgar_subidas_vencidas()
+
+            # Las fotos nuevas se procesan en lotes chicos entre tarea y tarea
+            fotos = procesar_pendientes()
+            if fotos:
+                self.stdout.write(f"📷 {fotos} evidencias procesadas.")
+
+            # Un lote por vuelta, para no demorar las tareas en cola; si quedó lleno hay más
+            archivadas = 0
+            if ultimo_archivo is None or time.monotonic() - ultimo_archivo > INTERVALO_ARCHIVO:
+                archivadas = archivar_ordenes(maximo=TAMANO_LOTE)
+                if archivadas:
+                    self.stdout.write(f"🗄 {archivadas} órdenes archivadas.")
+                if archivadas < TAMANO_LOTE:
+                    ultimo_archivo = time.monotonic()
+                    # Con la misma frecuencia: lápidas que ya no necesita ningún cursor válido
+                    purgar_lapidas()
+
+            tarea = tomar_siguiente()
+            if tarea is None and (fotos or archivadas):
+                continue
+            if tarea is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['espera'])
+                continue
+
+            self.stdout.write(f"▶ {tarea}")
+            ejecutar(tarea)
+            estilo = self.style.SUCCESS if tarea.estado == 'COMPLETADA' else self.style.ERROR
+            self.stdout.write(estilo(f"■ {tarea}"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ordenes.idempotencia import purgar_vencidas
+
+
+class Command(BaseCommand):
+    help = "Elimina las claves de idempotencia vencidas"
+
+    def handle(self, *args, **options):
+        borradas = purgar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Se eliminaron {borradas} claves vencidas."))
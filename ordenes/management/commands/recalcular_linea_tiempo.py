@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from ordenes.models import Actividad
+from ordenes.filtros import filtrar_rangos_fecha
+from ordenes.kpis import reconstruir_kpis
+from ordenes.linea_tiempo import recalcular_tiempos
+
+
+class Command(BaseCommand):
+    help = "Recalcula los tiempos activo/pausa de las actividades finalizadas a partir de la bitácora"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha de fin real desde (YYYY-MM-DD)")
+        parser.add_argument('--hasta', help="Fecha de fin real hasta, inclusive (YYYY-MM-DD)")
+        parser.add_argument('--aplicar', action='store_true', help="Guarda los tiempos recalculados (sin esto solo informa)")
+
+    def handle(self, *args, **options):
+        for opcion in ('desde', 'hasta'):
+            if options[opcion] and parse_date(options[opcion]) is None:
+                raise CommandError(f"--{opcion} inválido, use YYYY-MM-DD")
+        params = {'cierre_desde': options['desde'], 'cierre_hasta': options['hasta']}
+        actividades = filtrar_rangos_fecha(Actividad.objects.all(), params, {'cierre': 'fecha_fin_real'})
+
+        inicio = time.perf_counter()
+        resumen = recalcular_tiempos(actividades, aplicar=options['aplicar'])
+        self.stdout.write(
+            f"Revisadas: {resumen['revisadas']} | Bitácora incompleta: {resumen['incompletas']} | "
+            f"Eventos reenviados juntos (offline): {resumen['en_rafaga']} | "
+            f"Distintas a lo registrado: {resumen['distintas']} | Actualizadas: {resumen['actualizadas']} "
+            f"({time.perf_counter() - inicio:.1f}s)"
+        )
+        if resumen['actualizadas']:
+            ordenes, dias = reconstruir_kpis()
+            self.stdout.write(self.style.SUCCESS(f"KPIs reconstruidos: {ordenes} órdenes, {dias} resúmenes diarios."))
+        elif not options['aplicar'] and resumen['distintas']:
+            self.stdout.write(self.style.WARNING("Nada guardado: use --aplicar para reemplazar los tiempos."))
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from ordenes.kpis import reconstruir_kpis
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los KPIs por orden y el resumen diario por operario"
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        ordenes, dias = reconstruir_kpis()
+        self.stdout.write(self.style.SUCCESS(
+            f"KPIs reconstruidos: {ordenes} órdenes, {dias} resúmenes diarios ({time.perf_counter() - inicio:.1f}s)."
+        ))
@@ -0,0 +1,108 @@
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from urllib.parse import quote, urlencode
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils.crypto import constant_time_compare
+from .models import Evidencia
+from .autenticacion import sesion_por_token
+
+# ==========================================
+# ARCHIVOS DE /media/ CON CONTROL DE ACCESO
+# Django solo decide si se puede ver el archivo; lo envía nginx con sendfile
+# (X-Accel-Redirect a una location "internal"), así que un worker de gunicorn no
+# queda ocupado copiando bytes. Pueden verlo:
+# - usuarios del admin (sesión con is_staff): todo
+# - un operario con "Authorization: Token ...": las fotos de órdenes asignadas a él
+# - cualquiera con una URL firmada (la App muestra la galería con Image.network, que no
+#   manda headers). La API firma solo para staff o el operario de la orden; a los demás
+#   les devuelve la URL sin firma. La firma vence; el vencimiento se redondea al día
+#   para que la URL no cambie en cada sync y la caché de la App siga sirviendo.
+# El control solo se aplica con MEDIA_PROTEGIDO = True: la App publicada todavía pide la
+# API sin "Authorization", recibe URLs sin firma y con el control activo no vería ninguna foto.
+# Mientras esté apagado se sirve todo /media/ salvo las carpetas privadas, como antes.
+# ==========================================
+PREFIJO_INTERNO = getattr(settings, 'MEDIA_X_ACCEL', None)  # '/protegido/' detrás de nginx; None = lo sirve Django
+VIGENCIA_FIRMA = getattr(settings, 'MEDIA_FIRMA_SEGUNDOS', 7 * 24 * 60 * 60)
+CACHE_NAVEGADOR = 24 * 60 * 60
+CARPETAS_PRIVADAS = ('subidas_tmp/',)
+SAL = 'ordenes.medios'
+DIA = 24 * 60 * 60
+# evidencias/archivos/ab/<sha256>_<id>[_p|_min].jpg (ver ordenes/almacen.py)
+PATRON_ARCHIVO = re.compile(r'^evidencias/archivos/[0-9a-f]{2}/[0-9a-f]{64}_(\d+)(?:_\w+)?\.\w+$')
+
+
+def _firma(ruta, expira):
+    return signing.Signer(salt=SAL).signature(f"{ruta}|{expira}")
+
+
+def parametros_firma(ruta):
+    expira = (int(time.time()) // DIA + 1) * DIA + VIGENCIA_FIRMA
+    return {'exp': expira, 'firma': _firma(ruta, expira)}
+
+
+def url_firmada(url, ruta):
+    return f"{url}?{urlencode(parametros_firma(ruta))}"
+
+
+def normalizar_ruta(ruta):
+    # None si la ruta intenta salir de MEDIA_ROOT o apunta a algo que nunca se sirve
+    ruta = posixpath.normpath(ruta or '').lstrip('/')
+    if not ruta or ruta == '.' or ruta.startswith('..') or '\x00' in ruta or ruta.startswith(CARPETAS_PRIVADAS):
+        return None
+    return ruta
+
+
+def firma_valida(ruta, expira, firma):
+    try:
+        expira = int(expira)
+    except (TypeError, ValueError):
+        return False
+    return expira > time.time() and constant_time_compare(firma or '', _firma(ruta, expira))
+
+
+def evidencias_del_archivo(ruta):
+    match = PATRON_ARCHIVO.match(ruta)
+    if match:
+        return Evidencia.objects.filter(archivo_id=int(match.group(1)))
+    # Fotos anteriores al almacén por contenido
+    return Evidencia.objects.filter(Q(foto=ruta) | Q(miniatura=ruta))
+
+
+def usuario_puede_ver(usuario, codigo_trabajador):
+    # Para una evidencia ya cargada: la API firma la URL solo si quien pide podría verla igual
+    if usuario is None or not usuario.is_authenticated:
+        return False
+    return usuario.is_staff or (codigo_trabajador or '').lower() == usuario.username.lower()
+
+
+def puede_ver(request, ruta):
+    if not getattr(settings, 'MEDIA_PROTEGIDO', False):
+        return True
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    if firma_valida(ruta, request.GET.get('exp'), request.GET.get('firma')):
+        return True
+    usuario, _ = sesion_por_token(request)
+    if usuario is None:
+        return False
+    if usuario.is_staff:
+        return True
+    return evidencias_del_archivo(ruta).filter(orden__codigo_trabajador__iexact=usuario.username).exists()
+
+
+def ruta_interna(ruta):
+    return quote(PREFIJO_INTERNO + ruta)
+
+
+def ruta_local(ruta):
+    completa = os.path.join(settings.MEDIA_ROOT, *ruta.split('/'))
+    return completa if os.path.isfile(completa) else None
+
+
+def tipo_contenido(ruta):
+    return mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-18 08:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0017_ordentrabajo_supervisor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ordenborrador',
+            options={'verbose_name': '1. Borradores', 'verbose_name_plural': '1. Borradores'},
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['codigo_trabajador', 'estado'], name='orden_trabajador_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['inicio_programado'], name='orden_inicio_prog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['fin_programado'], name='orden_fin_prog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['fecha_fin_real'], name='orden_fin_real_idx'),
+        ),
+    ]
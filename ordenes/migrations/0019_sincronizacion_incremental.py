@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0018_ordentrabajo_indices_filtros_api'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('ORDEN', 'Orden de Trabajo'), ('ACTIVIDAD', 'Actividad'), ('BITACORA', 'Bitácora'), ('EVIDENCIA', 'Evidencia')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('codigo_trabajador', models.CharField(blank=True, max_length=20, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['codigo_trabajador', 'fecha'], name='lapida_trabajador_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='bitacoraactividad',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0020_claves_idempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaFondo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('EXPORTAR_CIERRE', 'Exportar reporte de cierre (Excel)'), ('IMPORTAR_SAP', 'Importar órdenes desde SAP')], max_length=20, verbose_name='Tipo de Tarea')),
+                ('estado', models.CharField(choices=[('EN_COLA', 'En cola'), ('EN_PROCESO', 'En proceso'), ('COMPLETADA', 'Completada'), ('FALLIDA', 'Fallida')], default='EN_COLA', max_length=20, verbose_name='Estado')),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('archivo_entrada', models.FileField(blank=True, null=True, upload_to='tareas/entrada/%Y/%m/', verbose_name='Archivo a Importar')),
+                ('archivo_resultado', models.FileField(blank=True, null=True, upload_to='tareas/resultado/%Y/%m/', verbose_name='Resultado')),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('mensaje', models.TextField(blank=True, default='', verbose_name='Detalle')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('latido', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Tarea en Segundo Plano',
+                'verbose_name_plural': '4. Tareas en Segundo Plano',
+                'indexes': [models.Index(fields=['estado', 'id'], name='tarea_estado_idx')],
+            },
+        ),
+    ]
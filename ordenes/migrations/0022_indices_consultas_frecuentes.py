@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:11
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+# auth_user es de django.contrib.auth, así que su índice va en SQL directo.
+# login_operario hace username__iexact -> UPPER(username::text) = UPPER(...) en Postgres.
+def crear_indice_username(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS auth_user_username_upper_idx ON auth_user (UPPER(username))')
+
+
+def borrar_indice_username(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS auth_user_username_upper_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0021_tareas_segundo_plano'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['estado', 'id'], name='orden_estado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(fields=['estado', 'fin_programado'], name='orden_estado_fin_prog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordentrabajo',
+            index=models.Index(django.db.models.functions.text.Upper('codigo_trabajador'), name='orden_trabajador_upper_idx'),
+        ),
+        migrations.RunPython(crear_indice_username, borrar_indice_username),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0022_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='actividades_finalizadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ordentrabajo',
+            name='tiempo_pausas_total',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ResumenTrabajadorDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo_trabajador', models.CharField(max_length=20, verbose_name='Código Operario')),
+                ('fecha', models.DateField()),
+                ('segundos_activos', models.BigIntegerField(default=0)),
+                ('segundos_pausa', models.BigIntegerField(default=0)),
+                ('actividades_finalizadas', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario por Operario',
+                'indexes': [models.Index(fields=['fecha'], name='resumen_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumentrabajadordia',
+            constraint=models.UniqueConstraint(fields=('codigo_trabajador', 'fecha'), name='resumen_trabajador_dia_unico'),
+        ),
+    ]
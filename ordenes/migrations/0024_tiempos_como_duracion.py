@@ -0,0 +1,107 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:40
+
+import datetime
+import re
+from django.db import migrations, models
+
+
+# Los tiempos se guardaban como texto en formatos mezclados ("HH:MM:SS", str(timedelta)
+# o microsegundos crudos). Se copian a columnas de duración nuevas y luego se reemplazan.
+# La conversión va copiada aquí (no se importa ordenes.tiempos) para que la migración
+# no cambie si más adelante cambia el código de la app.
+PATRON_TIMEDELTA = re.compile(r'^(?:(?P<dias>-?\d+) days?, )?(?P<horas>\d+):(?P<minutos>\d{1,2}):(?P<segundos>\d{1,2})(?:\.\d+)?$')
+
+
+def texto_a_segundos(valor):
+    # Lo que no se entiende queda en 0, igual que se mostraba antes
+    texto = str(valor or '').strip()
+    if texto.isdigit():
+        return int(texto) // 1000000
+    match = PATRON_TIMEDELTA.match(texto)
+    if not match:
+        return 0
+    dias = int(match['dias'] or 0)
+    return dias * 86400 + int(match['horas']) * 3600 + int(match['minutos']) * 60 + int(match['segundos'])
+
+
+def segundos_a_texto(segundos):
+    horas, rem = divmod(int(segundos), 3600)
+    minutos, segundos = divmod(rem, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
+
+
+def copiar_tiempos(apps, schema_editor):
+    Actividad = apps.get_model('ordenes', 'Actividad')
+    pendientes = []
+    actividades = Actividad.objects.only('id', 'tiempo_real_acumulado', 'tiempo_pausas').order_by('id')
+    for act in actividades.iterator(chunk_size=2000):
+        act.tiempo_activo_nuevo = datetime.timedelta(seconds=texto_a_segundos(act.tiempo_real_acumulado))
+        act.tiempo_pausas_nuevo = datetime.timedelta(seconds=texto_a_segundos(act.tiempo_pausas))
+        pendientes.append(act)
+        if len(pendientes) >= 2000:
+            Actividad.objects.bulk_update(pendientes, ['tiempo_activo_nuevo', 'tiempo_pausas_nuevo'])
+            pendientes = []
+    Actividad.objects.bulk_update(pendientes, ['tiempo_activo_nuevo', 'tiempo_pausas_nuevo'])
+
+
+def devolver_tiempos(apps, schema_editor):
+    Actividad = apps.get_model('ordenes', 'Actividad')
+    pendientes = []
+    actividades = Actividad.objects.only('id', 'tiempo_activo_nuevo', 'tiempo_pausas_nuevo').order_by('id')
+    for act in actividades.iterator(chunk_size=2000):
+        act.tiempo_real_acumulado = segundos_a_texto(act.tiempo_activo_nuevo.total_seconds())
+        act.tiempo_pausas = segundos_a_texto(act.tiempo_pausas_nuevo.total_seconds())
+        pendientes.append(act)
+        if len(pendientes) >= 2000:
+            Actividad.objects.bulk_update(pendientes, ['tiempo_real_acumulado', 'tiempo_pausas'])
+            pendientes = []
+    Actividad.objects.bulk_update(pendientes, ['tiempo_real_acumulado', 'tiempo_pausas'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0023_kpis_precalculados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actividad',
+            name='tiempo_activo_nuevo',
+            field=models.DurationField(default=datetime.timedelta(0)),
+        ),
+        migrations.AddField(
+            model_name='actividad',
+            name='tiempo_pausas_nuevo',
+            field=models.DurationField(default=datetime.timedelta(0)),
+        ),
+        migrations.RunPython(copiar_tiempos, devolver_tiempos),
+        migrations.RemoveField(
+            model_name='actividad',
+            name='tiempo_real_acumulado',
+        ),
+        migrations.RemoveField(
+            model_name='actividad',
+            name='tiempo_pausas',
+        ),
+        migrations.RenameField(
+            model_name='actividad',
+            old_name='tiempo_activo_nuevo',
+            new_name='tiempo_real_acumulado',
+        ),
+        migrations.RenameField(
+            model_name='actividad',
+            old_name='tiempo_pausas_nuevo',
+            new_name='tiempo_pausas',
+        ),
+        migrations.AlterField(
+            model_name='actividad',
+            name='tiempo_real_acumulado',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='Tiempo Activo'),
+        ),
+        migrations.AlterField(
+            model_name='actividad',
+            name='tiempo_pausas',
+            field=models.DurationField(default=datetime.timedelta(0), verbose_name='Tiempo en Pausa'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0024_tiempos_como_duracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoOrden',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo_trabajador', models.CharField(max_length=20)),
+                ('orden_id', models.BigIntegerField()),
+                ('motivo', models.CharField(choices=[('ASIGNADA', 'Asignada'), ('MODIFICADA', 'Modificada'), ('REASIGNADA', 'Reasignada a otro operario'), ('ELIMINADA', 'Eliminada')], max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['codigo_trabajador', 'id'], name='aviso_trabajador_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0025_avisos_tiempo_real'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evidencia',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='evidencias/miniaturas/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='procesada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='error_procesamiento',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='evidencia',
+            index=models.Index(condition=models.Q(('error_procesamiento', ''), ('procesada', False)), fields=['id'], name='evidencia_pendiente_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0026_evidencias_procesadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaEvidencia',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('ANTES', 'Antes del trabajo'), ('DURANTE', 'Durante el trabajo'), ('DESPUES', 'Trabajo finalizado')], default='DESPUES', max_length=10)),
+                ('descripcion', models.CharField(blank=True, max_length=255, null=True)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('tamano_total', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('ABIERTA', 'Recibiendo partes'), ('COMPLETADA', 'Completada')], default='ABIERTA', max_length=20)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, db_index=True)),
+                ('actividad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ordenes.actividad')),
+                ('evidencia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='ordenes.evidencia')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ordenes.ordentrabajo')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0027_subidas_por_partes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoFoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('archivo', models.FileField(max_length=255, upload_to='evidencias/archivos/')),
+                ('miniatura', models.FileField(blank=True, max_length=255, upload_to='evidencias/archivos/')),
+                ('tamano', models.BigIntegerField(default=0)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('procesado', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='evidencia',
+            name='archivo',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='evidencias', to='ordenes.archivofoto'),
+        ),
+    ]
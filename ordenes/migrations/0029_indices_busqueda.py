@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# Índices de ordenes/busqueda.py. Solo Postgres: en SQLite la búsqueda usa icontains.
+# Las expresiones to_tsvector(...) tienen que ser idénticas a las de busqueda.documento().
+# pg_trgm es una extensión "trusted" (Postgres 13+): el dueño de la base puede crearla.
+INDICES = [
+    ('orden_busqueda_texto_idx', 'ordenes_ordentrabajo', "gin (to_tsvector('spanish', coalesce(descripcion, '') || ' ' || coalesce(descripcion_equipo, '') || ' ' || coalesce(ubicacion_tecnica, '')))"),
+    ('actividad_busqueda_texto_idx', 'ordenes_actividad', "gin (to_tsvector('spanish', coalesce(descripcion, '')))"),
+    # ILIKE '%...%' (icontains de Django y del buscador del admin) sobre UPPER(campo)
+    ('orden_numero_trgm_idx', 'ordenes_ordentrabajo', "gin (upper(numero_orden) gin_trgm_ops)"),
+    ('orden_trabajador_trgm_idx', 'ordenes_ordentrabajo', "gin (upper(codigo_trabajador) gin_trgm_ops)"),
+    ('orden_equipo_trgm_idx', 'ordenes_ordentrabajo', "gin (upper(equipo) gin_trgm_ops)"),
+    ('orden_ubicacion_trgm_idx', 'ordenes_ordentrabajo', "gin (upper(ubicacion) gin_trgm_ops)"),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, definicion in INDICES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING {definicion}')
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0028_archivos_por_contenido'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
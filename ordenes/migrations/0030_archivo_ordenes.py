@@ -0,0 +1,87 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:40
+
+import datetime
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0029_indices_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActividadArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('codigo_operacion', models.CharField(blank=True, max_length=10, null=True, verbose_name='Op.')),
+                ('descripcion', models.TextField(verbose_name='Txt. Breve Op.')),
+                ('puesto_trabajo', models.CharField(blank=True, max_length=20, null=True, verbose_name='Pto. Trabajo')),
+                ('finished', models.BooleanField(default=False)),
+                ('notas_operario', models.TextField(blank=True, null=True)),
+                ('fecha_inicio_real', models.DateTimeField(blank=True, null=True, verbose_name='Inicio Real')),
+                ('fecha_fin_real', models.DateTimeField(blank=True, null=True, verbose_name='Fin Real')),
+                ('tiempo_real_acumulado', models.DurationField(default=datetime.timedelta(0), verbose_name='Tiempo Activo')),
+                ('tiempo_pausas', models.DurationField(default=datetime.timedelta(0), verbose_name='Tiempo en Pausa')),
+                ('nombre_ejecutor', models.CharField(blank=True, max_length=100, null=True, verbose_name='Ejecutor')),
+                ('bitacora', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrdenArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('numero_orden', models.CharField(db_index=True, max_length=20, verbose_name='Número de Orden')),
+                ('descripcion', models.CharField(blank=True, max_length=255, null=True, verbose_name='Texto Breve')),
+                ('equipo', models.CharField(blank=True, max_length=50, null=True, verbose_name='Equipo')),
+                ('descripcion_equipo', models.CharField(blank=True, max_length=255, null=True, verbose_name='Desc. Equipo')),
+                ('ubicacion', models.CharField(blank=True, max_length=100, null=True, verbose_name='Ubicación Técnica')),
+                ('ubicacion_tecnica', models.CharField(blank=True, max_length=150, null=True, verbose_name='Desc. Ubicación')),
+                ('fecha_creacion', models.DateField(blank=True, null=True)),
+                ('inicio_programado', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('fin_programado', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('prioridad', models.CharField(choices=[('1', '1-Muy alto'), ('2', '2-Alto'), ('3', '3-Medio'), ('4', '4-Bajo')], default='4', max_length=2, verbose_name='Prioridad')),
+                ('codigo_trabajador', models.CharField(blank=True, max_length=20, null=True, verbose_name='Código Operario')),
+                ('tiempo_total', models.DurationField(blank=True, null=True)),
+                ('fecha_fin_real', models.DateTimeField(blank=True, null=True)),
+                ('tiempo_pausas_total', models.DurationField(blank=True, null=True)),
+                ('actividades_finalizadas', models.PositiveIntegerField(default=0)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, null=True)),
+                ('mes', models.DateField(verbose_name='Mes de Cierre')),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True, verbose_name='Archivada el')),
+                ('supervisor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Asignado por')),
+            ],
+            options={
+                'verbose_name': 'Orden Archivada',
+                'verbose_name_plural': '3.1 Historial Archivado',
+            },
+        ),
+        migrations.CreateModel(
+            name='EvidenciaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('foto', models.ImageField(upload_to='evidencias/%Y/%m/', verbose_name='Fotografía')),
+                ('miniatura', models.ImageField(blank=True, null=True, upload_to='evidencias/miniaturas/%Y/%m/')),
+                ('tipo', models.CharField(choices=[('ANTES', 'Antes del trabajo'), ('DURANTE', 'Durante el trabajo'), ('DESPUES', 'Trabajo finalizado')], default='DESPUES', max_length=10)),
+                ('descripcion', models.CharField(blank=True, max_length=255, null=True, verbose_name='Nota (Opcional)')),
+                ('fecha_subida', models.DateTimeField(blank=True, null=True)),
+                ('actividad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ordenes.actividadarchivada')),
+                ('archivo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='evidencias_archivadas', to='ordenes.archivofoto')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evidencias', to='ordenes.ordenarchivada')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='actividadarchivada',
+            name='orden',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actividades', to='ordenes.ordenarchivada'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenarchivada',
+            index=models.Index(fields=['mes', 'id'], name='orden_archivada_mes_idx'),
+        ),
+    ]
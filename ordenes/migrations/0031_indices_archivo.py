@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+# Buscador del Historial Archivado (icontains -> ILIKE '%...%' sobre UPPER(campo)), como en
+# 0029_indices_busqueda. Solo Postgres.
+INDICES = [
+    ('orden_archivada_numero_trgm_idx', 'ordenes_ordenarchivada', "gin (upper(numero_orden) gin_trgm_ops)"),
+    ('orden_archivada_trabajador_trgm_idx', 'ordenes_ordenarchivada', "gin (upper(codigo_trabajador) gin_trgm_ops)"),
+    ('orden_archivada_equipo_trgm_idx', 'ordenes_ordenarchivada', "gin (upper(equipo) gin_trgm_ops)"),
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, tabla, definicion in INDICES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING {definicion}')
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ordenes', '0030_archivo_ordenes'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -1,5 +1,8 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from datetime import timedelta
+import uuid
 from django.contrib.auth.models import User
 
 # 1. ORDEN DE TRABAJO (PADRE)
@@ -44,9 +47,38 @@ class OrdenTrabajo(models.Model):
     ]
     estado = models.CharField(max_length=20, choices=ESTADOS, default='BORRADOR', verbose_name="Estado Actual")
     
-    # KPIs
+    # KPIs (se recalculan al finalizar actividades; ver ordenes/kpis.py)
     tiempo_total = models.DurationField(null=True, blank=True)
     fecha_fin_real = models.DateTimeField(null=True, blank=True)
+    tiempo_pausas_total = models.DurationField(null=True, blank=True)
+    actividades_finalizadas = models.PositiveIntegerField(default=0)
+
+    # Sincronización incremental de la App (ver ordenes/sincronizacion.py)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Filtros de la App: /api/ordenes/?trabajador=...&estado=...
+            models.Index(fields=['codigo_trabajador', 'estado'], name='orden_trabajador_estado_idx'),
+            models.Index(fields=['inicio_programado'], name='orden_inicio_prog_idx'),
+            models.Index(fields=['fin_programado'], name='orden_fin_prog_idx'),
+            models.Index(fields=['fecha_fin_real'], name='orden_fin_real_idx'),
+            # Changelists del admin: WHERE estado=... ORDER BY -id / filtro por fin_programado
+            models.Index(fields=['estado', 'id'], name='orden_estado_id_idx'),
+            models.Index(fields=['estado', 'fin_programado'], name='orden_estado_fin_prog_idx'),
+            # login_operario usa codigo_trabajador__iexact -> UPPER(codigo_trabajador) en Postgres
+            models.Index(Upper('codigo_trabajador'), name='orden_trabajador_upper_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Operario y estado tal como vinieron de la base: registrar_reasignacion (signals.py)
+        # los compara al guardar sin volver a consultarlos
+        cargados = instancia.__dict__
+        if 'codigo_trabajador' in cargados and 'estado' in cargados:
+            instancia._estado_cargado = (cargados['codigo_trabajador'], cargados['estado'])
+        return instancia
 
     def __str__(self):
         return f"{self.numero_orden} ({self.estado})"
@@ -59,7 +91,6 @@ class Actividad(models.Model):
     puesto_trabajo = models.CharField(max_length=20, verbose_name="Pto. Trabajo", null=True, blank=True)
 
     finished = models.BooleanField(default=False)
-    tiempo_real_acumulado = models.DurationField(default=timedelta(0))
     en_progreso = models.BooleanField(default=False)
     ultima_pausa = models.DateTimeField(null=True, blank=True)
     notas_operario = models.TextField(blank=True, null=True)
@@ -67,10 +98,11 @@ class Actividad(models.Model):
     # --- CAMPOS DE TIEMPOS Y AUDITORÍA ---
     fecha_inicio_real = models.DateTimeField(null=True, blank=True, verbose_name="Inicio Real")
     fecha_fin_real = models.DateTimeField(null=True, blank=True, verbose_name="Fin Real")
-    tiempo_real_acumulado = models.CharField(max_length=20, null=True, blank=True, verbose_name="Tiempo Activo")
-    tiempo_pausas = models.CharField(max_length=20, null=True, blank=True, verbose_name="Tiempo en Pausa")
+    # interval en Postgres: se pueden sumar/promediar en la base de datos (la API los expone como "HH:MM:SS")
+    tiempo_real_acumulado = models.DurationField(default=timedelta(0), verbose_name="Tiempo Activo")
+    tiempo_pausas = models.DurationField(default=timedelta(0), verbose_name="Tiempo en Pausa")
     nombre_ejecutor = models.CharField(max_length=100, null=True, blank=True, verbose_name="Ejecutor")
-    finished = models.BooleanField(default=False)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.codigo_operacion} - {self.descripcion}"
@@ -81,6 +113,7 @@ class BitacoraActividad(models.Model):
     EVENTOS = [('INICIO', 'Iniciado'), ('PAUSA', 'Pausado'), ('REANUDAR', 'Reanudado'), ('FINAL', 'Finalizado')]
     evento = models.CharField(max_length=20, choices=EVENTOS)
     fecha_hora = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
 
 # 4. MODELOS PROXY (PARA EL MENÚ)
 class OrdenBorrador(OrdenTrabajo):
@@ -102,6 +135,21 @@ class OrdenHistorial(OrdenTrabajo):
         verbose_name_plural = "3. Historial Finalizado"
 
 # 5. EVIDENCIAS FOTOGRÁFICAS
+class ArchivoFoto(models.Model):
+    # Un archivo por contenido: las fotos repetidas (reintentos offline) comparten el mismo.
+    # sha256 es el del archivo tal como se subió; "referencias" cuenta las Evidencias (también
+    # las archivadas) que lo usan.
+    sha256 = models.CharField(max_length=64, unique=True)
+    archivo = models.FileField(upload_to='evidencias/archivos/', max_length=255)
+    miniatura = models.FileField(upload_to='evidencias/archivos/', max_length=255, blank=True)
+    tamano = models.BigIntegerField(default=0)
+    referencias = models.PositiveIntegerField(default=0)
+    procesado = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} ref.)"
+
 class Evidencia(models.Model):
     orden = models.ForeignKey(OrdenTrabajo, related_name='evidencias', on_delete=models.CASCADE)
     actividad = models.ForeignKey(Actividad, on_delete=models.CASCADE, null=True, blank=True)
@@ -116,6 +164,221 @@ class Evidencia(models.Model):
     tipo = models.CharField(max_length=10, choices=TIPOS, default='DESPUES')
     descripcion = models.CharField(max_length=255, blank=True, null=True, verbose_name="Nota (Opcional)")
     fecha_subida = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    # El worker (procesar_tareas) re-codifica la foto sin EXIF y genera la miniatura (ver ordenes/imagenes.py)
+    miniatura = models.ImageField(upload_to='evidencias/miniaturas/%Y/%m/', null=True, blank=True, editable=False)
+    procesada = models.BooleanField(default=False)
+    # Si el worker no pudo procesarla (archivo perdido o ilegible) queda el motivo y sale de la cola
+    error_procesamiento = models.CharField(max_length=255, blank=True, default='', editable=False)
+    # foto/miniatura apuntan a los archivos de este ArchivoFoto (ver ordenes/almacen.py)
+    archivo = models.ForeignKey(ArchivoFoto, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='evidencias')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(procesada=False, error_procesamiento=''), name='evidencia_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Orden {self.orden.numero_orden}"
+
+# 6. REGISTRO DE ELIMINACIONES (LÁPIDAS PARA LA SINCRONIZACIÓN)
+# Cuando algo se borra (o una orden deja de pertenecer a un operario) la App
+# necesita enterarse para quitarlo de su caché local.
+class Eliminacion(models.Model):
+    MODELOS = [
+        ('ORDEN', 'Orden de Trabajo'),
+        ('ACTIVIDAD', 'Actividad'),
+        ('BITACORA', 'Bitácora'),
+        ('EVIDENCIA', 'Evidencia'),
+    ]
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    # Operario que tenía la orden: la sincronización le manda a cada uno solo sus lápidas
+    codigo_trabajador = models.CharField(max_length=20, null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['codigo_trabajador', 'fecha'], name='lapida_trabajador_idx')]
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id}"
+
+# 7. CLAVES DE IDEMPOTENCIA (REINTENTOS DE LA BÓVEDA OFFLINE)
+# Guarda la respuesta de una escritura para contestar los reintentos sin ejecutarlos otra vez.
+# Solo se guarda el hash de la clave; las filas vencen (ver ordenes/idempotencia.py).
+class ClaveIdempotencia(models.Model):
+    clave = models.CharField(max_length=64, unique=True)
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=255)
+    # La clave vale solo para el mismo usuario y el mismo cuerpo (ver ordenes/idempotencia.py)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    huella = models.CharField(max_length=64, blank=True, default='')
+    estado_http = models.PositiveSmallIntegerField(null=True, blank=True)  # None = todavía en proceso
+    tipo_contenido = models.CharField(max_length=100, blank=True, default='')
+    respuesta = models.BinaryField(blank=True, default=b'')
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} ({self.estado_http or 'en proceso'})"
+
+# 8. TAREAS EN SEGUNDO PLANO (IMPORTACIONES / EXPORTACIONES GRANDES)
+# Cola en la propia base de datos; la procesa "python manage.py procesar_tareas"
+class TareaFondo(models.Model):
+    TIPOS = [
+        ('EXPORTAR_CIERRE', 'Exportar reporte de cierre (Excel)'),
+        ('IMPORTAR_SAP', 'Importar órdenes desde SAP'),
+    ]
+    ESTADOS = [
+        ('EN_COLA', 'En cola'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADA', 'Completada'),
+        ('FALLIDA', 'Fallida'),
+    ]
+    tipo = models.CharField(max_length=20, choices=TIPOS, verbose_name="Tipo de Tarea")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='EN_COLA', verbose_name="Estado")
+    parametros = models.JSONField(default=dict, blank=True)
+    archivo_entrada = models.FileField(upload_to='tareas/entrada/%Y/%m/', null=True, blank=True, verbose_name="Archivo a Importar")
+    archivo_resultado = models.FileField(upload_to='tareas/resultado/%Y/%m/', null=True, blank=True, verbose_name="Resultado")
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+    mensaje = models.TextField(blank=True, default='', verbose_name="Detalle")
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Solicitado por")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    latido = models.DateTimeField(null=True, blank=True)  # último aviso de vida del worker
+
+    class Meta:
+        verbose_name = "Tarea en Segundo Plano"
+        verbose_name_plural = "4. Tareas en Segundo Plano"
+        indexes = [models.Index(fields=['estado', 'id'], name='tarea_estado_idx')]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+# 9. RESUMEN DIARIO POR OPERARIO (KPI PRECALCULADO)
+class ResumenTrabajadorDia(models.Model):
+    codigo_trabajador = models.CharField(max_length=20, verbose_name="Código Operario")
+    fecha = models.DateField()
+    segundos_activos = models.BigIntegerField(default=0)
+    segundos_pausa = models.BigIntegerField(default=0)
+    actividades_finalizadas = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen Diario por Operario"
+        constraints = [
+            models.UniqueConstraint(fields=['codigo_trabajador', 'fecha'], name='resumen_trabajador_dia_unico'),
+        ]
+        indexes = [models.Index(fields=['fecha'], name='resumen_fecha_idx')]
+
+    def __str__(self):
+        return f"{self.codigo_trabajador} {self.fecha}"
+
+# 10. AVISOS EN TIEMPO REAL PARA LA APP (ver ordenes/avisos.py)
+class AvisoOrden(models.Model):
+    MOTIVOS = [
+        ('ASIGNADA', 'Asignada'),
+        ('MODIFICADA', 'Modificada'),
+        ('REASIGNADA', 'Reasignada a otro operario'),
+        ('ELIMINADA', 'Eliminada'),
+    ]
+    codigo_trabajador = models.CharField(max_length=20)
+    orden_id = models.BigIntegerField()  # sin FK: el aviso sobrevive a la orden borrada
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['codigo_trabajador', 'id'], name='aviso_trabajador_idx')]
+
+    def __str__(self):
+        return f"{self.codigo_trabajador}: orden #{self.orden_id} {self.motivo}"
+
+# 11. SUBIDAS DE FOTOS POR PARTES (REANUDABLES; ver ordenes/subidas.py)
+class SubidaEvidencia(models.Model):
+    ESTADOS = [
+        ('ABIERTA', 'Recibiendo partes'),
+        ('COMPLETADA', 'Completada'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    orden = models.ForeignKey(OrdenTrabajo, on_delete=models.CASCADE)
+    actividad = models.ForeignKey(Actividad, on_delete=models.CASCADE, null=True, blank=True)
+    tipo = models.CharField(max_length=10, choices=Evidencia.TIPOS, default='DESPUES')
+    descripcion = models.CharField(max_length=255, blank=True, null=True)
+    nombre_archivo = models.CharField(max_length=255)
+    tamano_total = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='ABIERTA')
+    evidencia = models.ForeignKey(Evidencia, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Subida {self.id} ({self.estado})"
+
+# 12. ARCHIVO DE ÓRDENES FINALIZADAS (ver ordenes/archivo.py)
+# Las órdenes FINALIZADAS viejas salen de las tablas que usa el trabajo diario y quedan
+# aquí, de solo lectura, con los mismos ids. La bitácora queda como JSON en su actividad.
+class OrdenArchivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # el de la OrdenTrabajo original
+    numero_orden = models.CharField(max_length=20, db_index=True, verbose_name="Número de Orden")
+    descripcion = models.CharField(max_length=255, verbose_name="Texto Breve", null=True, blank=True)
+    equipo = models.CharField(max_length=50, verbose_name="Equipo", null=True, blank=True)
+    descripcion_equipo = models.CharField(max_length=255, verbose_name="Desc. Equipo", null=True, blank=True)
+    ubicacion = models.CharField(max_length=100, verbose_name="Ubicación Técnica", null=True, blank=True)
+    ubicacion_tecnica = models.CharField(max_length=150, verbose_name="Desc. Ubicación", null=True, blank=True)
+    fecha_creacion = models.DateField(null=True, blank=True)
+    inicio_programado = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    fin_programado = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    prioridad = models.CharField(max_length=2, choices=OrdenTrabajo.PRIORIDAD_CHOICES, default='4', verbose_name="Prioridad")
+    codigo_trabajador = models.CharField(max_length=20, null=True, blank=True, verbose_name="Código Operario")
+    supervisor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Asignado por")
+    tiempo_total = models.DurationField(null=True, blank=True)
+    fecha_fin_real = models.DateTimeField(null=True, blank=True)
+    tiempo_pausas_total = models.DurationField(null=True, blank=True)
+    actividades_finalizadas = models.PositiveIntegerField(default=0)
+    fecha_modificacion = models.DateTimeField(null=True, blank=True)  # la última de la orden viva
+
+    mes = models.DateField(verbose_name="Mes de Cierre")  # primer día del mes en que terminó
+    fecha_archivo = models.DateTimeField(auto_now_add=True, verbose_name="Archivada el")
+
+    class Meta:
+        verbose_name = "Orden Archivada"
+        verbose_name_plural = "3.1 Historial Archivado"
+        indexes = [models.Index(fields=['mes', 'id'], name='orden_archivada_mes_idx')]
+
+    def __str__(self):
+        return f"{self.numero_orden} (ARCHIVADA)"
+
+class ActividadArchivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    orden = models.ForeignKey(OrdenArchivada, related_name='actividades', on_delete=models.CASCADE)
+    codigo_operacion = models.CharField(max_length=10, verbose_name="Op.", null=True, blank=True)
+    descripcion = models.TextField(verbose_name="Txt. Breve Op.")
+    puesto_trabajo = models.CharField(max_length=20, verbose_name="Pto. Trabajo", null=True, blank=True)
+    finished = models.BooleanField(default=False)
+    notas_operario = models.TextField(blank=True, null=True)
+    fecha_inicio_real = models.DateTimeField(null=True, blank=True, verbose_name="Inicio Real")
+    fecha_fin_real = models.DateTimeField(null=True, blank=True, verbose_name="Fin Real")
+    tiempo_real_acumulado = models.DurationField(default=timedelta(0), verbose_name="Tiempo Activo")
+    tiempo_pausas = models.DurationField(default=timedelta(0), verbose_name="Tiempo en Pausa")
+    nombre_ejecutor = models.CharField(max_length=100, null=True, blank=True, verbose_name="Ejecutor")
+    # [{"evento": "INICIO", "fecha_hora": "..."}, ...] en orden
+    bitacora = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+
+    def __str__(self):
+        return f"{self.codigo_operacion} - {self.descripcion}"
+
+class EvidenciaArchivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    orden = models.ForeignKey(OrdenArchivada, related_name='evidencias', on_delete=models.CASCADE)
+    actividad = models.ForeignKey(ActividadArchivada, on_delete=models.CASCADE, null=True, blank=True)
+    foto = models.ImageField(upload_to='evidencias/%Y/%m/', verbose_name="Fotografía")
+    miniatura = models.ImageField(upload_to='evidencias/miniaturas/%Y/%m/', null=True, blank=True)
+    tipo = models.CharField(max_length=10, choices=Evidencia.TIPOS, default='DESPUES')
+    descripcion = models.CharField(max_length=255, blank=True, null=True, verbose_name="Nota (Opcional)")
+    fecha_subida = models.DateTimeField(null=True, blank=True)
+    # También cuenta como referencia del ArchivoFoto (ver liberar_archivo en ordenes/almacen.py)
+    archivo = models.ForeignKey(ArchivoFoto, on_delete=models.PROTECT, null=True, blank=True, related_name='evidencias_archivadas')
 
     def __str__(self):
-        return f"{self.get_tipo_display()} - Orden {self.orden.numero_orden}"
\ No newline at end of file
+        return f"{self.get_tipo_display()} - Orden archivada #{self.orden_id}"
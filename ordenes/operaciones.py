@@ -0,0 +1,57 @@
+from django.db import transaction
+from .tiempos import duracion_desde_texto
+from .kpis import contribucion_diaria, actualizar_por_finalizacion, recalcular_orden
+
+# ==========================================
+# OPERACIONES DE NEGOCIO COMPARTIDAS
+# Las usan los ViewSets y el endpoint de lotes (/api/lote/)
+# ==========================================
+
+def _duracion(texto):
+    duracion = duracion_desde_texto(texto)
+    if duracion is None:
+        raise ValueError(f"Tiempo inválido: {texto}")
+    return duracion
+
+
+def finalizar_orden(orden):
+    orden.estado = 'FINALIZADA'
+    orden.save()
+    # Completa los KPIs; si ninguna actividad trae fecha de fin, la orden cierra "ahora"
+    kpis = recalcular_orden(orden.pk)
+    if kpis['fecha_fin_real'] is None:
+        type(orden).objects.filter(pk=orden.pk).update(fecha_fin_real=orden.fecha_modificacion)
+    return {'status': 'orden finalizada', 'estado': 'FINALIZADA'}
+
+
+def finalizar_actividad(actividad, data):
+    # Lo que la actividad aportaba antes (por si se finaliza de nuevo desde la bóveda offline)
+    codigo_anterior = actividad.orden.codigo_trabajador
+    antes = contribucion_diaria(actividad, codigo_anterior)
+
+    fecha_inicio = data.get('fecha_inicio_real')
+    fecha_fin = data.get('fecha_fin_real')
+    if fecha_inicio: actividad.fecha_inicio_real = fecha_inicio
+    if fecha_fin: actividad.fecha_fin_real = fecha_fin
+
+    tiempo_total = data.get('tiempo_total') or data.get('tiempo_real_acumulado')
+    if tiempo_total:
+        actividad.tiempo_real_acumulado = _duracion(tiempo_total)
+
+    tiempo_pausas = data.get('tiempo_pausas')
+    if tiempo_pausas:
+        actividad.tiempo_pausas = _duracion(tiempo_pausas)
+
+    ejecutor = data.get('nombre_ejecutor')
+    if ejecutor: actividad.nombre_ejecutor = ejecutor
+
+    notas = data.get('notas_operario')
+    if notas: actividad.notas_operario = notas
+
+    actividad.finished = True
+    actividad.en_progreso = False
+
+    with transaction.atomic():
+        actividad.save()
+        actualizar_por_finalizacion(actividad, antes)
+    return {"mensaje": "¡Operación finalizada y tiempos registrados correctamente!"}
@@ -0,0 +1,59 @@
+import json
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+# ==========================================
+# PAGINACIÓN POR CURSOR (KEYSET) OPCIONAL
+# Ordena por -id y pide "WHERE id < ultimo_id LIMIT n", así que cuesta lo mismo
+# en la primera página que en lo más profundo del historial.
+# Solo se activa si el cliente la pide (?paginar=1, ?page_size= o ?cursor=);
+# sin esos parámetros la respuesta sigue siendo la lista completa de siempre.
+# ==========================================
+class PaginacionCursorOpcional(CursorPagination):
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    parametros_activacion = ('paginar', 'page_size', 'cursor')
+
+    def paginacion_solicitada(self, request):
+        return any(request.query_params.get(p) for p in self.parametros_activacion)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.paginacion_solicitada(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+# ==========================================
+# CONTEO ESTIMADO PARA LOS CHANGELISTS DEL ADMIN
+# Con cientos de miles de órdenes, el COUNT(*) exacto de cada página del admin
+# recorre todo el historial. En Postgres se pide al planificador (EXPLAIN) cuántas
+# filas espera; si son más de UMBRAL_CONTEO_EXACTO se usa esa estimación (el total
+# que muestra la página es aproximado), si son menos se cuenta exacto. En SQLite, exacto.
+# ==========================================
+UMBRAL_CONTEO_EXACTO = 10000
+
+
+def conteo_estimado(queryset):
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with conexion.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    @cached_property
+    def count(self):
+        estimado = conteo_estimado(self.object_list)
+        if estimado is None or estimado < UMBRAL_CONTEO_EXACTO:
+            return super().count
+        return estimado
@@ -1,6 +1,24 @@
 from rest_framework import serializers
+from django.db import transaction
 from django.contrib.auth.models import User
-from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia # <-- Importamos Evidencia
+from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia, SubidaEvidencia # <-- Importamos Evidencia
+from .tiempos import a_segundos, a_hhmmss, duracion_desde_texto
+from .imagenes import validar_imagen, ImagenInvalida, TAMANO_MAXIMO_SUBIDA
+from .almacen import guardar_foto, liberar_archivo
+from .medios import url_firmada, usuario_puede_ver
+
+# 0. Tiempos como "HH:MM:SS" (la App parte el texto por ':'; las horas pueden pasar de 24)
+class DuracionHHMMSS(serializers.Field):
+    default_error_messages = {'invalid': 'Formato de tiempo inválido, se espera HH:MM:SS.'}
+
+    def to_representation(self, value):
+        return a_hhmmss(a_segundos(value))
+
+    def to_internal_value(self, data):
+        duracion = duracion_desde_texto(data)
+        if duracion is None:
+            self.fail('invalid')
+        return duracion
 
 # 1. Serializer para Usuarios
 class UserSerializer(serializers.ModelSerializer):
@@ -19,10 +37,52 @@ class EvidenciaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Evidencia
         fields = '__all__'
-        read_only_fields = ['fecha_subida']
+        read_only_fields = ['fecha_subida', 'miniatura', 'procesada']
+
+    def to_representation(self, instance):
+        # La URL lleva firma con vencimiento (la App la abre sin headers; ver ordenes/medios.py),
+        # pero solo si quien pide puede ver la foto. Sin firma, /media/ pide sesión o token.
+        datos = super().to_representation(instance)
+        request = self.context.get('request')
+        if usuario_puede_ver(getattr(request, 'user', None), instance.orden.codigo_trabajador):
+            for campo in ('foto', 'miniatura'):
+                archivo = getattr(instance, campo)
+                if datos.get(campo):
+                    datos[campo] = url_firmada(datos[campo], archivo.name)
+        return datos
+
+    def validate_foto(self, foto):
+        try:
+            validar_imagen(foto)
+        except ImagenInvalida as e:
+            raise serializers.ValidationError(str(e))
+        return foto
+
+    # La foto se guarda por contenido: si ya existe, no se escribe otra copia en disco
+    def create(self, validated_data):
+        foto = validated_data.pop('foto')
+        with transaction.atomic():
+            evidencia = Evidencia(**validated_data)
+            guardar_foto(evidencia, foto)
+            evidencia.save()
+        return evidencia
+
+    def update(self, instance, validated_data):
+        foto = validated_data.pop('foto', None)
+        if foto is None:
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            anterior = instance.archivo_id
+            guardar_foto(instance, foto)
+            instance = super().update(instance, validated_data)
+            if anterior != instance.archivo_id:
+                liberar_archivo(anterior)
+        return instance
 
 # 4. Serializer para Actividades
 class ActividadSerializer(serializers.ModelSerializer):
+    tiempo_real_acumulado = DuracionHHMMSS(required=False)
+    tiempo_pausas = DuracionHHMMSS(required=False)
     bitacora = BitacoraSerializer(many=True, read_only=True)
     evidencias = EvidenciaSerializer(many=True, read_only=True, source='evidencia_set')
 
@@ -40,4 +100,31 @@ class OrdenTrabajoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrdenTrabajo
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# 6. Serializer compacto para listados (sin actividades, bitácora ni evidencias)
+class OrdenTrabajoResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrdenTrabajo
+        fields = '__all__'
+
+# 7. Serializer plano de Actividad (la sincronización manda bitácora y evidencias aparte)
+class ActividadResumenSerializer(serializers.ModelSerializer):
+    tiempo_real_acumulado = DuracionHHMMSS(required=False)
+    tiempo_pausas = DuracionHHMMSS(required=False)
+
+    class Meta:
+        model = Actividad
+        fields = '__all__'
+
+# 8. Apertura de una subida de foto por partes (ver ordenes/subidas.py)
+class SubidaEvidenciaSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+    tamano_total = serializers.IntegerField(min_value=1, max_value=TAMANO_MAXIMO_SUBIDA)
+
+    class Meta:
+        model = SubidaEvidencia
+        fields = ['orden', 'actividad', 'tipo', 'descripcion', 'nombre_archivo', 'tamano_total', 'sha256']
+
+    def validate_sha256(self, valor):
+        return valor.lower()
@@ -0,0 +1,108 @@
+from django.db.models import Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia, EvidenciaArchivada, Eliminacion, AvisoOrden
+from .avisos import avisos_por_cambio, es_visible
+from .almacen import liberar_archivo
+from .autenticacion import invalidar_token
+
+# ==========================================
+# LÁPIDAS PARA LA SINCRONIZACIÓN DE LA APP
+# ==========================================
+MODELO_LAPIDA = {
+    OrdenTrabajo: 'ORDEN',
+    Actividad: 'ACTIVIDAD',
+    BitacoraActividad: 'BITACORA',
+    Evidencia: 'EVIDENCIA',
+}
+
+
+def operario_de(sender, instance):
+    # Para los hijos se resuelve dentro del mismo INSERT: al borrar una orden en cascada
+    # los hijos se borran antes que ella, así que la orden todavía está
+    if sender is OrdenTrabajo:
+        return instance.codigo_trabajador
+    if sender is BitacoraActividad:
+        return Subquery(Actividad.objects.filter(pk=instance.actividad_id).values('orden__codigo_trabajador')[:1])
+    return Subquery(OrdenTrabajo.objects.filter(pk=instance.orden_id).values('codigo_trabajador')[:1])
+
+
+def registrar_lapida(sender, instance, **kwargs):
+    Eliminacion.objects.create(
+        modelo=MODELO_LAPIDA[sender], objeto_id=instance.pk, codigo_trabajador=operario_de(sender, instance),
+    )
+
+
+for _modelo in MODELO_LAPIDA:
+    post_delete.connect(registrar_lapida, sender=_modelo, dispatch_uid=f'lapida_{_modelo.__name__}')
+
+
+@receiver(pre_save, sender=OrdenTrabajo, dispatch_uid='lapida_reasignacion_orden')
+def registrar_reasignacion(sender, instance, update_fields=None, **kwargs):
+    # Si la orden cambia de operario, el anterior debe sacarla de su caché.
+    # El nuevo la recibe igual porque la orden aparece como modificada.
+    # Se compara con lo que se leyó de la base (OrdenTrabajo.from_db); solo se consulta
+    # si la instancia no vino de la base o se cargó sin esos campos.
+    instance._estado_anterior = None
+    if not instance.pk:
+        return
+    cargado = getattr(instance, '_estado_cargado', None)
+    if cargado is not None and update_fields is not None and not {'codigo_trabajador', 'estado'} & set(update_fields):
+        instance._estado_anterior = cargado
+        return
+    if cargado is None:
+        cargado = OrdenTrabajo.objects.filter(pk=instance.pk).values_list('codigo_trabajador', 'estado').first()
+    instance._estado_anterior = cargado
+    anterior = cargado[0] if cargado else None
+    if anterior and anterior != instance.codigo_trabajador:
+        Eliminacion.objects.create(modelo='ORDEN', objeto_id=instance.pk, codigo_trabajador=anterior)
+
+
+# ==========================================
+# AVISOS EN TIEMPO REAL (ver ordenes/avisos.py)
+# ==========================================
+@receiver(post_save, sender=OrdenTrabajo, dispatch_uid='aviso_cambio_orden')
+def avisar_cambio(sender, instance, created, **kwargs):
+    antes = None if created else getattr(instance, '_estado_anterior', None)
+    avisos = avisos_por_cambio(instance.pk, antes, (instance.codigo_trabajador, instance.estado))
+    if avisos:
+        AvisoOrden.objects.bulk_create(avisos)
+    # Lo guardado pasa a ser lo "cargado" para el próximo save() de la misma instancia
+    instance._estado_cargado = (instance.codigo_trabajador, instance.estado)
+
+
+@receiver(post_delete, sender=OrdenTrabajo, dispatch_uid='aviso_orden_eliminada')
+def avisar_eliminacion(sender, instance, **kwargs):
+    if es_visible(instance.codigo_trabajador, instance.estado):
+        AvisoOrden.objects.create(codigo_trabajador=instance.codigo_trabajador, orden_id=instance.pk, motivo='ELIMINADA')
+
+
+# ==========================================
+# ARCHIVOS DE FOTOS COMPARTIDOS (ver ordenes/almacen.py)
+# ==========================================
+@receiver(post_delete, sender=Evidencia, dispatch_uid='liberar_archivo_evidencia')
+def liberar_archivo_evidencia(sender, instance, **kwargs):
+    liberar_archivo(instance.archivo_id)
+
+
+@receiver(post_delete, sender=EvidenciaArchivada, dispatch_uid='liberar_archivo_evidencia_archivada')
+def liberar_archivo_evidencia_archivada(sender, instance, **kwargs):
+    liberar_archivo(instance.archivo_id)
+
+
+# ==========================================
+# CACHÉ DE TOKENS (ver ordenes/autenticacion.py)
+# ==========================================
+@receiver(post_delete, sender=Token, dispatch_uid='invalidar_token_borrado')
+def invalidar_token_borrado(sender, instance, **kwargs):
+    invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=User, dispatch_uid='invalidar_token_usuario')
+def invalidar_token_usuario(sender, instance, created, **kwargs):
+    # Cambio de contraseña, desactivación, permisos: el usuario cacheado queda viejo
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            invalidar_token(key)
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia, Eliminacion
+
+# ==========================================
+# SINCRONIZACIÓN INCREMENTAL (DELTAS) PARA LA APP
+# El cursor es una marca de tiempo del servidor. Se devuelve un poco "atrasado"
+# (MARGEN_CURSOR) para no perder filas de transacciones que confirmaron tarde;
+# la App hace upsert por id, así que recibir una fila dos veces no hace daño.
+# - Cada operario recibe solo sus lápidas (Eliminacion.codigo_trabajador); las viejas
+#   se purgan pasados RETENCION_LAPIDAS y un cursor más viejo que eso pide sync completa.
+# - La sync completa puede ir por páginas de órdenes (pagina_completa).
+# ==========================================
+MARGEN_CURSOR = timedelta(seconds=10)
+RETENCION_LAPIDAS = timedelta(days=getattr(settings, 'LAPIDAS_DIAS', 60))
+ORDENES_POR_PAGINA = 200
+
+# Los borradores todavía no existen para el operario
+ESTADOS_VISIBLES_APP = ['PENDIENTE', 'FINALIZADA']
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def leer_cursor(valor):
+    if not valor:
+        return None
+    try:
+        cursor = parse_datetime(valor)
+    except ValueError:
+        cursor = None
+    if cursor is None:
+        raise CursorInvalido(valor)
+    if timezone.is_naive(cursor):
+        cursor = timezone.make_aware(cursor)
+    if cursor < timezone.now() - RETENCION_LAPIDAS:
+        # Las lápidas de entonces ya se purgaron: un delta no alcanza
+        raise CursorInvalido(valor)
+    return cursor
+
+
+def leer_continuacion(valor):
+    # "<cursor de la primera página>|<último id de orden enviado>"
+    if not valor:
+        return None
+    marca, _, ultimo_id = valor.rpartition('|')
+    try:
+        cursor, ultimo_id = leer_cursor(marca), int(ultimo_id)
+    except ValueError:
+        raise CursorInvalido(valor)
+    if cursor is None:
+        raise CursorInvalido(valor)
+    return cursor, ultimo_id
+
+
+def purgar_lapidas():
+    return Eliminacion.objects.filter(fecha__lt=timezone.now() - RETENCION_LAPIDAS).delete()[0]
+
+
+def ordenes_visibles(codigo_trabajador):
+    return OrdenTrabajo.objects.filter(codigo_trabajador=codigo_trabajador, estado__in=ESTADOS_VISIBLES_APP).order_by('id')
+
+
+def _arbol(ordenes):
+    ids = ordenes.values('id')
+    return {
+        'ordenes': ordenes,
+        'actividades': Actividad.objects.filter(orden__in=ids).order_by('id'),
+        'bitacora': BitacoraActividad.objects.filter(actividad__orden__in=ids).order_by('id'),
+        'evidencias': Evidencia.objects.filter(orden__in=ids).select_related('orden').order_by('id'),
+        'eliminados': Eliminacion.objects.none(),
+    }
+
+
+def cambios_desde(codigo_trabajador, cursor=None):
+    inicio = timezone.now()
+    cambios = _arbol(ordenes_visibles(codigo_trabajador))
+
+    if cursor is not None:
+        # Una orden que cambió (ej: recién aprobada o reasignada) viaja con todos sus hijos,
+        # porque el operario puede no haberlos recibido nunca.
+        ordenes = cambios['ordenes'].filter(fecha_modificacion__gte=cursor)
+        ordenes_cambiadas = ordenes.values('id')
+        cambios = {
+            'ordenes': ordenes,
+            'actividades': cambios['actividades'].filter(Q(fecha_modificacion__gte=cursor) | Q(orden__in=ordenes_cambiadas)),
+            'bitacora': cambios['bitacora'].filter(Q(fecha_modificacion__gte=cursor) | Q(actividad__orden__in=ordenes_cambiadas)),
+            'evidencias': cambios['evidencias'].filter(Q(fecha_modificacion__gte=cursor) | Q(orden__in=ordenes_cambiadas)),
+            # Sin operario: lápidas anteriores a que se guardara (las purga purgar_lapidas)
+            'eliminados': Eliminacion.objects.filter(fecha__gte=cursor).filter(
+                Q(codigo_trabajador=codigo_trabajador) | Q(codigo_trabajador__isnull=True)
+            ).order_by('id'),
+        }
+
+    cambios['cursor'] = inicio - MARGEN_CURSOR
+    return cambios
+
+
+def pagina_completa(codigo_trabajador, continuacion=None, limite=None):
+    # Sync completa de a `limite` órdenes (por id), cada una con todos sus hijos.
+    # Todas las páginas devuelven el cursor tomado al empezar la primera: lo que cambie
+    # mientras la App pide las siguientes le llega en el primer delta.
+    limite = limite or ORDENES_POR_PAGINA
+    if continuacion is None:
+        cursor, ultimo_id = timezone.now() - MARGEN_CURSOR, 0
+    else:
+        cursor, ultimo_id = continuacion
+    ids = list(ordenes_visibles(codigo_trabajador).filter(pk__gt=ultimo_id).values_list('id', flat=True)[:limite + 1])
+    hay_mas = len(ids) > limite
+    ids = ids[:limite]
+
+    cambios = _arbol(ordenes_visibles(codigo_trabajador).filter(pk__in=ids))
+    cambios['cursor'] = cursor
+    cambios['continuar'] = f"{cursor.isoformat()}|{ids[-1]}" if hay_mas else None
+    return cambios
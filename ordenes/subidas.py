@@ -0,0 +1,175 @@
+import glob
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import Evidencia, SubidaEvidencia
+from .imagenes import validar_imagen, ImagenInvalida
+from .almacen import guardar_foto
+
+# ==========================================
+# SUBIDA DE FOTOS POR PARTES (REANUDABLE)
+# 1. POST /api/evidencias/subidas/            -> abre la sesión (tamaño total + sha256)
+# 2. PUT  /api/evidencias/subidas/<id>/       -> una parte, con "Content-Range: bytes ini-fin/total"
+#    GET  /api/evidencias/subidas/<id>/       -> cuántos bytes llegaron (para reanudar)
+# 3. POST /api/evidencias/subidas/<id>/finalizar/ -> verifica sha256 y crea la Evidencia
+# Cada parte se copia del socket a un archivo temporal en bloques de BLOQUE bytes (el
+# worker de gunicorn nunca tiene la foto entera en memoria) y recién después, con la fila
+# bloqueada, se agrega al archivo parcial. El avance real es el tamaño del archivo
+# parcial, así que una parte cortada a la mitad también cuenta.
+# ==========================================
+DIRECTORIO_PARCIALES = getattr(settings, 'SUBIDAS_TEMPORALES', os.path.join(settings.MEDIA_ROOT, 'subidas_tmp'))
+TAMANO_MAXIMO_PARTE = 4 * 1024 * 1024
+BLOQUE = 64 * 1024
+VIGENCIA_SUBIDA = timedelta(days=2)
+PATRON_RANGO = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ErrorSubida(Exception):
+    def __init__(self, mensaje, status=400, recibidos=None):
+        super().__init__(mensaje)
+        self.status = status
+        self.recibidos = recibidos
+
+
+def ruta_parcial(subida):
+    return os.path.join(DIRECTORIO_PARCIALES, f"{subida.pk}.part")
+
+
+def bytes_recibidos(subida):
+    if subida.estado == 'COMPLETADA':
+        return subida.tamano_total
+    try:
+        return os.path.getsize(ruta_parcial(subida))
+    except FileNotFoundError:
+        return 0
+
+
+def estado_subida(subida):
+    return {
+        'id': str(subida.pk),
+        'estado': subida.estado,
+        'recibidos': bytes_recibidos(subida),
+        'tamano_total': subida.tamano_total,
+        'parte_maxima': TAMANO_MAXIMO_PARTE,
+        'evidencia': subida.evidencia_id,
+    }
+
+
+def recibir_parte(subida_id, rango, largo, flujo):
+    match = PATRON_RANGO.match((rango or '').strip())
+    if not match:
+        raise ErrorSubida("Falta el header Content-Range: bytes <inicio>-<fin>/<total>")
+    inicio, fin, total = map(int, match.groups())
+    cantidad = fin - inicio + 1
+
+    subida = SubidaEvidencia.objects.get(pk=subida_id)
+    if subida.estado == 'COMPLETADA':
+        return estado_subida(subida)
+    if total != subida.tamano_total or fin >= total or cantidad <= 0:
+        raise ErrorSubida("Content-Range no coincide con el tamaño de la subida")
+    if cantidad > TAMANO_MAXIMO_PARTE:
+        raise ErrorSubida(f"Cada parte puede tener como máximo {TAMANO_MAXIMO_PARTE} bytes")
+    if largo is not None and largo != cantidad:
+        raise ErrorSubida("Content-Length no coincide con Content-Range")
+    recibidos = bytes_recibidos(subida)
+    if inicio > recibidos:
+        # Se saltó una parte: la App debe seguir desde "recibidos"
+        raise ErrorSubida("Parte fuera de orden", status=409, recibidos=recibidos)
+
+    # La parte se lee del socket (puede tardar: la manda un celular) a un archivo propio,
+    # sin bloquear la fila; el bloqueo es solo para agregarla al archivo parcial
+    os.makedirs(DIRECTORIO_PARCIALES, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=DIRECTORIO_PARCIALES, prefix=f"{subida.pk}.", suffix='.parte') as parte:
+        pendientes = cantidad
+        while pendientes > 0:
+            bloque = flujo.read(min(BLOQUE, pendientes))
+            if not bloque:
+                break
+            parte.write(bloque)
+            pendientes -= len(bloque)
+        llegaron = cantidad - pendientes
+
+        with transaction.atomic():
+            # El bloqueo de la fila serializa dos PUT de la misma subida (reintentos en paralelo)
+            subida = SubidaEvidencia.objects.select_for_update().get(pk=subida_id)
+            if subida.estado == 'COMPLETADA':
+                return estado_subida(subida)
+            recibidos = bytes_recibidos(subida)
+            if inicio > recibidos:
+                raise ErrorSubida("Parte fuera de orden", status=409, recibidos=recibidos)
+            # Solo lo que todavía no estaba (un reintento puede repetir bytes ya recibidos)
+            if inicio + llegaron > recibidos:
+                parte.seek(recibidos - inicio)
+                with open(ruta_parcial(subida), 'ab') as parcial:
+                    shutil.copyfileobj(parte, parcial, BLOQUE)
+            subida.save(update_fields=['fecha_modificacion'])
+            return estado_subida(subida)
+
+
+def _sha256_archivo(ruta):
+    resumen = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(BLOQUE * 16), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def finalizar_subida(subida_id):
+    with transaction.atomic():
+        subida = SubidaEvidencia.objects.select_for_update().get(pk=subida_id)
+        if subida.estado == 'COMPLETADA':
+            # Reintento del paso final (timeout en la respuesta): misma evidencia
+            return subida
+
+        recibidos = bytes_recibidos(subida)
+        if recibidos != subida.tamano_total:
+            raise ErrorSubida("Todavía faltan partes", status=409, recibidos=recibidos)
+
+        ruta = ruta_parcial(subida)
+        if _sha256_archivo(ruta) != subida.sha256:
+            # Algo llegó corrupto: se descarta y la App vuelve a subir desde cero
+            os.remove(ruta)
+            raise ErrorSubida("El sha256 no coincide; la subida se reinició", status=422, recibidos=0)
+
+        with open(ruta, 'rb') as parcial:
+            archivo = File(parcial, name=subida.nombre_archivo)
+            try:
+                validar_imagen(archivo)
+            except ImagenInvalida as e:
+                raise ErrorSubida(str(e))
+            evidencia = Evidencia(orden=subida.orden, actividad=subida.actividad, tipo=subida.tipo, descripcion=subida.descripcion)
+            # Por contenido (si ya existe no se copia); el storage copia el archivo por bloques
+            guardar_foto(evidencia, archivo, subida.nombre_archivo)
+            evidencia.save()
+
+        subida.estado = 'COMPLETADA'
+        subida.evidencia = evidencia
+        subida.save(update_fields=['estado', 'evidencia', 'fecha_modificacion'])
+    os.remove(ruta)
+    return subida
+
+
+def cancelar_subida(subida):
+    # También las partes que quedaron a medio leer si el worker murió
+    for ruta in [ruta_parcial(subida)] + glob.glob(os.path.join(DIRECTORIO_PARCIALES, f"{subida.pk}.*.parte")):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    subida.delete()
+
+
+def purgar_subidas_vencidas():
+    vencidas = SubidaEvidencia.objects.filter(fecha_modificacion__lt=timezone.now() - VIGENCIA_SUBIDA)
+    total = 0
+    for subida in vencidas.iterator():
+        cancelar_subida(subida)
+        total += 1
+    return total
@@ -0,0 +1,173 @@
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+from .models import OrdenTrabajo, OrdenArchivada, TareaFondo
+from .exportacion import actividades_reporte, anchos_columnas, escribir_reporte, filas_reporte
+from .importacion import leer_dataset, importar_sap_rapido, texto_archivadas, FormatoNoSoportado
+
+# ==========================================
+# COLA DE TAREAS EN LA BASE DE DATOS (SIN BROKER EXTERNO)
+# El admin encola; "python manage.py procesar_tareas" las ejecuta fuera de gunicorn.
+# Para tomar una tarea se hace un UPDATE condicionado al estado: si dos workers
+# compiten por la misma, solo uno afecta la fila (funciona igual en Postgres y SQLite).
+# ==========================================
+# Si un worker muere a mitad de tarea, pasado este tiempo sin latido vuelve a la cola
+TAREA_ABANDONADA = timedelta(minutes=10)
+# Mientras corre una tarea, un hilo del worker renueva el latido cada tantos segundos
+INTERVALO_LATIDO = 60
+CADA_CUANTAS_FILAS_AVISAR = 500
+
+class TareaFallida(Exception):
+    # Falla "esperada" (ej: errores en el Excel): se guarda el mensaje sin traceback
+    pass
+
+
+def encolar(tipo, usuario=None, parametros=None, archivo_entrada=None):
+    tarea = TareaFondo(tipo=tipo, usuario=usuario, parametros=parametros or {})
+    if archivo_entrada is not None:
+        tarea.archivo_entrada = archivo_entrada
+    tarea.save()
+    return tarea
+
+
+def reportar_progreso(tarea, progreso, mensaje=None):
+    campos = {'progreso': min(max(int(progreso), 0), 100), 'latido': timezone.now()}
+    if mensaje is not None:
+        campos['mensaje'] = mensaje
+    TareaFondo.objects.filter(pk=tarea.pk).update(**campos)
+    for campo, valor in campos.items():
+        setattr(tarea, campo, valor)
+
+
+@contextmanager
+def latiendo(tarea):
+    # El latido va en un hilo aparte, con su propia conexión: la importación corre dentro
+    # de una transacción y un UPDATE hecho ahí no lo ve liberar_abandonadas() hasta el final.
+    # Si el worker muere, muere el hilo y la tarea vuelve a la cola pasado TAREA_ABANDONADA.
+    detener = threading.Event()
+
+    def latir():
+        try:
+            while not detener.wait(INTERVALO_LATIDO):
+                TareaFondo.objects.filter(pk=tarea.pk, estado='EN_PROCESO').update(latido=timezone.now())
+        finally:
+            connection.close()
+
+    hilo = threading.Thread(target=latir, name=f'latido-tarea-{tarea.pk}', daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def liberar_abandonadas():
+    limite = timezone.now() - TAREA_ABANDONADA
+    return TareaFondo.objects.filter(estado='EN_PROCESO', latido__lt=limite).update(estado='EN_COLA', progreso=0)
+
+
+def tomar_siguiente():
+    for tarea_id in TareaFondo.objects.filter(estado='EN_COLA').order_by('id').values_list('id', flat=True)[:10]:
+        ahora = timezone.now()
+        tomada = TareaFondo.objects.filter(pk=tarea_id, estado='EN_COLA').update(
+            estado='EN_PROCESO', fecha_inicio=ahora, latido=ahora, progreso=0
+        )
+        if tomada:
+            return TareaFondo.objects.get(pk=tarea_id)
+    return None
+
+
+def ejecutar(tarea):
+    manejador = MANEJADORES[tarea.tipo]
+    try:
+        with latiendo(tarea):
+            mensaje = manejador(tarea)
+    except TareaFallida as e:
+        tarea.estado = 'FALLIDA'
+        tarea.mensaje = str(e)
+    except Exception:
+        tarea.estado = 'FALLIDA'
+        tarea.mensaje = traceback.format_exc()[-4000:]
+    else:
+        tarea.estado = 'COMPLETADA'
+        tarea.progreso = 100
+        tarea.mensaje = mensaje or ''
+    tarea.fecha_fin = timezone.now()
+    tarea.save(update_fields=['estado', 'progreso', 'mensaje', 'fecha_fin', 'archivo_resultado'])
+    return tarea
+
+
+# ------------------------------
+# MANEJADORES POR TIPO DE TAREA
+# ------------------------------
+def exportar_cierre(tarea):
+    ids = tarea.parametros.get('ordenes', [])
+    if tarea.parametros.get('archivadas'):
+        ordenes = OrdenArchivada.objects.filter(pk__in=ids)
+    else:
+        ordenes = OrdenTrabajo.objects.filter(pk__in=ids, estado='FINALIZADA')
+    actividades = actividades_reporte(ordenes)
+    total = actividades.count() or 1
+
+    def filas_con_progreso():
+        for numero, fila in enumerate(filas_reporte(actividades), start=1):
+            if numero % CADA_CUANTAS_FILAS_AVISAR == 0:
+                reportar_progreso(tarea, numero * 99 // total)
+            yield fila
+
+    with tempfile.TemporaryFile(suffix='.xlsx') as destino:
+        filas = escribir_reporte(filas_con_progreso(), destino, anchos_columnas(actividades))
+        destino.seek(0)
+        nombre = f"Reporte_Cierre_{timezone.localtime().strftime('%Y%m%d_%H%M')}.xlsx"
+        tarea.archivo_resultado.save(nombre, File(destino), save=False)
+    return f"{filas} operaciones exportadas."
+
+
+def importar_sap(tarea):
+    reportar_progreso(tarea, 5, "Leyendo archivo...")
+    try:
+        with tarea.archivo_entrada.open('rb') as archivo:
+            dataset = leer_dataset(archivo, tarea.archivo_entrada.name)
+    except FormatoNoSoportado as e:
+        raise TareaFallida(str(e))
+
+    reportar_progreso(tarea, 20, f"Importando {len(dataset)} filas...")
+    if tarea.parametros.get('modo') == 'fila_por_fila':
+        return _importar_fila_por_fila(tarea, dataset)
+
+    resumen = importar_sap_rapido(dataset, tarea.usuario)
+    if resumen['errores']:
+        raise TareaFallida("No se importó nada, el archivo tiene errores:\n" + "\n".join(resumen['errores'][:50]))
+    return (
+        f"Órdenes nuevas: {resumen['ordenes_nuevas']} | Órdenes actualizadas: {resumen['ordenes_actualizadas']} | "
+        f"Operaciones nuevas: {resumen['actividades_nuevas']} | Operaciones actualizadas: {resumen['actividades_actualizadas']}"
+        + texto_archivadas(resumen)
+    )
+
+
+def _importar_fila_por_fila(tarea, dataset):
+    # Camino original de django-import-export (más lento); se deja por si hay que comparar
+    from .admin import ActividadResource
+
+    resultado = ActividadResource(user=tarea.usuario).import_data(dataset, dry_run=False, raise_errors=False, use_transactions=True)
+
+    errores = [f"Fila {numero}: {error.error}" for numero, errores_fila in resultado.row_errors() for error in errores_fila]
+    errores += [f"Fila {fila.number}: {fila.error_dict}" for fila in resultado.invalid_rows]
+    if errores:
+        # Con use_transactions, import-export revierte todo el archivo si hubo errores
+        raise TareaFallida("No se importó nada, el archivo tiene errores:\n" + "\n".join(errores[:50]))
+
+    totales = resultado.totals
+    return f"Nuevas: {totales.get('new', 0)} | Actualizadas: {totales.get('update', 0)} | Omitidas: {totales.get('skip', 0)}"
+
+
+MANEJADORES = {
+    'EXPORTAR_CIERRE': exportar_cierre,
+    'IMPORTAR_SAP': importar_sap,
+}
@@ -1,3 +1,1374 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia
 
-# Create your tests here.
+
+def crear_ordenes(cantidad, actividades_por_orden, inicio=0):
+    for i in range(inicio, inicio + cantidad):
+        orden = OrdenTrabajo.objects.create(numero_orden=f'OT-{i}', codigo_trabajador='1001', estado='PENDIENTE')
+        for j in range(actividades_por_orden):
+            act = Actividad.objects.create(orden=orden, codigo_operacion=f'{j:04d}', descripcion='Revisión')
+            BitacoraActividad.objects.create(actividad=act, evento='INICIO')
+            BitacoraActividad.objects.create(actividad=act, evento='PAUSA')
+            Evidencia.objects.create(orden=orden, actividad=act, foto='evidencias/prueba.jpg')
+
+
+def imagen(color='red', tamano=(64, 48), formato='JPEG', **opciones):
+    buffer = BytesIO()
+    Image.new('RGB', tamano, color).save(buffer, formato, **opciones)
+    return buffer.getvalue()
+
+
+class MediaTemporalMixin:
+    # MEDIA_ROOT en un directorio temporal propio de cada test
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.media = media.name
+
+    def subir_foto(self, orden, contenido=None, client=None, actividad=None, **extra):
+        datos = {'orden': orden.pk, 'foto': SimpleUploadedFile('foto.jpg', contenido or imagen(), content_type='image/jpeg')}
+        if actividad is not None:
+            datos['actividad'] = actividad.pk
+        return (client or APIClient()).post('/api/evidencias/', datos, format='multipart', **extra)
+
+
+# ==========================================
+# FILTROS DE /api/ordenes/ Y VISTA RESUMEN
+# ==========================================
+class FiltrosOrdenesTests(TestCase):
+    def setUp(self):
+        from datetime import datetime
+        from django.utils import timezone
+
+        def fecha(dia):
+            return timezone.make_aware(datetime(2026, 1, dia, 10, 0))
+
+        crear_ordenes(4, 1)
+        OrdenTrabajo.objects.filter(numero_orden='OT-0').update(inicio_programado=fecha(10))
+        OrdenTrabajo.objects.filter(numero_orden='OT-1').update(inicio_programado=fecha(20), estado='BORRADOR')
+        OrdenTrabajo.objects.filter(numero_orden='OT-2').update(inicio_programado=fecha(31), estado='FINALIZADA', fecha_fin_real=fecha(31))
+        OrdenTrabajo.objects.filter(numero_orden='OT-3').update(codigo_trabajador='2002')
+        self.client = APIClient()
+
+    def numeros(self, **params):
+        respuesta = self.client.get('/api/ordenes/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return sorted(orden['numero_orden'] for orden in respuesta.data)
+
+    def test_trabajador_y_estados(self):
+        self.assertEqual(self.numeros(trabajador='2002'), ['OT-3'])
+        self.assertEqual(self.numeros(estado='finalizada, borrador'), ['OT-1', 'OT-2'])
+        self.assertEqual(self.numeros(trabajador='1001', estado='PENDIENTE'), ['OT-0'])
+
+    def test_rangos_de_fecha(self):
+        self.assertEqual(self.numeros(inicio_desde='2026-01-20'), ['OT-1', 'OT-2'])
+        # La fecha sola en _hasta incluye todo ese día
+        self.assertEqual(self.numeros(inicio_hasta='2026-01-31'), ['OT-0', 'OT-1', 'OT-2'])
+        self.assertEqual(self.numeros(inicio_hasta='2026-01-31T09:00:00'), ['OT-0', 'OT-1'])
+        self.assertEqual(self.numeros(cierre_desde='2026-01-01', cierre_hasta='2026-01-31'), ['OT-2'])
+
+    def test_fecha_invalida_es_400(self):
+        for params in ({'inicio_desde': '2026-13-45'}, {'cierre_hasta': 'ayer'}):
+            respuesta = self.client.get('/api/ordenes/', params)
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn(next(iter(params)), respuesta.data['error'])
+        self.assertEqual(self.client.get('/api/buscar/', {'q': 'OT', 'fin_desde': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/analitica/', {'cierre_desde': 'x'}).status_code, 400)
+
+    def test_vista_resumen_sin_arbol(self):
+        respuesta = self.client.get('/api/ordenes/', {'vista': 'resumen', 'trabajador': '2002'})
+        self.assertEqual(len(respuesta.data), 1)
+        self.assertNotIn('actividades', respuesta.data[0])
+        self.assertIn('actividades', self.client.get('/api/ordenes/').data[0])
+
+
+# ==========================================
+# CONSULTAS CONSTANTES EN EL ÁRBOL ANIDADO
+# ==========================================
+class ConsultasAnidadasTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_listado_ordenes_no_crece_con_los_datos(self):
+        crear_ordenes(1, 1)
+        pocas = self.contar_consultas('/api/ordenes/')
+        crear_ordenes(10, 5, inicio=1)
+        muchas = self.contar_consultas('/api/ordenes/')
+        self.assertEqual(pocas, muchas)
+
+    def test_detalle_orden_no_crece_con_las_actividades(self):
+        crear_ordenes(1, 1)
+        orden = OrdenTrabajo.objects.get()
+        pocas = self.contar_consultas(f'/api/ordenes/{orden.id}/')
+        for j in range(10):
+            act = Actividad.objects.create(orden=orden, codigo_operacion=f'9{j:03d}', descripcion='Extra')
+            BitacoraActividad.objects.create(actividad=act, evento='INICIO')
+            Evidencia.objects.create(orden=orden, actividad=act, foto='evidencias/prueba.jpg')
+        muchas = self.contar_consultas(f'/api/ordenes/{orden.id}/')
+        self.assertEqual(pocas, muchas)
+
+    def test_listado_actividades_no_crece_con_los_datos(self):
+        crear_ordenes(1, 1)
+        pocas = self.contar_consultas('/api/actividades/')
+        crear_ordenes(5, 5, inicio=1)
+        muchas = self.contar_consultas('/api/actividades/')
+        self.assertEqual(pocas, muchas)
+
+
+# ==========================================
+# PAGINACIÓN POR CURSOR OPCIONAL
+# ==========================================
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        crear_ordenes(5, 1)
+        self.client = APIClient()
+
+    def test_sin_parametros_lista_completa(self):
+        respuesta = self.client.get('/api/ordenes/')
+        self.assertIsInstance(respuesta.data, list)
+        self.assertEqual(len(respuesta.data), 5)
+
+    def test_tamano_por_defecto(self):
+        crear_ordenes(50, 0, inicio=5)
+        respuesta = self.client.get('/api/ordenes/', {'paginar': 1})
+        self.assertEqual(len(respuesta.data['results']), 50)
+        self.assertEqual(len(self.client.get(respuesta.data['next']).data['results']), 5)
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos, url = [], '/api/ordenes/?page_size=2'
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertLessEqual(len(respuesta.data['results']), 2)
+            vistos += [orden['id'] for orden in respuesta.data['results']]
+            url = respuesta.data['next']
+        self.assertEqual(vistos, list(OrdenTrabajo.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_orden_nueva_no_corre_la_pagina_siguiente(self):
+        primera = self.client.get('/api/actividades/', {'page_size': 3}).data
+        crear_ordenes(1, 2, inicio=10)
+        segunda = self.client.get(primera['next']).data
+        ids = [a['id'] for a in primera['results'] + segunda['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 5)
+        self.assertIsNone(segunda['next'])
+
+
+# ==========================================
+# SINCRONIZACIÓN INCREMENTAL (DELTAS)
+# ==========================================
+class SincronizacionTests(TestCase):
+    def setUp(self):
+        crear_ordenes(3, 1)
+        OrdenTrabajo.objects.update(estado='PENDIENTE')
+        OrdenTrabajo.objects.filter(numero_orden='OT-2').update(codigo_trabajador='2002')
+        self.client = APIClient()
+
+    def sync(self, trabajador='1001', **params):
+        respuesta = self.client.get('/api/sync/', {'trabajador': trabajador, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data
+
+    def lapidas(self, orden):
+        actividad = orden.actividades.get()
+        return [('ACTIVIDAD', actividad.pk), ('EVIDENCIA', actividad.evidencia_set.get().pk)] + [
+            ('BITACORA', pk) for pk in actividad.bitacora.values_list('pk', flat=True)
+        ]
+
+    def test_cada_operario_recibe_solo_sus_lapidas(self):
+        from .models import Eliminacion
+
+        cursor = self.sync()['cursor']
+        propia, reasignada, ajena = OrdenTrabajo.objects.order_by('numero_orden')
+        esperadas = {'1001': self.lapidas(propia) + [('ORDEN', reasignada.pk)], '2002': self.lapidas(ajena) + [('ORDEN', ajena.pk)]}
+        propia.actividades.get().delete()
+        ajena.delete()
+        reasignada.codigo_trabajador = '2002'
+        reasignada.save()
+        # Lápida de antes de que se guardara el operario: le llega a todos
+        vieja = Eliminacion.objects.create(modelo='ORDEN', objeto_id=999)
+
+        for trabajador, lapidas in esperadas.items():
+            eliminados = self.sync(trabajador, cursor=cursor)['eliminados']
+            self.assertCountEqual([(e['modelo'], e['id']) for e in eliminados], lapidas + [('ORDEN', vieja.objeto_id)])
+
+    def test_lapidas_vencidas_se_purgan_y_piden_sync_completa(self):
+        from django.utils import timezone
+        from .models import Eliminacion
+        from .sincronizacion import RETENCION_LAPIDAS, purgar_lapidas
+
+        vencida = timezone.now() - RETENCION_LAPIDAS * 2
+        OrdenTrabajo.objects.get(numero_orden='OT-0').delete()
+        Eliminacion.objects.update(fecha=vencida)
+        OrdenTrabajo.objects.get(numero_orden='OT-1').delete()
+        self.assertEqual(purgar_lapidas(), 5)
+        self.assertEqual(Eliminacion.objects.count(), 5)
+        respuesta = self.client.get('/api/sync/', {'trabajador': '1001', 'cursor': vencida.isoformat()})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_sync_completa_por_paginas(self):
+        from unittest import mock
+        from . import sincronizacion
+
+        crear_ordenes(3, 1, inicio=3)
+        OrdenTrabajo.objects.update(estado='PENDIENTE')
+        completa = self.sync()
+        self.assertIsNone(completa['continuar'])
+
+        paginas = []
+        with mock.patch.object(sincronizacion, 'ORDENES_POR_PAGINA', 2):
+            pagina = self.sync(paginar='1')
+            paginas.append(pagina)
+            while pagina['continuar']:
+                pagina = self.sync(continuar=pagina['continuar'])
+                paginas.append(pagina)
+        self.assertEqual([len(p['ordenes']) for p in paginas], [2, 2, 1])
+        self.assertEqual({p['cursor'] for p in paginas}, {paginas[0]['cursor']})
+        for clave in ('ordenes', 'actividades', 'bitacora', 'evidencias'):
+            self.assertEqual([f['id'] for p in paginas for f in p[clave]], [f['id'] for f in completa[clave]])
+        respuesta = self.client.get('/api/sync/', {'trabajador': '1001', 'continuar': 'basura'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_guardar_orden_cargada_no_vuelve_a_consultarla(self):
+        orden = OrdenTrabajo.objects.get(numero_orden='OT-0')
+        orden.descripcion = 'Cambio de sello'
+        with CaptureQueriesContext(connection) as consultas:
+            orden.save()
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if c['sql'].startswith('SELECT')])
+
+
+# ==========================================
+# LOTES (BÓVEDA OFFLINE EN UNA PETICIÓN)
+# ==========================================
+class LoteTests(TestCase):
+    def test_operaciones_independientes_y_bitacora_en_bloque(self):
+        from django.db.models.signals import post_save
+        from .models import AvisoOrden
+
+        crear_ordenes(1, 2)
+        OrdenTrabajo.objects.update(estado='PENDIENTE')
+        orden = OrdenTrabajo.objects.get()
+        primera, segunda = orden.actividades.order_by('id')
+        BitacoraActividad.objects.all().delete()
+        guardadas = []
+
+        def receptor(sender, instance, created, **kwargs):
+            guardadas.append((instance.pk, created))
+
+        post_save.connect(receptor, sender=BitacoraActividad, dispatch_uid='prueba_lote')
+        self.addCleanup(post_save.disconnect, sender=BitacoraActividad, dispatch_uid='prueba_lote')
+        operaciones = [
+            {'url': 'http://servidor/api/bitacora/', 'metodo': 'POST', 'body': {'actividad': primera.pk, 'evento': 'INICIO'}},
+            {'url': '/api/bitacora', 'body': {'actividad': primera.pk, 'evento': 'PAUSA'}},
+            {'url': '/api/bitacora/', 'metodo': 'POST', 'body': {'actividad': 999999, 'evento': 'INICIO'}},
+            {'url': f'/api/actividades/{segunda.pk}/', 'metodo': 'PATCH', 'body': {'notas_operario': 'Sello cambiado'}},
+            {'url': f'/api/actividades/{primera.pk}/finalizar/', 'metodo': 'POST', 'body': {'tiempo_total': 'basura'}},
+            {'url': '/api/actividades/999999/finalizar/', 'metodo': 'POST', 'body': {}},
+            {'url': f'/api/ordenes/{orden.pk}/', 'metodo': 'DELETE'},
+            'no soy un objeto',
+            {'url': f'/api/ordenes/{orden.pk}/finalizar/', 'metodo': 'POST'},
+        ]
+        AvisoOrden.objects.all().delete()
+        respuesta = APIClient().post('/api/lote/', {'operaciones': operaciones}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['status'] for r in respuesta.data['resultados']], [201, 201, 400, 200, 400, 404, 400, 400, 200])
+
+        self.assertEqual(list(BitacoraActividad.objects.order_by('id').values_list('evento', flat=True)), ['INICIO', 'PAUSA'])
+        self.assertEqual(guardadas, [(pk, True) for pk in BitacoraActividad.objects.order_by('id').values_list('pk', flat=True)])
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.notas_operario, 'Sello cambiado')
+        self.assertFalse(Actividad.objects.get(pk=primera.pk).finished)
+        # Las operaciones que no son bitácora pasan por save(): la orden finalizada avisa a la App
+        self.assertEqual(OrdenTrabajo.objects.get().estado, 'FINALIZADA')
+        self.assertTrue(AvisoOrden.objects.filter(orden_id=orden.pk, motivo='MODIFICADA').exists())
+
+    def test_limite_de_operaciones(self):
+        from .lote import MAX_OPERACIONES_LOTE
+
+        client = APIClient()
+        self.assertEqual(client.post('/api/lote/', {'operaciones': {}}, format='json').status_code, 400)
+        operaciones = [{'url': '/api/bitacora/', 'body': {}}] * (MAX_OPERACIONES_LOTE + 1)
+        self.assertEqual(client.post('/api/lote/', {'operaciones': operaciones}, format='json').status_code, 400)
+
+
+# ==========================================
+# IDEMPOTENCIA PARA ESCRITURAS REINTENTADAS
+# ==========================================
+class IdempotenciaTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+
+        super().setUp()
+        crear_ordenes(1, 1)
+        self.actividad = Actividad.objects.get()
+        BitacoraActividad.objects.all().delete()
+        self.token = Token.objects.create(user=User.objects.create_user('1001', password='x')).key
+        self.otro = Token.objects.create(user=User.objects.create_user('2002', password='x')).key
+        self.client = APIClient()
+
+    def registrar(self, evento, clave='clave-1', token=None):
+        return self.client.post(
+            '/api/bitacora/', {'actividad': self.actividad.pk, 'evento': evento}, format='json',
+            HTTP_IDEMPOTENCY_KEY=clave, HTTP_AUTHORIZATION=f'Token {token or self.token}',
+        )
+
+    def test_reintento_devuelve_la_respuesta_guardada(self):
+        primera = self.registrar('INICIO')
+        self.assertEqual(primera.status_code, 201)
+        segunda = self.registrar('INICIO')
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(BitacoraActividad.objects.count(), 1)
+
+    def test_misma_clave_con_otro_cuerpo_u_otro_usuario_es_422(self):
+        self.assertEqual(self.registrar('INICIO').status_code, 201)
+        self.assertEqual(self.registrar('PAUSA').status_code, 422)
+        self.assertEqual(self.registrar('INICIO', token=self.otro).status_code, 422)
+        self.assertEqual(BitacoraActividad.objects.count(), 1)
+
+    def test_clave_en_proceso(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .idempotencia import VIGENCIA_EN_PROCESO, hash_clave
+        from .models import ClaveIdempotencia
+
+        self.registrar('INICIO', clave='clave-2')
+        reserva = ClaveIdempotencia.objects.get(clave=hash_clave('clave-2'))
+        ClaveIdempotencia.objects.filter(pk=reserva.pk).update(estado_http=None)
+        # Una petición lenta que sigue viva no se ejecuta dos veces...
+        ClaveIdempotencia.objects.filter(pk=reserva.pk).update(fecha=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.registrar('INICIO', clave='clave-2').status_code, 409)
+        # ...pero una que murió a medias libera la clave
+        ClaveIdempotencia.objects.filter(pk=reserva.pk).update(fecha=timezone.now() - VIGENCIA_EN_PROCESO * 2)
+        self.assertEqual(self.registrar('INICIO', clave='clave-2').status_code, 201)
+        self.assertEqual(BitacoraActividad.objects.count(), 2)
+
+    def test_foto_reintentada(self):
+        orden = self.actividad.orden
+        Evidencia.objects.all().delete()
+        for color, esperado in (('red', 201), ('red', 201), ('blue', 422)):
+            respuesta = self.subir_foto(
+                orden, imagen(color), self.client, HTTP_IDEMPOTENCY_KEY='foto-1', HTTP_AUTHORIZATION=f'Token {self.token}',
+            )
+            self.assertEqual(respuesta.status_code, esperado)
+        self.assertEqual(Evidencia.objects.count(), 1)
+
+
+# ==========================================
+# GET CONDICIONAL (ETAG)
+# ==========================================
+class RespuestaCondicionalTests(TestCase):
+    def test_304_hasta_que_algo_cambia(self):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from .kpis import reconstruir_kpis
+
+        crear_ordenes(1, 2)
+        orden = OrdenTrabajo.objects.get()
+        client = APIClient()
+        url = f'/api/ordenes/{orden.pk}/'
+
+        respuesta = client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Last-Modified', respuesta)
+        etag = respuesta['ETag']
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Borrar un hijo no cambia ninguna fecha_modificacion
+        orden.actividades.first().delete()
+        respuesta = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['actividades']), 1)
+        etag = respuesta['ETag']
+
+        # reconstruir_kpis tampoco
+        orden.actividades.update(finished=True, tiempo_real_acumulado=timedelta(minutes=30))
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        reconstruir_kpis()
+        respuesta = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+
+        # Otro usuario recibe otras URLs de fotos: no comparte la versión
+        client.force_authenticate(User.objects.create_user('1001', password='x'))
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# ==========================================
+# REPORTE DE CIERRE (EXCEL EN STREAMING)
+# ==========================================
+class ReporteCierreTests(TestCase):
+    def test_exportar_desde_el_historial(self):
+        from datetime import datetime, timedelta, timezone as tz
+        import openpyxl
+        from django.contrib.auth.models import User
+        from .exportacion import ENCABEZADOS
+
+        inicio = datetime(2026, 3, 2, 8, 15, tzinfo=tz.utc)
+        bomba = OrdenTrabajo.objects.create(numero_orden='OT-BOMBA-0001', equipo='EQ-1', ubicacion='PLANTA-A', estado='FINALIZADA', inicio_programado=inicio, fin_programado=inicio + timedelta(days=1))
+        motor = OrdenTrabajo.objects.create(numero_orden='OT-2', equipo='EQ-22', estado='FINALIZADA')
+        larga = 'Cambio de sello mecánico y alineación del acople ' * 2
+        Actividad.objects.create(
+            orden=bomba, codigo_operacion='0010', descripcion=larga, nombre_ejecutor='Juan Pérez',
+            fecha_inicio_real=inicio, fecha_fin_real=inicio + timedelta(hours=2),
+            tiempo_real_acumulado=timedelta(hours=1, minutes=30), tiempo_pausas=timedelta(minutes=30),
+        )
+        Actividad.objects.create(orden=bomba, codigo_operacion='0020', descripcion='Prueba')
+        Actividad.objects.create(orden=motor, codigo_operacion='0010', descripcion='Engrase')
+        OrdenTrabajo.objects.create(numero_orden='OT-NO-SELECCIONADA', estado='FINALIZADA')
+
+        client = APIClient()
+        client.force_login(User.objects.create_superuser('planificador', password='x'))
+        respuesta = client.post('/admin/ordenes/ordenhistorial/', {'action': 'exportar_sap', '_selected_action': [bomba.pk, motor.pk]})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Reporte_Cierre.xlsx', respuesta['Content-Disposition'])
+        hoja = openpyxl.load_workbook(BytesIO(b''.join(respuesta.streaming_content))).active
+
+        filas = [list(fila) for fila in hoja.iter_rows(values_only=True)]
+        self.assertEqual(filas[0], ENCABEZADOS)
+        # Órdenes de la más nueva a la más vieja, operaciones en orden de carga
+        self.assertEqual(filas[1:], [
+            ['OT-2', '0010', 'Engrase', 'EQ-22', None, '-', '-', '-', '-', '-', '00:00:00', 0, '00:00:00', 0],
+            ['OT-BOMBA-0001', '0010', larga, 'EQ-1', 'PLANTA-A', '02/03/2026', '03/03/2026', 'Juan Pérez',
+             '02/03/2026 08:15', '02/03/2026 10:15', '01:30:00', 1.5, '00:30:00', 0.5],
+            ['OT-BOMBA-0001', '0020', 'Prueba', 'EQ-1', 'PLANTA-A', '02/03/2026', '03/03/2026', '-', '-', '-', '00:00:00', 0, '00:00:00', 0],
+        ])
+
+        # Anchos: MAX(LENGTH(...)) de los datos exportados (no de toda la tabla) o el encabezado, + 2
+        anchos = {letra: hoja.column_dimensions[letra].width for letra in 'ABCDEH'}
+        self.assertEqual(anchos, {
+            'A': len('OT-BOMBA-0001') + 2, 'B': len('Operación') + 2, 'C': len(larga) + 2,
+            'D': len('Equipo') + 2, 'E': len('Ubicación Téc.') + 2, 'H': len('Ejecutor Real') + 2,
+        })
+
+
+# ==========================================
+# COLA DE TAREAS EN SEGUNDO PLANO
+# ==========================================
+class TareasTests(TestCase):
+    def test_encolar_tomar_y_ejecutar(self):
+        from unittest import mock
+        from . import tareas
+        from .models import TareaFondo
+
+        def fallar(tarea):
+            raise tareas.TareaFallida("Fila 3: fecha inválida")
+
+        def romper(tarea):
+            raise KeyError('numero_orden')
+
+        primera = tareas.encolar('IMPORTAR_SAP', parametros={'modo': 'rapido'})
+        segunda = tareas.encolar('EXPORTAR_CIERRE')
+        tercera = tareas.encolar('EXPORTAR_CIERRE')
+        self.assertEqual(primera.estado, 'EN_COLA')
+
+        with mock.patch.dict(tareas.MANEJADORES, {'IMPORTAR_SAP': lambda tarea: 'listo', 'EXPORTAR_CIERRE': fallar}):
+            tomada = tareas.tomar_siguiente()
+            self.assertEqual((tomada.pk, tomada.estado, tomada.parametros), (primera.pk, 'EN_PROCESO', {'modo': 'rapido'}))
+            self.assertIsNotNone(tomada.latido)
+            tareas.ejecutar(tomada)
+            tareas.ejecutar(tareas.tomar_siguiente())
+        with mock.patch.dict(tareas.MANEJADORES, {'EXPORTAR_CIERRE': romper}):
+            tareas.ejecutar(tareas.tomar_siguiente())
+        self.assertIsNone(tareas.tomar_siguiente())
+
+        primera, segunda, tercera = (TareaFondo.objects.get(pk=t.pk) for t in (primera, segunda, tercera))
+        self.assertEqual((primera.estado, primera.progreso, primera.mensaje), ('COMPLETADA', 100, 'listo'))
+        self.assertEqual((segunda.estado, segunda.mensaje), ('FALLIDA', 'Fila 3: fecha inválida'))
+        self.assertEqual(tercera.estado, 'FALLIDA')
+        self.assertIn('KeyError', tercera.mensaje)
+
+    def test_solo_vuelven_a_la_cola_las_tareas_sin_latido(self):
+        from django.utils import timezone
+        from . import tareas
+        from .models import TareaFondo
+
+        viva = tareas.encolar('IMPORTAR_SAP')
+        muerta = tareas.encolar('IMPORTAR_SAP')
+        tareas.tomar_siguiente()
+        tareas.tomar_siguiente()
+        TareaFondo.objects.filter(pk=muerta.pk).update(latido=timezone.now() - tareas.TAREA_ABANDONADA * 2)
+
+        self.assertEqual(tareas.liberar_abandonadas(), 1)
+        self.assertEqual(TareaFondo.objects.get(pk=viva.pk).estado, 'EN_PROCESO')
+        self.assertEqual(tareas.tomar_siguiente().pk, muerta.pk)
+
+
+class LatidoTareasTests(TransactionTestCase):
+    def test_tarea_larga_sigue_latiendo(self):
+        # TransactionTestCase: el hilo del latido escribe con su propia conexión
+        import time
+        from unittest import mock
+        from django.utils import timezone
+        from . import tareas
+        from .models import TareaFondo
+
+        liberadas = []
+
+        def importar_largo(tarea):
+            vencido = timezone.now() - tareas.TAREA_ABANDONADA * 2
+            TareaFondo.objects.filter(pk=tarea.pk).update(latido=vencido)
+            limite = time.monotonic() + 5
+            while TareaFondo.objects.get(pk=tarea.pk).latido == vencido and time.monotonic() < limite:
+                time.sleep(0.02)
+            liberadas.append(tareas.liberar_abandonadas())
+            return 'listo'
+
+        tareas.encolar('IMPORTAR_SAP')
+        with mock.patch.dict(tareas.MANEJADORES, {'IMPORTAR_SAP': importar_largo}), mock.patch.object(tareas, 'INTERVALO_LATIDO', 0.05):
+            tarea = tareas.ejecutar(tareas.tomar_siguiente())
+        self.assertEqual(liberadas, [0])
+        self.assertEqual(tarea.estado, 'COMPLETADA')
+
+
+# ==========================================
+# IMPORTACIÓN SAP: MODO RÁPIDO == FILA POR FILA
+# ==========================================
+class ImportacionSapTests(TestCase):
+    encabezados = ['Orden', 'Operación', 'Txt.brv.oper.', 'Pto.tbjo.op.', 'Texto breve', 'Equipo', 'Descripción',
+                   'Ubic.técn.', 'Descripción', 'Prioridad', 'Fe.inic.extrema', 'Fe.fin extrema']
+
+    def dataset(self):
+        import tablib
+        filas = [
+            ['4001', '0010', 'Desmontar bomba', 'MEC', 'Mantto bomba', 'EQ-1', 'Bomba', 'PLT-01', 'Planta', '2-Alto', '01/02/2026', '03/02/2026'],
+            ['4001', '0020', 'Cambiar sello', 'MEC', 'Mantto bomba', 'EQ-1', 'Bomba', 'PLT-01', 'Planta', '2-Alto', '01/02/2026', '03/02/2026'],
+            ['4002', '0010', 'Inspección', 'ELE', 'Motor', 'EQ-2', 'Motor', 'PLT-02', 'Caldera', '', '2026-02-05 00:00:00', None],
+            ['4001', '0020', 'Cambiar sello y empaque', 'MEC', 'Mantto bomba v2', 'EQ-1', 'Bomba', 'PLT-01', 'Planta', '1-Muy alto', '01/02/2026', '04/02/2026'],
+        ]
+        return tablib.Dataset(*filas, headers=self.encabezados)
+
+    def foto(self):
+        campos_orden = ['numero_orden', 'descripcion', 'equipo', 'descripcion_equipo', 'ubicacion', 'ubicacion_tecnica',
+                        'inicio_programado', 'fin_programado', 'estado', 'prioridad', 'supervisor_id']
+        ordenes = list(OrdenTrabajo.objects.order_by('numero_orden').values_list(*campos_orden))
+        actividades = list(Actividad.objects.order_by('orden__numero_orden', 'codigo_operacion').values_list(
+            'orden__numero_orden', 'codigo_operacion', 'descripcion', 'puesto_trabajo'))
+        return ordenes, actividades
+
+    def preparar_existentes(self):
+        orden = OrdenTrabajo.objects.create(numero_orden='4001', estado='PENDIENTE', descripcion='Viejo')
+        Actividad.objects.create(orden=orden, codigo_operacion='0010', descripcion='Texto viejo')
+
+    def test_mismo_resultado_que_import_export(self):
+        from django.contrib.auth.models import User
+        from .admin import ActividadResource
+        from .importacion import importar_sap_rapido
+        usuario = User.objects.create_user('planificador')
+
+        self.preparar_existentes()
+        resultado = ActividadResource(user=usuario).import_data(self.dataset(), dry_run=False, raise_errors=True)
+        self.assertFalse(resultado.has_errors())
+        esperado = self.foto()
+
+        Actividad.objects.all().delete()
+        OrdenTrabajo.objects.all().delete()
+        self.preparar_existentes()
+        resumen = importar_sap_rapido(self.dataset(), usuario)
+        self.assertEqual(resumen['errores'], [])
+        self.assertEqual(resumen['ordenes_nuevas'], 1)
+        self.assertEqual(resumen['actividades_actualizadas'], 1)
+        self.assertEqual(self.foto(), esperado)
+
+    def test_orden_archivada_no_se_reimporta(self):
+        from datetime import date
+        from .admin import ActividadResource
+        from .importacion import importar_sap_rapido
+        from .models import OrdenArchivada
+
+        OrdenArchivada.objects.create(id=999, numero_orden='4001', mes=date(2025, 1, 1))
+        resumen = importar_sap_rapido(self.dataset())
+        self.assertEqual(resumen['errores'], [])
+        self.assertEqual(resumen['ordenes_archivadas'], ['4001'])
+        self.assertEqual(list(OrdenTrabajo.objects.values_list('numero_orden', flat=True)), ['4002'])
+
+        OrdenTrabajo.objects.all().delete()
+        resultado = ActividadResource().import_data(self.dataset(), dry_run=False, raise_errors=True)
+        self.assertFalse(resultado.has_errors())
+        self.assertEqual(resultado.totals['skip'], 3)
+        self.assertEqual(list(OrdenTrabajo.objects.values_list('numero_orden', flat=True)), ['4002'])
+
+
+# ==========================================
+# ÍNDICES DE LAS CONSULTAS FRECUENTES (EXPLAIN)
+# ==========================================
+class ExplicarConsultasTests(TestCase):
+    def test_comando_muestra_los_planes(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .management.commands.explicar_consultas import consultas_clave
+
+        crear_ordenes(2, 1)
+        salida = StringIO()
+        call_command('explicar_consultas', codigo='1001', stdout=salida)
+        texto = salida.getvalue()
+
+        for titulo, _ in consultas_clave('1001'):
+            self.assertIn(f'== {titulo}', texto)
+        # Los índices de 0022 aparecen en el plan también en SQLite
+        for indice in ('orden_estado_id_idx', 'orden_estado_fin_prog_idx', 'orden_trabajador_estado_idx'):
+            self.assertIn(indice, texto)
+        self.assertIn(f'de {len(consultas_clave("1001"))} consultas usan recorrido completo', texto)
+
+
+# ==========================================
+# KPIs PRECALCULADOS
+# ==========================================
+class KpisPrecalculadosTests(TestCase):
+    def test_finalizar_coincide_con_reconstruir(self):
+        from .kpis import reconstruir_kpis
+        from .models import ResumenTrabajadorDia
+
+        crear_ordenes(2, 2)
+        client = APIClient()
+        datos = {'fecha_fin_real': '2026-03-10T15:00:00', 'tiempo_total': '01:30:00', 'tiempo_pausas': '00:10:00'}
+        for act in Actividad.objects.all()[:3]:
+            self.assertEqual(client.post(f'/api/actividades/{act.pk}/finalizar/', datos, format='json').status_code, 200)
+        # Finalizar dos veces la misma (reenvío desde la bóveda offline) no duplica
+        client.post(f'/api/actividades/{act.pk}/finalizar/', datos, format='json')
+
+        incremental = list(OrdenTrabajo.objects.order_by('id').values_list('tiempo_total', 'tiempo_pausas_total', 'actividades_finalizadas'))
+        resumen = list(ResumenTrabajadorDia.objects.values_list('codigo_trabajador', 'segundos_activos', 'segundos_pausa', 'actividades_finalizadas'))
+        self.assertEqual(resumen, [('1001', 3 * 5400, 3 * 600, 3)])
+
+        reconstruir_kpis()
+        self.assertEqual(incremental, list(OrdenTrabajo.objects.order_by('id').values_list('tiempo_total', 'tiempo_pausas_total', 'actividades_finalizadas')))
+        self.assertEqual(resumen, list(ResumenTrabajadorDia.objects.values_list('codigo_trabajador', 'segundos_activos', 'segundos_pausa', 'actividades_finalizadas')))
+
+    def test_finalizar_no_reenvia_la_orden_en_el_sync(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        crear_ordenes(1, 2)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        for modelo in (OrdenTrabajo, Actividad, BitacoraActividad, Evidencia):
+            modelo.objects.update(fecha_modificacion=hace_una_hora)
+        act = Actividad.objects.first()
+        datos = {'fecha_fin_real': '2026-03-10T15:00:00', 'tiempo_total': '01:30:00', 'tiempo_pausas': '00:10:00'}
+        self.assertEqual(APIClient().post(f'/api/actividades/{act.pk}/finalizar/', datos, format='json').status_code, 200)
+
+        orden = OrdenTrabajo.objects.get()
+        self.assertEqual((orden.actividades_finalizadas, orden.tiempo_total), (1, timedelta(minutes=90)))
+        self.assertEqual(orden.fecha_modificacion, hace_una_hora)
+        cambios = APIClient().get('/api/sync/', {'trabajador': '1001', 'cursor': (hace_una_hora + timedelta(minutes=30)).isoformat()}).data
+        self.assertEqual(cambios['ordenes'], [])
+        self.assertEqual([a['id'] for a in cambios['actividades']], [act.pk])
+
+
+# ==========================================
+# TIEMPOS DE ACTIVIDAD COMO DURACIÓN
+# ==========================================
+class DuracionHHMMSSTests(TestCase):
+    def test_ida_y_vuelta_por_la_api(self):
+        from datetime import timedelta
+
+        crear_ordenes(1, 1)
+        act = Actividad.objects.get()
+        client = APIClient()
+        url = f'/api/actividades/{act.pk}/'
+        respuesta = client.patch(url, {'tiempo_real_acumulado': '27:05:09', 'tiempo_pausas': '0:00:45'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        act.refresh_from_db()
+        self.assertEqual((act.tiempo_real_acumulado, act.tiempo_pausas), (timedelta(hours=27, seconds=309), timedelta(seconds=45)))
+        datos = client.get(url).data
+        self.assertEqual((datos['tiempo_real_acumulado'], datos['tiempo_pausas']), ('27:05:09', '00:00:45'))
+
+        # Formatos viejos de la App: str(timedelta) y microsegundos crudos
+        client.patch(url, {'tiempo_real_acumulado': '1 day, 2:03:04', 'tiempo_pausas': '90000000'}, format='json')
+        datos = client.get(url).data
+        self.assertEqual((datos['tiempo_real_acumulado'], datos['tiempo_pausas']), ('26:03:04', '00:01:30'))
+
+        respuesta = client.patch(url, {'tiempo_pausas': '10 minutos'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('tiempo_pausas', respuesta.data)
+
+
+class MigracionTiemposTests(TransactionTestCase):
+    # Vuelve a 0023 (tiempos como texto), carga datos viejos y aplica 0024 de nuevo
+    anterior = [('ordenes', '0023_kpis_precalculados')]
+    migracion = [('ordenes', '0024_tiempos_como_duracion')]
+
+    def migrar(self, destino=None):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        destino = destino or executor.loader.graph.leaf_nodes('ordenes')
+        executor.migrate(destino)
+        executor.loader.build_graph()
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        self.migrar()
+
+    def test_texto_a_duracion_y_vuelta(self):
+        from datetime import timedelta
+
+        apps = self.migrar(self.anterior)
+        Orden = apps.get_model('ordenes', 'OrdenTrabajo')
+        Actividad = apps.get_model('ordenes', 'Actividad')
+        orden = Orden.objects.create(numero_orden='OT-MIG', codigo_trabajador='1001')
+        viejos = [('01:02:03', '0:00:30'), ('1 day, 2:03:04', '5400000000'), ('basura', '')]
+        for i, (activo, pausas) in enumerate(viejos):
+            Actividad.objects.create(orden=orden, codigo_operacion=f'{i:04d}', tiempo_real_acumulado=activo, tiempo_pausas=pausas)
+
+        apps = self.migrar(self.migracion)
+        tiempos = list(apps.get_model('ordenes', 'Actividad').objects.order_by('codigo_operacion').values_list('tiempo_real_acumulado', 'tiempo_pausas'))
+        self.assertEqual(tiempos, [
+            (timedelta(seconds=3723), timedelta(seconds=30)),
+            (timedelta(days=1, seconds=7384), timedelta(seconds=5400)),
+            (timedelta(0), timedelta(0)),
+        ])
+
+        apps = self.migrar(self.anterior)
+        tiempos = list(apps.get_model('ordenes', 'Actividad').objects.order_by('codigo_operacion').values_list('tiempo_real_acumulado', 'tiempo_pausas'))
+        self.assertEqual(tiempos, [('01:02:03', '00:00:30'), ('26:03:04', '01:30:00'), ('00:00:00', '00:00:00')])
+
+
+# ==========================================
+# ANALÍTICA DE MANTENIMIENTO
+# ==========================================
+class AnaliticaTests(TestCase):
+    def setUp(self):
+        from datetime import datetime, timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+
+        def hora(mes, dia, h):
+            return timezone.make_aware(datetime(2026, mes, dia, h))
+
+        cache.clear()
+        bomba = OrdenTrabajo.objects.create(numero_orden='OT-A1', codigo_trabajador='1001', equipo='EQ-1', estado='FINALIZADA')
+        motor = OrdenTrabajo.objects.create(numero_orden='OT-A2', codigo_trabajador='2002', equipo='EQ-2', estado='FINALIZADA')
+        # (orden, activo, pausa, inicio, fin, pausas en la bitácora)
+        datos = [
+            (bomba, 1, 10, hora(1, 10, 8), hora(1, 10, 10), 2),
+            (bomba, 3, 0, hora(2, 5, 8), hora(2, 5, 11), 0),
+            (motor, 2, 20, hora(2, 7, 8), hora(2, 7, 12), 1),
+        ]
+        for i, (orden, activo, pausa, inicio, fin, pausas) in enumerate(datos):
+            act = Actividad.objects.create(
+                orden=orden, codigo_operacion=f'{i:04d}', finished=True, fecha_inicio_real=inicio, fecha_fin_real=fin,
+                tiempo_real_acumulado=timedelta(hours=activo), tiempo_pausas=timedelta(minutes=pausa),
+            )
+            for _ in range(pausas):
+                BitacoraActividad.objects.create(actividad=act, evento='PAUSA')
+        # Sin terminar: no cuenta
+        Actividad.objects.create(orden=motor, codigo_operacion='0099', tiempo_real_acumulado=timedelta(hours=9))
+        self.client = APIClient()
+
+    def test_indicadores_totales(self):
+        respuesta = self.client.get('/api/analitica/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['agrupar'], [])
+        total, = respuesta.data['grupos']
+        self.assertEqual((total['actividades'], total['ordenes'], total['pausas']), (3, 2, 3))
+        self.assertEqual((total['activo_total_seg'], total['activo_promedio_seg'], total['pausa_total_seg']), (21600, 7200, 1800))
+        self.assertEqual(total['mttr_seg'], 3 * 3600)
+        self.assertEqual((total['activo_p50_seg'], total['activo_p90_seg']), (7200, 10080))
+        self.assertEqual((total['ratio_pausa_pct'], total['wrench_time_pct']), (7.7, 66.7))
+
+    def test_agrupar_filtrar_y_tramo(self):
+        grupos = self.client.get('/api/analitica/', {'agrupar': 'trabajador'}).data['grupos']
+        self.assertEqual(
+            [(g['trabajador'], g['actividades'], g['pausas'], g['activo_total_seg']) for g in grupos],
+            [('1001', 2, 2, 4 * 3600), ('2002', 1, 1, 2 * 3600)],
+        )
+        respuesta = self.client.get('/api/analitica/', {'agrupar': 'equipo', 'tramo': 'mes', 'cierre_desde': '2026-02-01'})
+        self.assertEqual(respuesta.data['agrupar'], ['equipo', 'tramo'])
+        self.assertEqual([(g['equipo'], g['tramo'][:7], g['actividades']) for g in respuesta.data['grupos']], [('EQ-1', '2026-02', 1), ('EQ-2', '2026-02', 1)])
+        self.assertEqual(self.client.get('/api/analitica/', {'equipo': 'EQ-2'}).data['grupos'][0]['actividades'], 1)
+
+    def test_parametros_invalidos(self):
+        for params in ({'agrupar': 'color'}, {'tramo': 'anio'}, {'tramo': 'mes,dia'}):
+            respuesta = self.client.get('/api/analitica/', params)
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn('error', respuesta.data)
+
+    def test_cache_se_invalida_con_los_datos(self):
+        from .analitica import indicadores_cacheados
+
+        params = {'agrupar': 'trabajador'}
+        primera = indicadores_cacheados(params)
+        # Con la caché caliente solo se consultan las marcas de modificación
+        with self.assertNumQueries(4):
+            self.assertEqual(indicadores_cacheados(params), primera)
+        act = Actividad.objects.get(codigo_operacion='0001')
+        act.finished = False
+        act.save()
+        self.assertEqual([g['actividades'] for g in indicadores_cacheados(params)['grupos']], [1, 1])
+
+
+# ==========================================
+# LÍNEA DE TIEMPO DESDE LA BITÁCORA
+# ==========================================
+class LineaTiempoTests(TestCase):
+    def test_tramos_y_eventos_repetidos(self):
+        from datetime import datetime, timedelta, timezone as tz
+        from .linea_tiempo import reconstruir_tramos
+
+        t = datetime(2026, 3, 10, 8, 0, tzinfo=tz.utc)
+        minuto = timedelta(minutes=1)
+        linea = reconstruir_tramos([
+            ('INICIO', t), ('PAUSA', t + 30 * minuto), ('PAUSA', t + 35 * minuto),
+            ('REANUDAR', t + 45 * minuto), ('FINAL', t + 90 * minuto), ('REANUDAR', t + 95 * minuto),
+        ])
+        self.assertEqual([tramo['tipo'] for tramo in linea['tramos']], ['ACTIVO', 'PAUSA', 'ACTIVO'])
+        self.assertEqual(linea['tiempo_activo'], 75 * minuto)
+        self.assertEqual(linea['tiempo_pausas'], 15 * minuto)
+        self.assertEqual(len(linea['anomalias']), 2)
+        self.assertFalse(linea['completa'])
+
+    def actividad_con_eventos(self, orden, codigo, eventos, registrado=None):
+        # eventos: [(evento, minutos desde el inicio)]; fecha_hora es auto_now_add, se corrige después
+        from datetime import datetime, timedelta, timezone as tz
+
+        act = Actividad.objects.create(orden=orden, codigo_operacion=codigo, finished=True)
+        if registrado is not None:
+            act.tiempo_real_acumulado, act.tiempo_pausas = registrado
+            act.save()
+        inicio = datetime(2026, 3, 10, 8, 0, tzinfo=tz.utc)
+        for evento, minutos in eventos:
+            fila = BitacoraActividad.objects.create(actividad=act, evento=evento)
+            BitacoraActividad.objects.filter(pk=fila.pk).update(fecha_hora=inicio + timedelta(minutes=minutos))
+        return act
+
+    def test_lineas_de_tiempo_en_una_consulta(self):
+        from datetime import timedelta
+        from .linea_tiempo import lineas_de_tiempo
+
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-LT', codigo_trabajador='1001')
+        a = self.actividad_con_eventos(orden, '0010', [('INICIO', 0), ('PAUSA', 20), ('REANUDAR', 30), ('FINAL', 60)])
+        b = self.actividad_con_eventos(orden, '0020', [('INICIO', 0), ('FINAL', 45)])
+        Actividad.objects.create(orden=orden, codigo_operacion='0030')
+
+        with self.assertNumQueries(1):
+            lineas = dict(lineas_de_tiempo(Actividad.objects.filter(orden=orden)))
+        # Sin bitácora no hay línea de tiempo
+        self.assertEqual(set(lineas), {a.pk, b.pk})
+        self.assertEqual((lineas[a.pk]['tiempo_activo'], lineas[a.pk]['tiempo_pausas']), (timedelta(minutes=50), timedelta(minutes=10)))
+        self.assertEqual(lineas[b.pk]['tiempo_activo'], timedelta(minutes=45))
+        self.assertTrue(lineas[a.pk]['completa'] and lineas[b.pk]['completa'])
+
+    def test_recalcular_no_pisa_tiempos_de_eventos_offline(self):
+        from datetime import timedelta
+        from .linea_tiempo import recalcular_tiempos
+
+        minuto = timedelta(minutes=1)
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-RT', codigo_trabajador='1001')
+        distinta = self.actividad_con_eventos(orden, '0010', [('INICIO', 0), ('PAUSA', 20), ('REANUDAR', 30), ('FINAL', 60)], (40 * minuto, 0 * minuto))
+        igual = self.actividad_con_eventos(orden, '0020', [('INICIO', 0), ('FINAL', 45)], (45 * minuto, 0 * minuto))
+        incompleta = self.actividad_con_eventos(orden, '0030', [('INICIO', 0), ('PAUSA', 20)], (5 * minuto, 0 * minuto))
+        # Todo desde la bóveda offline: la bitácora "completa" dura ~0 s
+        offline = self.actividad_con_eventos(orden, '0040', [('INICIO', 0), ('PAUSA', 0), ('REANUDAR', 0), ('FINAL', 0)], (90 * minuto, 10 * minuto))
+        # INICIO en línea y el resto reenviado junto al volver la señal
+        mitad = self.actividad_con_eventos(orden, '0050', [('INICIO', 0), ('PAUSA', 120), ('REANUDAR', 120), ('FINAL', 120)], (70 * minuto, 30 * minuto))
+        actividades = Actividad.objects.filter(orden=orden)
+        antes = dict(actividades.values_list('pk', 'tiempo_real_acumulado'))
+
+        esperado = {'revisadas': 5, 'incompletas': 1, 'en_rafaga': 2, 'distintas': 1, 'actualizadas': 0}
+        self.assertEqual(recalcular_tiempos(actividades), esperado)
+        self.assertEqual(dict(actividades.values_list('pk', 'tiempo_real_acumulado')), antes)
+
+        self.assertEqual(recalcular_tiempos(actividades, aplicar=True), {**esperado, 'actualizadas': 1})
+        tiempos = {act.pk: (act.tiempo_real_acumulado, act.tiempo_pausas) for act in actividades}
+        self.assertEqual(tiempos[distinta.pk], (50 * minuto, 10 * minuto))
+        for act in (igual, incompleta, offline, mitad):
+            self.assertEqual(tiempos[act.pk][0], antes[act.pk])
+
+
+# ==========================================
+# AVISOS EN TIEMPO REAL (SSE)
+# ==========================================
+class AvisosTests(TestCase):
+    def test_avisos_por_cambio_y_senales(self):
+        from .avisos import avisos_por_cambio
+        from .models import AvisoOrden
+
+        def motivos(antes, despues):
+            return [(a.codigo_trabajador, a.motivo) for a in avisos_por_cambio(1, antes, despues)]
+
+        self.assertEqual(motivos(None, ('1001', 'BORRADOR')), [])
+        self.assertEqual(motivos(('1001', 'BORRADOR'), ('1001', 'PENDIENTE')), [('1001', 'ASIGNADA')])
+        self.assertEqual(motivos(('1001', 'PENDIENTE'), ('1001', 'PENDIENTE')), [('1001', 'MODIFICADA')])
+        self.assertEqual(motivos(('1001', 'PENDIENTE'), ('2002', 'PENDIENTE')), [('1001', 'REASIGNADA'), ('2002', 'ASIGNADA')])
+
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-AVISO', codigo_trabajador='1001', estado='BORRADOR')
+        orden.estado = 'PENDIENTE'
+        orden.save()
+        orden.delete()
+        self.assertEqual(list(AvisoOrden.objects.order_by('id').values_list('motivo', flat=True)), ['ASIGNADA', 'ELIMINADA'])
+
+    def test_cursor_no_pierde_avisos_de_un_lote_grande(self):
+        from unittest import mock
+        from . import avisos
+        from .models import AvisoOrden
+
+        cursor = avisos.CursorAvisos(avisos.ultimo_aviso_id())
+        AvisoOrden.objects.bulk_create([AvisoOrden(codigo_trabajador='1001', orden_id=i, motivo='ASIGNADA') for i in range(25)])
+        with mock.patch.object(avisos, 'LOTE_SONDEO', 10):
+            self.assertEqual([a['orden'] for a in cursor.nuevos()], list(range(25)))
+            self.assertEqual(cursor.nuevos(), [])
+
+        # Un id que se confirma tarde (hueco) llega en el sondeo siguiente
+        a, b, c = [AvisoOrden.objects.create(codigo_trabajador='2002', orden_id=100 + i, motivo='ASIGNADA') for i in range(3)]
+        hueco = b.pk
+        b.delete()
+        self.assertEqual([x['id'] for x in cursor.nuevos()], [a.pk, c.pk])
+        AvisoOrden.objects.create(id=hueco, codigo_trabajador='2002', orden_id=101, motivo='ASIGNADA')
+        self.assertEqual([x['id'] for x in cursor.nuevos()], [hueco])
+        self.assertEqual(cursor.nuevos(), [])
+
+
+# ==========================================
+# PROCESAMIENTO DE EVIDENCIAS FOTOGRÁFICAS
+# ==========================================
+class ImagenesTests(MediaTemporalMixin, TestCase):
+    def test_validar_imagen(self):
+        from unittest import mock
+        from . import imagenes
+
+        foto = SimpleUploadedFile('foto.jpg', imagen(), content_type='image/jpeg')
+        imagenes.validar_imagen(foto)
+        self.assertEqual(foto.tell(), 0)
+
+        for nombre, contenido in (('nota.jpg', b'no soy una foto'), ('anim.gif', imagen(tamano=(8, 8), formato='GIF'))):
+            with self.assertRaises(imagenes.ImagenInvalida):
+                imagenes.validar_imagen(SimpleUploadedFile(nombre, contenido))
+        with mock.patch.object(imagenes, 'PIXELES_MAXIMOS', 64 * 48 - 1), self.assertRaises(imagenes.ImagenInvalida):
+            imagenes.validar_imagen(foto)
+
+    def test_procesar_evidencia_gira_y_quita_exif(self):
+        from .imagenes import LADO_MAXIMO, LADO_MINIATURA, procesar_evidencia
+
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientación: girar 90° al mostrar
+        exif[0x0110] = 'Telefono X'
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-EXIF', codigo_trabajador='1001', estado='PENDIENTE')
+        self.assertEqual(self.subir_foto(orden, imagen('green', (4000, 2000), exif=exif)).status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_evidencia(Evidencia.objects.get())
+
+        evidencia = Evidencia.objects.get()
+        self.assertTrue(evidencia.procesada)
+        with Image.open(evidencia.foto.path) as procesada:
+            self.assertEqual(procesada.size, (LADO_MAXIMO // 2, LADO_MAXIMO))
+            self.assertEqual(dict(procesada.getexif()), {})
+        with Image.open(evidencia.miniatura.path) as miniatura:
+            self.assertEqual(max(miniatura.size), LADO_MINIATURA)
+
+    def test_falla_queda_registrada_sin_marcarla_procesada(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .archivo import archivables
+        from .imagenes import procesar_pendientes
+
+        hace_un_anio = timezone.now() - timedelta(days=400)
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-ROTA', codigo_trabajador='1001', estado='FINALIZADA', fecha_fin_real=hace_un_anio)
+        Evidencia.objects.create(orden=orden, foto='evidencias/no-existe.jpg')
+        with self.assertLogs('ordenes.imagenes', 'ERROR'):
+            self.assertEqual(procesar_pendientes(), 1)
+        self.assertEqual(procesar_pendientes(), 0)
+
+        evidencia = Evidencia.objects.get()
+        self.assertFalse(evidencia.procesada)
+        self.assertNotEqual(evidencia.error_procesamiento, '')
+        # La foto rota no va a cambiar de nombre: no impide archivar la orden
+        self.assertEqual(list(archivables(dias=365)), [orden])
+
+
+# ==========================================
+# SUBIDA DE FOTOS POR PARTES (REANUDABLE)
+# ==========================================
+class SubidasTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        import hashlib
+        from unittest import mock
+        from . import subidas
+
+        super().setUp()
+        buffer = BytesIO()
+        Image.effect_noise((200, 150), 64).convert('RGB').save(buffer, 'JPEG')
+        self.foto = buffer.getvalue()
+        self.sha256 = hashlib.sha256(self.foto).hexdigest()
+        self.orden = OrdenTrabajo.objects.create(numero_orden='OT-PARTES', codigo_trabajador='1001', estado='PENDIENTE')
+        self.client = APIClient()
+
+        parciales = mock.patch.object(subidas, 'DIRECTORIO_PARCIALES', f'{self.media}/subidas_tmp')
+        parciales.start()
+        self.addCleanup(parciales.stop)
+
+    def abrir(self, sha256=None):
+        respuesta = self.client.post('/api/evidencias/subidas/', {
+            'orden': self.orden.pk, 'nombre_archivo': 'foto.jpg', 'tamano_total': len(self.foto), 'sha256': sha256 or self.sha256,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        return f"/api/evidencias/subidas/{respuesta.data['id']}/"
+
+    def parte(self, url, inicio, fin):
+        return self.client.put(
+            url, self.foto[inicio:fin + 1], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {inicio}-{fin}/{len(self.foto)}',
+        )
+
+    def test_partes_en_orden_reanudar_y_finalizar(self):
+        url = self.abrir()
+        mitad = len(self.foto) // 2
+        respuesta = self.parte(url, mitad, len(self.foto) - 1)
+        self.assertEqual((respuesta.status_code, respuesta.data['recibidos']), (409, 0))
+
+        self.assertEqual(self.parte(url, 0, 999).data['recibidos'], 1000)
+        # Reintento solapado: solo se agrega lo que faltaba
+        self.assertEqual(self.parte(url, 500, mitad - 1).data['recibidos'], mitad)
+        self.assertEqual(self.client.get(url).data['recibidos'], mitad)
+        self.assertEqual(self.client.post(f'{url}finalizar/').status_code, 409)
+
+        self.assertEqual(self.parte(url, mitad, len(self.foto) - 1).data['recibidos'], len(self.foto))
+        respuesta = self.client.post(f'{url}finalizar/')
+        self.assertEqual(respuesta.status_code, 201)
+        evidencia = Evidencia.objects.get()
+        with evidencia.foto.open('rb') as archivo:
+            self.assertEqual(archivo.read(), self.foto)
+        # Reintento del paso final: la misma evidencia
+        self.assertEqual(self.client.post(f'{url}finalizar/').data['id'], respuesta.data['id'])
+        self.assertEqual(Evidencia.objects.count(), 1)
+
+    def test_sha256_distinto_reinicia_la_subida(self):
+        url = self.abrir(sha256='0' * 64)
+        self.parte(url, 0, len(self.foto) - 1)
+        respuesta = self.client.post(f'{url}finalizar/')
+        self.assertEqual((respuesta.status_code, respuesta.data['recibidos']), (422, 0))
+        self.assertEqual(self.client.get(url).data['recibidos'], 0)
+        self.assertFalse(Evidencia.objects.exists())
+
+
+# ==========================================
+# FOTOS POR CONTENIDO (SIN DUPLICADOS)
+# ==========================================
+class AlmacenFotosTests(MediaTemporalMixin, TestCase):
+    def test_misma_foto_se_guarda_una_vez(self):
+        from .models import ArchivoFoto
+
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-FOTO', codigo_trabajador='1001', estado='PENDIENTE')
+        for _ in range(2):
+            self.assertEqual(self.subir_foto(orden).status_code, 201)
+
+        blob = ArchivoFoto.objects.get()
+        self.assertEqual(blob.referencias, 2)
+        self.assertEqual(set(Evidencia.objects.values_list('foto', flat=True)), {blob.archivo.name})
+
+        ruta = blob.archivo.path
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.first().delete()
+        self.assertTrue(os.path.exists(ruta))
+        with self.captureOnCommitCallbacks(execute=True):
+            Evidencia.objects.first().delete()
+        self.assertFalse(ArchivoFoto.objects.exists())
+        self.assertFalse(os.path.exists(ruta))
+
+
+# ==========================================
+# /media/ CON PERMISOS (X-ACCEL-REDIRECT)
+# ==========================================
+class MediosTests(MediaTemporalMixin, TestCase):
+    def test_sin_control_la_app_ve_las_fotos(self):
+        from urllib.parse import urlsplit
+
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-MEDIA', codigo_trabajador='1001', estado='PENDIENTE')
+        client = APIClient()
+        self.subir_foto(orden, imagen('blue'), client)
+        # Como la App publicada: API sin "Authorization" y la foto con Image.network
+        url = urlsplit(client.get('/api/evidencias/').data[0]['foto'])
+        self.assertEqual(url.query, '')
+        self.assertEqual(client.get(url.path).status_code, 200)
+        self.assertEqual(client.get('/media/subidas_tmp/x.part').status_code, 404)
+
+    @override_settings(MEDIA_PROTEGIDO=True)
+    def test_foto_solo_con_firma_o_token(self):
+        from unittest import mock
+        from urllib.parse import urlsplit
+        from django.contrib.auth.models import User
+        from rest_framework.authtoken.models import Token
+        from . import medios
+
+        contenido = imagen('blue')
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-MEDIA', codigo_trabajador='1001', estado='PENDIENTE')
+        duenio = Token.objects.create(user=User.objects.create_user('1001', password='x'))
+        otro = Token.objects.create(user=User.objects.create_user('2002', password='x'))
+        client = APIClient()
+        respuesta = self.subir_foto(orden, contenido, client, HTTP_AUTHORIZATION=f'Token {duenio.key}')
+        url = urlsplit(respuesta.data['foto'])
+
+        respuesta = client.get(f'{url.path}?{url.query}')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(b''.join(respuesta.streaming_content), contenido)
+        self.assertEqual(client.get(url.path).status_code, 403)
+        self.assertEqual(client.get(f'{url.path}?{url.query}x').status_code, 403)
+
+        # Sin credenciales (u otro operario) la API no entrega una URL que se pueda abrir
+        for extra in ({}, {'HTTP_AUTHORIZATION': f'Token {otro.key}'}):
+            anonima = urlsplit(client.get('/api/evidencias/', **extra).data[0]['foto'])
+            self.assertEqual(anonima.query, '')
+            self.assertEqual(client.get(anonima.path).status_code, 403)
+
+        self.assertEqual(client.get(url.path, HTTP_AUTHORIZATION=f'Token {otro.key}').status_code, 403)
+        with mock.patch.object(medios, 'PREFIJO_INTERNO', '/protegido/'):
+            respuesta = client.get(url.path, HTTP_AUTHORIZATION=f'Token {duenio.key}')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['X-Accel-Redirect'], '/protegido/' + url.path[len('/media/'):])
+        self.assertEqual(client.get('/media/subidas_tmp/x.part', HTTP_AUTHORIZATION=f'Token {duenio.key}').status_code, 404)
+
+
+# ==========================================
+# TOKENS CON CACHÉ (CAMBIO DE TURNO)
+# ==========================================
+class TokenCacheadoTests(TestCase):
+    def test_reanudar_sin_contrasena_y_revocar(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from rest_framework.authtoken.models import Token
+
+        cache.clear()
+        user = User.objects.create_user('1001', password='secreta-123')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        respuesta = client.post('/api/login-operario/', {'codigo': '1001'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['token'], token.key)
+        # Segunda vez: el usuario sale de la caché, sin consultas
+        with self.assertNumQueries(0):
+            self.assertEqual(client.post('/api/login-operario/', {'codigo': '1001'}, format='json').status_code, 200)
+
+        # Token borrado: ya no reanuda, pero con contraseña se sigue entrando
+        token.delete()
+        self.assertEqual(client.post('/api/login-operario/', {'codigo': '1001'}, format='json').status_code, 400)
+        respuesta = client.post('/api/login-operario/', {'codigo': '1001', 'password': 'secreta-123'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta.data['token'], token.key)
+
+        # El token borrado tampoco bloquea las vistas abiertas: la petición sigue como anónima
+        self.assertEqual(client.get('/api/ordenes/').status_code, 200)
+        self.assertEqual(client.post('/api/asignaciones/', {}, format='json').status_code, 401)
+
+
+# ==========================================
+# ASIGNACIÓN Y APROBACIÓN MASIVA
+# ==========================================
+class AsignacionMasivaTests(TestCase):
+    def test_consultas_constantes_y_avisos(self):
+        from django.contrib.auth.models import User
+        from .models import AvisoOrden, Eliminacion
+
+        User.objects.create_user('2002', password='x')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('planificador', password='x', is_staff=True))
+
+        def aprobar(cantidad, inicio):
+            ordenes = [
+                OrdenTrabajo.objects.create(numero_orden=f'AS-{i}', codigo_trabajador='1001', estado='BORRADOR')
+                for i in range(inicio, inicio + cantidad)
+            ]
+            datos = {'aprobar': True, 'ordenes': [
+                {'numero_orden': o.numero_orden, 'codigo_trabajador': '2002'} if i % 2 else {'id': o.pk}
+                for i, o in enumerate(ordenes)
+            ]}
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = client.post('/api/asignaciones/', datos, format='json')
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta.data, {'ordenes': cantidad, 'reasignadas': cantidad // 2, 'aprobadas': cantidad})
+            return len(consultas)
+
+        self.assertEqual(aprobar(4, 0), aprobar(40, 100))
+        self.assertFalse(OrdenTrabajo.objects.filter(estado='BORRADOR').exists())
+        self.assertEqual(OrdenTrabajo.objects.filter(codigo_trabajador='2002').count(), 22)
+        self.assertEqual(Eliminacion.objects.count(), 22)
+        self.assertEqual(AvisoOrden.objects.filter(codigo_trabajador='2002', motivo='ASIGNADA').count(), 22)
+        self.assertEqual(AvisoOrden.objects.filter(codigo_trabajador='1001', motivo='ASIGNADA').count(), 22)
+
+        # Un código desconocido o de un tipo que no es texto/número: no cambia nada
+        orden = OrdenTrabajo.objects.create(numero_orden='AS-X', codigo_trabajador='1001', estado='BORRADOR')
+        for codigo in ('9999', 9999, ['2002'], True):
+            respuesta = client.post('/api/asignaciones/', {'aprobar': True, 'ordenes': [{'id': orden.pk, 'codigo_trabajador': codigo}]}, format='json')
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn('errores', respuesta.data)
+        orden.refresh_from_db()
+        self.assertEqual((orden.codigo_trabajador, orden.estado), ('1001', 'BORRADOR'))
+
+        # Un código numérico válido se acepta como texto
+        respuesta = client.post('/api/asignaciones/', {'ordenes': [{'id': orden.pk, 'codigo_trabajador': 2002}]}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        orden.refresh_from_db()
+        self.assertEqual(orden.codigo_trabajador, '2002')
+
+
+# ==========================================
+# ADMIN: CONTEO ESTIMADO Y DETALLE POR PÁGINAS
+# ==========================================
+class AdminPaginadoTests(TestCase):
+    def test_supervisor_lo_asigna_un_planificador_sin_superusuario(self):
+        from django.contrib.auth.models import User
+
+        supervisor = User.objects.create_user('jefe', password='x')
+        orden = OrdenTrabajo.objects.create(numero_orden='OT-SUP', codigo_trabajador='1001', estado='PENDIENTE')
+        client = APIClient()
+        client.force_login(User.objects.create_user('planificador', password='x', is_staff=True))
+        url = f'/admin/ordenes/ordenpendiente/{orden.pk}/change/'
+
+        respuesta = client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'name="supervisor"')
+        self.assertNotContains(respuesta, 'admin-autocomplete')
+        datos = {
+            'numero_orden': orden.numero_orden, 'codigo_trabajador': '1001', 'prioridad': orden.prioridad,
+            'estado': orden.estado, 'actividades_finalizadas': 0, 'supervisor': supervisor.pk,
+        }
+        for prefijo in ('actividades', 'evidencias'):
+            datos.update({f'{prefijo}-TOTAL_FORMS': 0, f'{prefijo}-INITIAL_FORMS': 0})
+        self.assertEqual(client.post(url, datos).status_code, 302)
+        orden.refresh_from_db()
+        self.assertEqual(orden.supervisor, supervisor)
+
+    def test_conteo_estimado_solo_con_tablas_grandes(self):
+        from unittest import mock
+        from . import paginacion
+
+        crear_ordenes(3, 0)
+        ordenes = OrdenTrabajo.objects.order_by('id')
+        # SQLite no tiene EXPLAIN (FORMAT JSON): cuenta exacto
+        self.assertIsNone(paginacion.conteo_estimado(ordenes))
+        self.assertEqual(paginacion.PaginadorEstimado(ordenes, 2).count, 3)
+        with mock.patch.object(paginacion, 'conteo_estimado', return_value=paginacion.UMBRAL_CONTEO_EXACTO * 5):
+            paginador = paginacion.PaginadorEstimado(ordenes, 2)
+            self.assertEqual(paginador.count, paginacion.UMBRAL_CONTEO_EXACTO * 5)
+            self.assertEqual(len(paginador.page(2).object_list), 1)
+        with mock.patch.object(paginacion, 'conteo_estimado', return_value=paginacion.UMBRAL_CONTEO_EXACTO - 1):
+            self.assertEqual(paginacion.PaginadorEstimado(ordenes, 2).count, 3)
+
+    def test_detalle_por_paginas_conserva_los_filtros(self):
+        from django.contrib.auth.models import User
+        from .admin import POR_PAGINA_DETALLE
+
+        crear_ordenes(1, POR_PAGINA_DETALLE + 5)
+        OrdenTrabajo.objects.update(estado='FINALIZADA')
+        orden = OrdenTrabajo.objects.get()
+        client = APIClient()
+        client.force_login(User.objects.create_superuser('planificador', password='x'))
+        url = f'/admin/ordenes/ordenhistorial/{orden.pk}/change/'
+
+        for pagina, esperadas in ((1, POR_PAGINA_DETALLE), (2, 5), (3, 0)):
+            respuesta = client.get(url, {'pagina': pagina, '_changelist_filters': 'estado=FINALIZADA'})
+            self.assertEqual(respuesta.status_code, 200)
+            actividades = next(f for f in respuesta.context['inline_admin_formsets'] if f.opts.model is Actividad)
+            self.assertEqual(len(actividades.formset.forms), esperadas)
+        self.assertContains(respuesta, 'href="?pagina=2&amp;_changelist_filters=estado%3DFINALIZADA"')
+
+
+# ==========================================
+# BÚSQUEDA DE ÓRDENES
+# ==========================================
+class BusquedaTests(TestCase):
+    def test_relevancia_y_paginas(self):
+        OrdenTrabajo.objects.create(numero_orden='4000100', descripcion='Cambio de sello', equipo='BOMBA-01', estado='PENDIENTE')
+        otra = OrdenTrabajo.objects.create(numero_orden='4000200', descripcion='Inspección general', estado='PENDIENTE')
+        Actividad.objects.create(orden=otra, codigo_operacion='0010', descripcion='Revisar bomba de vapor')
+        OrdenTrabajo.objects.create(numero_orden='4000300', descripcion='Pintura', estado='FINALIZADA')
+        client = APIClient()
+
+        respuesta = client.get('/api/buscar/', {'q': 'bomba'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual({r['numero_orden'] for r in respuesta.data['resultados']}, {'4000100', '4000200'})
+
+        respuesta = client.get('/api/buscar/', {'q': '4000300'})
+        self.assertEqual(respuesta.data['resultados'][0]['numero_orden'], '4000300')
+
+        respuesta = client.get('/api/buscar/', {'q': '40003', 'estado': 'PENDIENTE'})
+        self.assertEqual(respuesta.data['resultados'], [])
+
+        # Las operaciones se buscan solo dentro de las órdenes filtradas, no en toda la tabla
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = client.get('/api/buscar/', {'q': 'vapor', 'estado': 'PENDIENTE'})
+        self.assertEqual([r['numero_orden'] for r in respuesta.data['resultados']], ['4000200'])
+        self.assertTrue(any('"orden_id" IN (SELECT' in c['sql'] for c in consultas.captured_queries))
+
+        respuesta = client.get('/api/buscar/', {'q': '4000', 'por_pagina': 2})
+        self.assertTrue(respuesta.data['hay_mas'])
+        respuesta = client.get('/api/buscar/', {'q': '4000', 'por_pagina': 2, 'pagina': 2})
+        self.assertEqual(len(respuesta.data['resultados']), 1)
+        self.assertFalse(respuesta.data['hay_mas'])
+
+
+# ==========================================
+# HISTORIAL ARCHIVADO
+# ==========================================
+class ArchivoOrdenesTests(MediaTemporalMixin, TestCase):
+    def test_archiva_orden_vieja_con_fotos(self):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from openpyxl import load_workbook
+        from .archivo import archivar_ordenes
+        from .exportacion import generar_reporte_cierre
+        from .imagenes import procesar_pendientes
+        from .models import ArchivoFoto, Eliminacion, OrdenArchivada, ActividadArchivada, EvidenciaArchivada
+
+        hace_un_anio = timezone.now() - timedelta(days=400)
+        vieja = OrdenTrabajo.objects.create(numero_orden='OT-VIEJA', codigo_trabajador='1001', estado='FINALIZADA')
+        nueva = OrdenTrabajo.objects.create(numero_orden='OT-NUEVA', codigo_trabajador='1001', estado='FINALIZADA', fecha_fin_real=timezone.now())
+        actividad = Actividad.objects.create(orden=vieja, codigo_operacion='0010', descripcion='Cambiar sello', finished=True, fecha_fin_real=hace_un_anio)
+        for evento in ('INICIO', 'PAUSA', 'REANUDAR', 'FINAL'):
+            BitacoraActividad.objects.create(actividad=actividad, evento=evento)
+        OrdenTrabajo.objects.filter(pk=vieja.pk).update(fecha_fin_real=hace_un_anio)
+
+        respuesta = self.subir_foto(vieja, imagen('blue'), actividad=actividad)
+        self.assertEqual(respuesta.status_code, 201)
+        # Con la foto sin procesar todavía no se archiva
+        self.assertEqual(archivar_ordenes(dias=365), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            procesar_pendientes()
+
+        self.assertEqual(archivar_ordenes(dias=365), 1)
+        self.assertEqual(list(OrdenTrabajo.objects.values_list('pk', flat=True)), [nueva.pk])
+        self.assertFalse(Actividad.objects.exists() or BitacoraActividad.objects.exists() or Evidencia.objects.exists())
+        self.assertTrue(Eliminacion.objects.filter(modelo='ORDEN', objeto_id=vieja.pk).exists())
+
+        archivada = OrdenArchivada.objects.get(pk=vieja.pk)
+        self.assertEqual(archivada.mes, timezone.localdate(hace_un_anio).replace(day=1))
+        self.assertEqual([e['evento'] for e in ActividadArchivada.objects.get(pk=actividad.pk).bitacora], ['INICIO', 'PAUSA', 'REANUDAR', 'FINAL'])
+        # La foto sigue en disco: la referencia la evidencia archivada
+        blob = ArchivoFoto.objects.get()
+        self.assertEqual(EvidenciaArchivada.objects.get().archivo, blob)
+        self.assertTrue(os.path.exists(blob.archivo.path))
+
+        admin = APIClient()
+        admin.force_login(User.objects.create_user('planificador', password='x', is_staff=True))
+        self.assertRedirects(
+            admin.get(f'/admin/ordenes/ordenhistorial/{vieja.pk}/change/'),
+            f'/admin/ordenes/ordenarchivada/{vieja.pk}/change/',
+        )
+        self.assertContains(admin.get(f'/admin/ordenes/ordenarchivada/{vieja.pk}/change/'), 'REANUDAR')
+        self.assertContains(admin.get('/admin/ordenes/ordenarchivada/', {'q': 'VIEJA'}), 'OT-VIEJA')
+
+        libro = load_workbook(generar_reporte_cierre(OrdenArchivada.objects.all()))
+        filas = list(libro.active.iter_rows(min_row=2, values_only=True))
+        self.assertEqual([(f[0], f[1]) for f in filas], [('OT-VIEJA', '0010')])
@@ -0,0 +1,43 @@
+import re
+from datetime import timedelta
+
+# ==========================================
+# TIEMPOS DE ACTIVIDAD
+# En la base de datos son duraciones (interval); la App los manda y los lee como
+# "HH:MM:SS". Los datos viejos llegaron además como str(timedelta) ("1 day, 2:03:04")
+# o microsegundos crudos, así que la lectura acepta todas esas formas.
+# ==========================================
+PATRON_TIMEDELTA = re.compile(r'^(?:(?P<dias>-?\d+) days?, )?(?P<horas>\d+):(?P<minutos>\d{1,2}):(?P<segundos>\d{1,2})(?:\.\d+)?$')
+
+
+def _segundos(valor):
+    if isinstance(valor, timedelta):
+        return int(valor.total_seconds())
+    texto = str(valor).strip()
+    if texto.isdigit():
+        return int(texto) // 1000000
+    match = PATRON_TIMEDELTA.match(texto)
+    if not match:
+        return None
+    dias = int(match['dias'] or 0)
+    return dias * 86400 + int(match['horas']) * 3600 + int(match['minutos']) * 60 + int(match['segundos'])
+
+
+def a_segundos(valor):
+    if not valor:
+        return 0
+    return _segundos(valor) or 0
+
+
+def duracion_desde_texto(valor):
+    # None si el texto no es un tiempo reconocible (para devolver 400 en la API)
+    if valor in (None, ''):
+        return timedelta(0)
+    segundos = _segundos(valor)
+    return None if segundos is None else timedelta(seconds=segundos)
+
+
+def a_hhmmss(segundos):
+    horas, rem = divmod(int(segundos or 0), 3600)
+    minutos, segundos = divmod(rem, 60)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
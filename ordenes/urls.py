@@ -8,7 +8,13 @@ from .views import (
     login_operario, 
     login_admin,
     login_app,
-    registro_app
+    registro_app,
+    sincronizar,
+    procesar_lote,
+    analitica,
+    eventos_ordenes,
+    asignaciones,
+    buscar
 )
 
 router = DefaultRouter()
@@ -26,4 +32,10 @@ urlpatterns = [
     path('login-admin/', login_admin, name='login_admin'),
     path('login-app/', login_app, name='api_login'),
     path('registro-app/', registro_app, name='api_registro'),
+    path('sync/', sincronizar, name='api_sync'),
+    path('lote/', procesar_lote, name='api_lote'),
+    path('analitica/', analitica, name='api_analitica'),
+    path('eventos/', eventos_ordenes, name='api_eventos'),
+    path('asignaciones/', asignaciones, name='api_asignaciones'),
+    path('buscar/', buscar, name='api_buscar'),
 ]   
\ No newline at end of file
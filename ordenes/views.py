@@ -1,31 +1,57 @@
+from datetime import timedelta
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from datetime import timedelta
 from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
-from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
+from .models import OrdenTrabajo, Actividad, BitacoraActividad, Evidencia, SubidaEvidencia
 from .serializers import (
     OrdenTrabajoSerializer, 
     ActividadSerializer, 
     BitacoraSerializer, 
     UserSerializer,
-    EvidenciaSerializer
+    EvidenciaSerializer,
+    OrdenTrabajoResumenSerializer,
+    ActividadResumenSerializer,
+    SubidaEvidenciaSerializer
 )
+from .filtros import filtrar_ordenes, FiltroInvalido
+from .condicional import RespuestaCondicionalMixin
+from .operaciones import finalizar_orden, finalizar_actividad
+from .lote import ejecutar_lote, MAX_OPERACIONES_LOTE
+from .sincronizacion import cambios_desde, pagina_completa, leer_cursor, leer_continuacion, CursorInvalido
+from .analitica import indicadores_cacheados, ParametroInvalido
+from .linea_tiempo import lineas_de_tiempo
+from .avisos import flujo_eventos
+from .subidas import estado_subida, recibir_parte, finalizar_subida, cancelar_subida, ErrorSubida
+from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from . import medios
+from .autenticacion import sesion_por_token, buscar_usuario
+from .busqueda import buscar_ordenes
+from .asignacion import asignar_ordenes, ids_por_numero, AsignacionInvalida, MAX_ORDENES_ASIGNACION
+from .tiempos import a_segundos, a_hhmmss
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@authentication_classes([])  # un token viejo en el header no debe impedir entrar con contraseña
 def login_app(request):
     username = request.data.get('codigo_trabajador') 
     password = request.data.get('password')
     
-    user = authenticate(username=username, password=password)
+    # Reanudación: el dispositivo ya tiene un token válido de este usuario, no se repite PBKDF2
+    user, token = sesion_por_token(request)
+    if user is None or user.username != username:
+        user, token = authenticate(username=username, password=password), None
     
     if user is not None:
-        token, _ = Token.objects.get_or_create(user=user)
+        if token is None:
+            token, _ = Token.objects.get_or_create(user=user)
         return Response({
             'token': token.key,
             'nombre': user.first_name if user.first_name else user.username,
@@ -57,69 +83,330 @@ def registro_app(request):
 
 # --- VISTAS ESTÁNDAR ---
 
-class OrdenTrabajoViewSet(viewsets.ModelViewSet):
+class OrdenTrabajoViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
     queryset = OrdenTrabajo.objects.all().order_by('-id')
     serializer_class = OrdenTrabajoSerializer
+    hijos_version = (
+        (Actividad, 'orden'),
+        (BitacoraActividad, 'actividad__orden'),
+        (Evidencia, 'orden'),
+    )
+    campos_version = ('tiempo_total', 'tiempo_pausas_total', 'actividades_finalizadas')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filtrar_ordenes(queryset, self.request.query_params)
+        if self.get_serializer_class() is OrdenTrabajoSerializer:
+            # Todo el árbol (actividades -> bitácora/evidencias) en un número fijo de consultas
+            queryset = queryset.prefetch_related(
+                'evidencias',
+                'actividades__bitacora',
+                Prefetch('actividades__evidencia_set', queryset=Evidencia.objects.select_related('orden')),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        # ?vista=resumen -> listado liviano sin actividades/bitácora/evidencias.
+        # Sin el parámetro se mantiene el árbol completo para las versiones viejas de la App.
+        if self.action == 'list' and self.request.query_params.get('vista') == 'resumen':
+            return OrdenTrabajoResumenSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except FiltroInvalido as e:
+            return Response({"error": str(e)}, status=400)
     
     @action(detail=True, methods=['post'])
     def finalizar(self, request, pk=None):
         orden = self.get_object()
-        orden.estado = 'FINALIZADA'
-        orden.save()
-        return Response({'status': 'orden finalizada', 'estado': 'FINALIZADA'})
+        return Response(finalizar_orden(orden))
+
+    @action(detail=True, methods=['get'], url_path='linea-tiempo')
+    def linea_tiempo(self, request, pk=None):
+        # Tramos ACTIVO/PAUSA de todas las actividades de la orden según la bitácora
+        orden = self.get_object()
+        return Response(respuesta_lineas_de_tiempo(orden.actividades.all()))
 
-class ActividadViewSet(viewsets.ModelViewSet):
-    queryset = Actividad.objects.all()
+class ActividadViewSet(RespuestaCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Actividad.objects.all().prefetch_related(
+        'bitacora', Prefetch('evidencia_set', queryset=Evidencia.objects.select_related('orden')),
+    )
     serializer_class = ActividadSerializer
+    hijos_version = (
+        (BitacoraActividad, 'actividad'),
+        (Evidencia, 'actividad'),
+    )
 
     @action(detail=True, methods=['post', 'patch'])
     def finalizar(self, request, pk=None):
         try:
             actividad = self.get_object()
-            
-            fecha_inicio = request.data.get('fecha_inicio_real')
-            fecha_fin = request.data.get('fecha_fin_real')
-            if fecha_inicio: actividad.fecha_inicio_real = fecha_inicio
-            if fecha_fin: actividad.fecha_fin_real = fecha_fin
-                
-            tiempo_total = request.data.get('tiempo_total') or request.data.get('tiempo_real_acumulado')
-            if tiempo_total:
-                horas, minutos, segundos = map(int, str(tiempo_total).split(':'))
-                actividad.tiempo_real_acumulado = timedelta(hours=horas, minutes=minutos, seconds=segundos)
-                
-            tiempo_pausas = request.data.get('tiempo_pausas')
-            if tiempo_pausas:
-                horas_p, minutos_p, segundos_p = map(int, str(tiempo_pausas).split(':'))
-                actividad.tiempo_pausas = timedelta(hours=horas_p, minutes=minutos_p, seconds=segundos_p)
-                
-            ejecutor = request.data.get('nombre_ejecutor')
-            if ejecutor: actividad.nombre_ejecutor = ejecutor
-
-            notas = request.data.get('notas_operario')
-            if notas: actividad.notas_operario = notas
-                
-            actividad.finished = True
-            actividad.en_progreso = False
-            
-            actividad.save() 
-            
-            return Response({"mensaje": "¡Operación finalizada y tiempos registrados correctamente!"}, status=200)
+            return Response(finalizar_actividad(actividad, request.data), status=200)
             
         except Exception as e:
             return Response({"Error Interno de Python": str(e)}, status=400)
 
+    @action(detail=True, methods=['get'], url_path='linea-tiempo')
+    def linea_tiempo(self, request, pk=None):
+        actividad = self.get_object()
+        return Response(respuesta_lineas_de_tiempo(Actividad.objects.filter(pk=actividad.pk))[0])
+
+
+def respuesta_lineas_de_tiempo(actividades):
+    registrados = {
+        pk: (activo, pausa)
+        for pk, activo, pausa in actividades.values_list('pk', 'tiempo_real_acumulado', 'tiempo_pausas')
+    }
+    lineas = dict(lineas_de_tiempo(actividades))
+    respuesta = []
+    for pk, (activo, pausa) in sorted(registrados.items()):
+        linea = lineas.get(pk) or {'tramos': [], 'tiempo_activo': timedelta(0), 'tiempo_pausas': timedelta(0), 'completa': False, 'anomalias': []}
+        respuesta.append({
+            'actividad': pk,
+            'completa': linea['completa'],
+            'anomalias': linea['anomalias'],
+            'tramos': linea['tramos'],
+            'tiempo_activo': a_hhmmss(a_segundos(linea['tiempo_activo'])),
+            'tiempo_pausas': a_hhmmss(a_segundos(linea['tiempo_pausas'])),
+            # Lo que mandó la App al finalizar, para comparar
+            'tiempo_activo_registrado': a_hhmmss(a_segundos(activo)),
+            'tiempo_pausas_registrado': a_hhmmss(a_segundos(pausa)),
+        })
+    return respuesta
+
 class EvidenciaViewSet(viewsets.ModelViewSet):
-    queryset = Evidencia.objects.all()
+    # La orden se usa para decidir si se firman las URLs de las fotos
+    queryset = Evidencia.objects.all().select_related('orden')
     serializer_class = EvidenciaSerializer
     permission_classes = [AllowAny] 
+
+    # --- Subida por partes (reanudable); el POST de una sola vez sigue funcionando ---
+
+    @action(detail=False, methods=['post'], url_path='subidas', url_name='subidas')
+    def abrir_subida(self, request):
+        serializer = SubidaEvidenciaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(estado_subida(serializer.save()), status=201)
+
+    @action(detail=False, methods=['get', 'put', 'delete'], url_path=r'subidas/(?P<subida_id>[0-9a-f-]{36})', url_name='subida')
+    def subida(self, request, subida_id=None):
+        subida = get_object_or_404(SubidaEvidencia, pk=subida_id)
+        if request.method == 'GET':
+            return Response(estado_subida(subida))
+        if request.method == 'DELETE':
+            cancelar_subida(subida)
+            return Response(status=204)
+
+        largo = request.META.get('CONTENT_LENGTH')
+        try:
+            # request.stream: el cuerpo se lee del socket por bloques, nunca entero en memoria
+            return Response(recibir_parte(subida.pk, request.headers.get('Content-Range'), int(largo) if largo else None, request.stream))
+        except ErrorSubida as e:
+            return Response({'error': str(e), 'recibidos': e.recibidos}, status=e.status)
+
+    @action(detail=False, methods=['post'], url_path=r'subidas/(?P<subida_id>[0-9a-f-]{36})/finalizar', url_name='subida-finalizar')
+    def completar_subida(self, request, subida_id=None):
+        get_object_or_404(SubidaEvidencia, pk=subida_id)
+        try:
+            subida = finalizar_subida(subida_id)
+        except ErrorSubida as e:
+            return Response({'error': str(e), 'recibidos': e.recibidos}, status=e.status)
+        return Response(EvidenciaSerializer(subida.evidencia, context={'request': request}).data, status=201)
     
 class BitacoraViewSet(viewsets.ModelViewSet):
     queryset = BitacoraActividad.objects.all()
     serializer_class = BitacoraSerializer
 
+# --- SINCRONIZACIÓN INCREMENTAL ---
+
+@api_view(['GET'])
+def sincronizar(request):
+    # GET /api/sync/?trabajador=<codigo>&cursor=<cursor anterior>
+    # Sin cursor devuelve todo lo del operario; con cursor, solo lo que cambió.
+    # La App debe aplicar primero "eliminados" y luego hacer upsert del resto.
+    # Sync completa por páginas: ?paginar=1 y después ?continuar=<"continuar" de la respuesta>
+    # hasta que venga null; recién ahí la App reemplaza su caché y guarda el cursor.
+    codigo = (request.query_params.get('trabajador') or '').strip()
+    if not codigo:
+        return Response({"error": "El parámetro 'trabajador' es requerido"}, status=400)
+
+    try:
+        cursor = leer_cursor(request.query_params.get('cursor'))
+        continuacion = leer_continuacion(request.query_params.get('continuar'))
+    except CursorInvalido:
+        return Response({"error": "Cursor inválido, sincroniza de nuevo sin cursor"}, status=400)
+
+    if cursor is None and (continuacion or request.query_params.get('paginar') == '1'):
+        cambios = pagina_completa(codigo, continuacion)
+    else:
+        cambios = cambios_desde(codigo, cursor)
+    contexto = {'request': request}
+    return Response({
+        'cursor': cambios['cursor'].isoformat(),
+        'completo': cursor is None,
+        'continuar': cambios.get('continuar'),
+        'ordenes': OrdenTrabajoResumenSerializer(cambios['ordenes'], many=True, context=contexto).data,
+        'actividades': ActividadResumenSerializer(cambios['actividades'], many=True, context=contexto).data,
+        'bitacora': BitacoraSerializer(cambios['bitacora'], many=True, context=contexto).data,
+        'evidencias': EvidenciaSerializer(cambios['evidencias'], many=True, context=contexto).data,
+        'eliminados': [
+            {'modelo': modelo, 'id': objeto_id}
+            for modelo, objeto_id in cambios['eliminados'].values_list('modelo', 'objeto_id')
+        ],
+    })
+
+# --- BÚSQUEDA DE ÓRDENES ---
+
+@api_view(['GET'])
+def buscar(request):
+    # GET /api/buscar/?q=bomba vapor&pagina=1&por_pagina=25 (+ los filtros de /api/ordenes/: trabajador, estado, fechas)
+    # Resultados de más a menos relevantes; sin COUNT(*): "hay_mas" dice si existe otra página.
+    termino = (request.query_params.get('q') or '').strip()
+    if len(termino) < 2:
+        return Response({"error": "El parámetro 'q' necesita al menos 2 caracteres"}, status=400)
+    try:
+        pagina = max(int(request.query_params.get('pagina', 1)), 1)
+        por_pagina = min(max(int(request.query_params.get('por_pagina', 25)), 1), 100)
+    except ValueError:
+        return Response({"error": "pagina y por_pagina deben ser números"}, status=400)
+
+    try:
+        ordenes = buscar_ordenes(termino, filtrar_ordenes(OrdenTrabajo.objects.all(), request.query_params))
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=400)
+    inicio = (pagina - 1) * por_pagina
+    filas = list(ordenes[inicio:inicio + por_pagina + 1])
+    resultados = []
+    for orden, datos in zip(filas[:por_pagina], OrdenTrabajoResumenSerializer(filas[:por_pagina], many=True).data):
+        datos['relevancia'] = round(orden.relevancia, 4)
+        resultados.append(datos)
+    return Response({
+        'q': termino,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'hay_mas': len(filas) > por_pagina,
+        'resultados': resultados,
+    })
+
+# --- ASIGNACIÓN Y APROBACIÓN MASIVA (SCRIPTS DE PLANIFICACIÓN) ---
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def asignaciones(request):
+    # POST /api/asignaciones/ {"aprobar": true, "ordenes": [{"numero_orden": "4000123", "codigo_trabajador": "1001"}, {"id": 7}]}
+    # Cada orden va por id o numero_orden; sin "codigo_trabajador" conserva el operario, con null queda sin asignar.
+    # Todo o nada (ver ordenes/asignacion.py).
+    ordenes = request.data.get('ordenes')
+    if not isinstance(ordenes, list) or not all(isinstance(o, dict) for o in ordenes):
+        return Response({"error": "Se esperaba una lista de objetos en 'ordenes'"}, status=400)
+    if len(ordenes) > MAX_ORDENES_ASIGNACION:
+        return Response({"error": f"Máximo {MAX_ORDENES_ASIGNACION} órdenes por petición"}, status=400)
+
+    numeros = ids_por_numero([str(o['numero_orden']) for o in ordenes if 'id' not in o and o.get('numero_orden')])
+    ids, codigos, errores = [], {}, []
+    for o in ordenes:
+        pk = o.get('id') or numeros.get(str(o.get('numero_orden')))
+        if pk is None:
+            errores.append(f"Orden no encontrada: {o.get('numero_orden') or o}")
+            continue
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            errores.append(f"id inválido: {o.get('id')}")
+            continue
+        ids.append(pk)
+        if 'codigo_trabajador' in o:
+            codigo = o['codigo_trabajador']
+            if isinstance(codigo, bool) or not isinstance(codigo, (str, int, type(None))):
+                errores.append(f"codigo_trabajador inválido en la orden {o.get('numero_orden') or pk}: {codigo!r}")
+                continue
+            codigos[pk] = codigo
+    if errores:
+        return Response({"errores": errores}, status=400)
+
+    try:
+        resumen = asignar_ordenes(ids, codigos, aprobar=bool(request.data.get('aprobar')))
+    except AsignacionInvalida as e:
+        return Response({"errores": e.errores}, status=400)
+    return Response(resumen, status=200)
+
+# --- AVISOS EN TIEMPO REAL (SSE, SERVIDO POR ASGI) ---
+
+async def eventos_ordenes(request):
+    # GET /api/eventos/?trabajador=<codigo>  (text/event-stream)
+    # Cada evento "orden" trae {orden, motivo}; la App responde llamando a /api/sync/.
+    # Al reconectar, el header Last-Event-ID (o ?ultimo=) reenvía lo que se perdió.
+    codigo = (request.GET.get('trabajador') or '').strip()
+    if not codigo:
+        return JsonResponse({"error": "El parámetro 'trabajador' es requerido"}, status=400)
+    ultimo = request.headers.get('Last-Event-ID') or request.GET.get('ultimo')
+    try:
+        ultimo = int(ultimo) if ultimo else None
+    except ValueError:
+        return JsonResponse({"error": "Last-Event-ID inválido"}, status=400)
+
+    response = StreamingHttpResponse(flujo_eventos(codigo, ultimo), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx no debe acumular el flujo
+    return response
+
+# --- FOTOS Y ARCHIVOS DE /media/ (LOS ENVÍA NGINX) ---
+
+@require_safe
+def servir_medio(request, ruta):
+    # GET /media/<ruta>[?exp=...&firma=...]; ver ordenes/medios.py
+    ruta = medios.normalizar_ruta(ruta)
+    if ruta is None:
+        raise Http404
+    if not medios.puede_ver(request, ruta):
+        return HttpResponseForbidden()
+
+    if medios.PREFIJO_INTERNO:
+        # nginx responde 404 si no existe, y maneja Range / If-Modified-Since
+        response = HttpResponse(content_type=medios.tipo_contenido(ruta))
+        response['X-Accel-Redirect'] = medios.ruta_interna(ruta)
+    else:
+        completa = medios.ruta_local(ruta)
+        if completa is None:
+            raise Http404
+        response = FileResponse(open(completa, 'rb'), content_type=medios.tipo_contenido(ruta))
+    # Los nombres no se reutilizan (el storage nunca sobrescribe), así que se puede cachear
+    response['Cache-Control'] = f'private, max-age={medios.CACHE_NAVEGADOR}'
+    return response
+
+# --- ANALÍTICA DE MANTENIMIENTO (SOLO LECTURA) ---
+
+@api_view(['GET'])
+def analitica(request):
+    # GET /api/analitica/?agrupar=equipo,trabajador&tramo=mes&cierre_desde=2026-01-01
+    # Filtros opcionales: equipo, ubicacion, puesto_trabajo, trabajador, cierre_desde/cierre_hasta
+    try:
+        return Response(indicadores_cacheados(request.query_params))
+    except (ParametroInvalido, FiltroInvalido) as e:
+        return Response({"error": str(e)}, status=400)
+
+# --- LOTES (COLA OFFLINE EN UNA SOLA PETICIÓN) ---
+
+@api_view(['POST'])
+def procesar_lote(request):
+    # POST /api/lote/ {"operaciones": [{"url": ..., "metodo": ..., "body": {...}}, ...]}
+    # Devuelve un resultado por operación, en el mismo orden.
+    operaciones = request.data.get('operaciones')
+    if not isinstance(operaciones, list):
+        return Response({"error": "Se esperaba una lista en 'operaciones'"}, status=400)
+    if len(operaciones) > MAX_OPERACIONES_LOTE:
+        return Response({"error": f"Máximo {MAX_OPERACIONES_LOTE} operaciones por lote"}, status=400)
+
+    resultados = ejecutar_lote(operaciones, contexto={'request': request})
+    return Response({'resultados': resultados}, status=200)
+
 # --- VISTAS DE AUTENTICACIÓN ---
 
 @api_view(['POST'])
+@authentication_classes([])  # un token viejo en el header no debe impedir entrar con contraseña
 def login_operario(request):
     try:
         codigo_bruto = request.data.get('codigo', '')
@@ -133,8 +420,22 @@ def login_operario(request):
         if not codigo:
             return Response({"error": "Código es requerido"}, status=400)
 
+        # Reanudación: el dispositivo ya tiene un token válido de este operario (cambio de turno)
+        user, token = sesion_por_token(request)
+        if user is not None and user.username.lower() == codigo.lower():
+            return Response({
+                "token": token.key,
+                "usuario": {
+                    "username": user.username,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                }
+            }, status=200)
+
         try:
-            user = User.objects.get(username__iexact=codigo)
+            user = buscar_usuario(codigo)
+            if user is None:
+                raise User.DoesNotExist
             
             if not user.check_password(password):
                 return Response({"error": "Contraseña incorrecta. Intenta de nuevo."}, status=400)